@@ -82,6 +82,30 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Number of positions whose legal moves and game state are kept in memory (game.util.transposition_cache)
+TRANSPOSITION_CACHE_SIZE = 4096
+# Number of (game, ply) states kept in memory by every process (game.util.game_state_cache), and the alias
+# in CACHES of a cache shared by all processes, e.g. Redis, with the lifetime (seconds) of its entries.
+# Without a shared cache every process checks the latest ply of a game in the database.
+GAME_STATE_CACHE_SIZE = 512
+GAME_STATE_CACHE = None
+GAME_STATE_CACHE_TIMEOUT = 3600
+# Threads building move graphs for the async consumers (game.util.move_graph_executor), and how many
+# builds may wait for them before moves are turned away as the server being busy
+MOVE_GRAPH_WORKERS = 2
+MOVE_GRAPH_QUEUE_SIZE = 64
+
+# Computer player (game.core.engine): the user it plays as, worker processes searching its moves
+# and the time (seconds) and node budget of one search, None for no limit
+ENGINE_USERNAME = 'engine'
+ENGINE_WORKERS = 2
+ENGINE_TIME_LIMIT = 2.0
+ENGINE_NODE_LIMIT = None
+# opening book the engine plays from, built with manage.py build_book; not used when the file is missing
+OPENING_BOOK = BASE_DIR / 'opening_book.bin'
+# endgame tables built with manage.py build_tablebases, used by the engine and in game states
+TABLEBASE_DIR = BASE_DIR / 'tablebases'
+
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
@@ -1,75 +1,222 @@
 import json
-from channels.generic.websocket import WebsocketConsumer
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections
 
 from .core.chesspieces import Queen
+from .core.engine import SearchResult
 from .models import Game
 from django.contrib.auth.models import User
 from .util import *
 
 import datetime
 
-
-class GameConsumer(WebsocketConsumer):
-    def connect(self):
+logger = logging.getLogger(__name__)
+
+# games with an engine search in flight, so a move is never searched twice
+_engine_games = set()
+_engine_games_lock = threading.Lock()
+# stores and sends the engine's moves, off the engine pool's thread delivering search results;
+# its threads are started on demand, at most one per search running at once
+_engine_move_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'ENGINE_WORKERS', 1),
+                                           thread_name_prefix='engine-move')
+
+
+# Sends the move, stored by commit_game_move with chessboard as the board after it, to everyone watching
+# the game. The state is taken from the cache or built on the move graph executor, the database is not read.
+# A stored move is always sent: while the executor's queue is full, the state is built in a thread of its own.
+async def send_move_message(game_id: int, move: Move, chessboard: Chessboard, channel_layer=None) -> Chessboard:
+    try:
+        full_state_dict = await move_graph_executor.run(get_game_cached_state, game_id, chessboard,
+                                                        chessboard.get_ply())
+    except ExecutorFull:
+        logger.warning('move graph executor full, building the state of game %s inline: %s', game_id,
+                       move_graph_executor.stats())
+        full_state_dict = await database_sync_to_async(get_game_cached_state)(game_id, chessboard,
+                                                                               chessboard.get_ply())
+    chessboard = full_state_dict['chessboard']
+
+    special_moves = full_state_dict['special_move_info']
+    promoted_to_piece = None
+
+    if special_moves['promoted']:
+        promoted_to_piece = render_piece(Queen(PieceColor.enemy_color(chessboard.get_turn())))
+
+    await (channel_layer or get_channel_layer()).group_send(
+        'game_%s' % game_id,
+        {
+            'type': 'move_message',
+            'move': move.as_dict(),
+            'move_graph': full_state_dict['move_graph'],
+            'promoted_to_piece': promoted_to_piece,
+            'game_state': full_state_dict['game_state'],
+            'special_move_info': special_moves
+        }
+    )
+    # the stats are gathered under their caches' locks, only when they get logged
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('game state cache: %s, move graph executor: %s', game_state_cache.stats(),
+                     move_graph_executor.stats())
+    return chessboard
+
+
+# Starts a search on the engine pool when it is the engine's turn in a started game that is not over.
+# The move is stored and sent from the pool's callback, so neither the consumer nor the event loop waits for it.
+# Returns whether the engine plays in the game at all, so games between people can skip later requests.
+def request_engine_move(game_id: int, board: Chessboard = None) -> bool:
+    game = Game.objects.only('white_player', 'black_player', 'start_date', 'claimed_draw_reason', 'ply',
+                             'packed_moves').get(id=game_id)
+    engine_player = get_engine_player()
+    if engine_player is None or engine_player.id not in (game.white_player_id, game.black_player_id):
+        return False
+    if game.start_date is None or game.claimed_draw_reason is not None \
+            or (game.white_player_id, game.black_player_id)[game.ply % 2] != engine_player.id:
+        return True
+    board = get_game_chessboard(game_id, board)
+    game_state = transposition_cache.get_entry(board).game_state
+    if game_state['is_checkmate'] or game_state['is_draw']:
+        return True
+    with _engine_games_lock:
+        if game_id in _engine_games:
+            return True
+        _engine_games.add(game_id)
+    future = get_engine_pool().search(bytes(game.packed_moves))
+    # done callbacks run on the pool's thread that delivers every search result, so the move is handed over
+    future.add_done_callback(lambda done: _engine_move_executor.submit(_play_engine_move, game_id, board.get_ply(),
+                                                                       engine_player, done))
+    return True
+
+
+def _play_engine_move(game_id: int, ply: int, engine_player: User, future: 'Future[SearchResult]') -> None:
+    try:
+        result = future.result()
+        if result.move is None:
+            return
+        board = commit_game_move(game_id, engine_player, result.move, ply)
+        # the position was searched for a ply that has passed in the meantime
+        if board is None:
+            return
+        logger.info('engine move in game %s: %s, pool: %s', game_id, result.as_dict(), get_engine_pool().stats())
+        async_to_sync(send_move_message)(game_id, result.move, board)
+    except Exception:
+        logger.exception('engine move in game %s failed', game_id)
+        return
+    finally:
+        with _engine_games_lock:
+            _engine_games.discard(game_id)
+        close_old_connections()
+    # the engine may play both sides
+    try:
+        request_engine_move(game_id)
+    except Exception:
+        logger.exception('engine move in game %s failed', game_id)
+
+
+# a client message decoded from JSON, None when it is not valid JSON
+def parse_client_message(text_data) -> Optional[object]:
+    try:
+        return json.loads(text_data)
+    except (TypeError, ValueError):
+        return None
+
+
+# The move of a client message {"move": {"start_pos": ..., "end_pos": ...}}, None when it is not one or
+# either square is not an int index of the board
+def parse_client_move(message) -> Optional[Move]:
+    try:
+        move_json = message['move']
+        squares = move_json['start_pos'], move_json['end_pos']
+    except (TypeError, KeyError):
+        return None
+    if not all(type(square) is int and 0 <= square < 64 for square in squares):
+        return None
+    return Move.from_indexes(*squares)
+
+
+# ORM access runs in database_sync_to_async threads and move graphs on the move graph executor,
+# so an idle connection holds no thread
+class GameConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
         self.game_id = self.scope['url_route']['kwargs']['game_id']
         self.room_group_name = 'game_%s' % self.game_id
 
-        async_to_sync(self.channel_layer.group_add)(
+        await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
 
-        self.accept()
-
-    def disconnect(self, close_code):
+        await self.accept()
+        # the engine's first move when it plays white, or a move that was lost with a restarted server;
+        # players don't change once the game started, so other games never ask for the engine again
+        try:
+            self.engine_plays = await database_sync_to_async(request_engine_move)(int(self.game_id))
+        except (Game.DoesNotExist, ValueError):
+            logger.warning('connection to unknown game %s closed', self.game_id)
+            self.engine_plays = False
+            await self.close()
+
+    async def disconnect(self, close_code):
         # Leave room group
-        async_to_sync(self.channel_layer.group_discard)(
+        await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    def receive(self, text_data=None, bytes_data=None):
-        text_data_json = json.loads(text_data)
-        move_json = text_data_json['move']
-        move = Move.from_indexes(move_json['start_pos'], move_json['end_pos'])
-        game_current_turn = get_game_turn(int(self.game_id))
-
-        if self.player_move_authorized():
-            self.store_move(move)
-            full_state_dict = get_game_full_state(int(self.game_id))
-            move_graph = full_state_dict['move_graph']
-            game_state = full_state_dict['game_state']
-            chessboard = full_state_dict['chessboard']
-
-            special_moves = chessboard.get_special_move_info()
-            promoted_to_piece = None
-
-            if special_moves['promoted']:
-                promoted_to_piece = render_piece(Queen(game_current_turn))
-
-            async_to_sync(self.channel_layer.group_send)(
-                self.room_group_name,
-                {
-                    'type': 'move_message',
-                    'move': move.as_dict(),
-                    'move_graph': move_graph.as_dict(),
-                    'promoted_to_piece': promoted_to_piece,
-                    'game_state': game_state.as_dict(),
-                    'special_move_info': special_moves
-                }
-            )
-
-    def player_move_authorized(self) -> bool:
-        game = self.get_game()
-        player = self.scope['user']
-        game_current_turn = get_game_turn(int(self.game_id))
-        return game_current_turn == PieceColor.WHITE and game.white_player == player \
-               or game_current_turn == PieceColor.BLACK and game.black_player == player
+    async def receive(self, text_data=None, bytes_data=None):
+        message = parse_client_message(text_data)
+        if isinstance(message, dict) and message.get('claim_draw') is True:
+            await self.claim_draw()
+            return
+        move = parse_client_move(message)
+        if move is None:
+            logger.warning('invalid move message %.200r in game %s', text_data, self.game_id)
+            await self.send(text_data=json.dumps({'error': 'invalid move'}))
+            return
+        # turned away before it is stored while the move graph builds can't keep up; once stored, it is always sent
+        if move_graph_executor.is_full():
+            logger.warning('move %s in game %s turned away, move graph executor: %s', move, self.game_id,
+                           move_graph_executor.stats())
+            await self.send(text_data=json.dumps({'error': 'server busy'}))
+            return
+
+        # the turn and the legality of the move are checked in the transaction storing it
+        board = await database_sync_to_async(commit_game_move)(int(self.game_id), self.scope['user'], move)
+        if board is None:
+            logger.warning('move %s rejected in game %s', move, self.game_id)
+            await self.send(text_data=json.dumps({'error': 'move rejected'}))
+            return
+        board = await send_move_message(int(self.game_id), move, board, self.channel_layer)
+        if self.engine_plays:
+            await database_sync_to_async(request_engine_move)(int(self.game_id), board)
+
+    # {"claim_draw": true} from the player to move ends the game when threefold repetition or the fifty-move
+    # rule let them claim a draw
+    async def claim_draw(self):
+        game_state = await database_sync_to_async(claim_game_draw)(int(self.game_id), self.scope['user'])
+        if game_state is None:
+            logger.warning('draw claim rejected in game %s', self.game_id)
+            await self.send(text_data=json.dumps({'error': 'no draw to claim'}))
+            return
+        await self.channel_layer.group_send(self.room_group_name, {
+            'type': 'draw_message',
+            'game_state': game_state
+        })
+
+    async def draw_message(self, event):
+        await self.send(text_data=json.dumps({
+            'draw_claimed': True,
+            'game_state': event['game_state']
+        }))
 
     # Receive message from layer
-    def move_message(self, event):
-        self.send(text_data=json.dumps({
+    async def move_message(self, event):
+        await self.send(text_data=json.dumps({
             'move': event['move'],
             'move_graph': event['move_graph'],
             'promoted_to_piece': event['promoted_to_piece'],
@@ -77,54 +224,36 @@ class GameConsumer(WebsocketConsumer):
             'special_move_info': event['special_move_info']
         }))
 
-    def store_move(self, move: Move):
-        max_game_index = get_game_max_move_index(int(self.game_id))
-        if max_game_index is None:
-            max_game_index = 0
-
-        db_move = PlayerGameMove(game_id=int(self.game_id),
-                                 player=self.scope['user'],
-                                 index=max_game_index + 1,
-                                 move_code=str(move),
-                                 registered_date=datetime.datetime.now())
-        db_move.save()
-
-    def get_game(self):
-        return Game.objects.get(id=int(self.game_id))
-
 
-class LobbyConsumer(WebsocketConsumer):
-    def connect(self):
+class LobbyConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
         self.game_id = self.scope['url_route']['kwargs']['game_id']
         self.room_group_name = 'lobby_%s' % self.game_id
 
         # Join room group
-        async_to_sync(self.channel_layer.group_add)(
+        await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
 
-        self.accept()
+        await self.accept()
 
-    def disconnect(self, code):
+    async def disconnect(self, code):
         # Leave room group
-        async_to_sync(self.channel_layer.group_discard)(
+        await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-    def receive(self, text_data=None, bytes_data=None):
+    async def receive(self, text_data=None, bytes_data=None):
         text_data_json = json.loads(text_data)
         play_as = text_data_json['play_as']
         player = self.scope['user']
         start_game = text_data_json['start_game']
 
         if start_game is True:
-            game = self.get_game()
-            if game.black_player is not None and game.white_player is not None and player == game.created_by_player:
-                game.start_date = datetime.datetime.now()
-                game.save()
-                async_to_sync(self.channel_layer.group_send)(
+            if await self.start_game_if_ready(player):
+                await self.channel_layer.group_send(
                     self.room_group_name,
                     {
                         'type': 'start_game',
@@ -132,34 +261,40 @@ class LobbyConsumer(WebsocketConsumer):
                     }
                 )
         else:
-            game = self.update_game_after_request(play_as, player)
             new_setup = {
                 'type': 'new_setup',
-                'setup': {
-                    'white_player_nick': game.white_player.username if game.white_player is not None else 'Not selected',
-                    'black_player_nick': game.black_player.username if game.black_player is not None else 'Not selected'
-                }
+                'setup': await self.update_game_after_request(play_as, player)
             }
 
-            async_to_sync(self.channel_layer.group_send)(
+            await self.channel_layer.group_send(
                 self.room_group_name,
                 new_setup
             )
 
-    def new_setup(self, event):
+    async def new_setup(self, event):
         new_setup = event['setup']
 
-        self.send(text_data=json.dumps({
+        await self.send(text_data=json.dumps({
             'setup': new_setup,
             'start_game_url': None,
         }))
 
-    def update_game_after_request(self, play_as: str, requesting_player: User) -> Game:
+    # the players' nicks after the request, read while still in the database thread
+    @database_sync_to_async
+    def update_game_after_request(self, play_as: str, requesting_player: User) -> dict:
         game = self.get_game()
         current_white_player = game.white_player
         current_black_player = game.black_player
 
-        if play_as == 'black' and current_black_player != requesting_player:
+        # only the owner can let the engine take a side, it replaces whoever played it
+        if play_as in ('engine_white', 'engine_black'):
+            engine_player = get_engine_player()
+            if requesting_player == game.created_by_player and engine_player is not None:
+                if play_as == 'engine_white':
+                    game.white_player = engine_player
+                else:
+                    game.black_player = engine_player
+        elif play_as == 'black' and current_black_player != requesting_player:
             if current_black_player is not None or current_white_player == requesting_player:
                 game.white_player = current_black_player
             game.black_player = requesting_player
@@ -169,12 +304,25 @@ class LobbyConsumer(WebsocketConsumer):
             game.white_player = requesting_player
 
         game.save()
-        return game
+        return {
+            'white_player_nick': game.white_player.username if game.white_player is not None else 'Not selected',
+            'black_player_nick': game.black_player.username if game.black_player is not None else 'Not selected'
+        }
+
+    # the owner starts the game once both sides are taken
+    @database_sync_to_async
+    def start_game_if_ready(self, player: User) -> bool:
+        game = self.get_game()
+        if game.black_player_id is None or game.white_player_id is None or player.id != game.created_by_player_id:
+            return False
+        game.start_date = datetime.datetime.now()
+        game.save()
+        return True
 
-    def start_game(self, event):
+    async def start_game(self, event):
         start_game_url = event['start_game_url']
 
-        self.send(text_data=json.dumps({
+        await self.send(text_data=json.dumps({
             'setup': None,
             'start_game_url': start_game_url
         }))
@@ -0,0 +1,67 @@
+from typing import Dict, Optional, Tuple
+
+# Destination squares and rays for every piece kind and square, computed once at import.
+# Squares are indexes as returned by Position.inx(); every table is an immutable tuple.
+Squares = Tuple[int, ...]
+Rays = Tuple[Squares, ...]
+
+KNIGHT_OFFSETS = ((1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_OFFSETS = ((0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1))
+ROOK_SLOPES = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_SLOPES = ((1, 1), (1, -1), (-1, -1), (-1, 1))
+QUEEN_SLOPES = ROOK_SLOPES + BISHOP_SLOPES
+
+
+def _is_on_board(x: int, y: int) -> bool:
+    return 0 <= x < 8 and 0 <= y < 8
+
+
+def _targets(inx: int, offsets) -> Squares:
+    x, y = inx % 8, inx // 8
+    return tuple((x + dx) + 8 * (y + dy) for dx, dy in offsets if _is_on_board(x + dx, y + dy))
+
+
+def _ray(inx: int, slope: Tuple[int, int]) -> Squares:
+    x, y = inx % 8, inx // 8
+    dx, dy = slope
+    squares = []
+    x, y = x + dx, y + dy
+    while _is_on_board(x, y):
+        squares.append(x + 8 * y)
+        x, y = x + dx, y + dy
+    return tuple(squares)
+
+
+def _rays(inx: int, slopes) -> Rays:
+    return tuple(ray for ray in (_ray(inx, slope) for slope in slopes) if ray)
+
+
+KNIGHT_TARGETS: Tuple[Squares, ...] = tuple(_targets(inx, KNIGHT_OFFSETS) for inx in range(64))
+KING_TARGETS: Tuple[Squares, ...] = tuple(_targets(inx, KING_OFFSETS) for inx in range(64))
+
+# RAYS[slope][inx] - squares walked from inx in the slope direction, nearest first
+RAYS: Dict[Tuple[int, int], Tuple[Squares, ...]] = {slope: tuple(_ray(inx, slope) for inx in range(64))
+                                                    for slope in QUEEN_SLOPES}
+
+
+def _slopes_from(inx: int) -> Tuple[Optional[Tuple[int, int]], ...]:
+    slopes = [None] * 64
+    for slope in QUEEN_SLOPES:
+        for target in RAYS[slope][inx]:
+            slopes[target] = slope
+    return tuple(slopes)
+
+
+# SLOPES_BETWEEN[start][end] - slope of the ray from start that reaches end, None when they share no line
+SLOPES_BETWEEN: Tuple[Tuple[Optional[Tuple[int, int]], ...], ...] = tuple(_slopes_from(inx) for inx in range(64))
+ROOK_RAYS: Tuple[Rays, ...] = tuple(_rays(inx, ROOK_SLOPES) for inx in range(64))
+BISHOP_RAYS: Tuple[Rays, ...] = tuple(_rays(inx, BISHOP_SLOPES) for inx in range(64))
+QUEEN_RAYS: Tuple[Rays, ...] = tuple(_rays(inx, QUEEN_SLOPES) for inx in range(64))
+
+# keyed by pawn direction: 1 for white, -1 for black
+PAWN_ATTACKS: Dict[int, Tuple[Squares, ...]] = {
+    direction: tuple(_targets(inx, ((1, direction), (-1, direction))) for inx in range(64))
+    for direction in (1, -1)}
+PAWN_PUSHES: Dict[int, Tuple[Squares, ...]] = {
+    direction: tuple(_ray(inx, (0, direction))[:2 if inx // 8 == starting_y else 1] for inx in range(64))
+    for direction, starting_y in ((1, 1), (-1, 6))}
@@ -0,0 +1,33 @@
+import unittest
+
+from game.core.attack_tables import KNIGHT_TARGETS, KING_TARGETS, PAWN_PUSHES, PAWN_ATTACKS, ROOK_RAYS, QUEEN_RAYS
+from game.core.position import Position
+
+
+def codes(squares):
+    return {str(Position.from_inx(inx)) for inx in squares}
+
+
+class AttackTablesTestCase(unittest.TestCase):
+    def test_leapers(self):
+        self.assertEqual({'a3', 'c3', 'd2'}, codes(KNIGHT_TARGETS[Position.from_str('b1').inx()]))
+        self.assertEqual({'a2', 'b2', 'b1'}, codes(KING_TARGETS[Position.from_str('a1').inx()]))
+
+    def test_pawns(self):
+        self.assertEqual((Position.from_str('e3').inx(), Position.from_str('e4').inx()),
+                         PAWN_PUSHES[1][Position.from_str('e2').inx()])
+        self.assertEqual({'e5'}, codes(PAWN_PUSHES[-1][Position.from_str('e6').inx()]))
+        self.assertEqual({'g6'}, codes(PAWN_ATTACKS[-1][Position.from_str('h7').inx()]))
+
+    def test_rays_are_ordered_from_nearest(self):
+        rays = ROOK_RAYS[Position.from_str('a1').inx()]
+        self.assertIn(tuple(Position.from_str(code).inx() for code in ['a2', 'a3', 'a4', 'a5', 'a6', 'a7', 'a8']), rays)
+        self.assertEqual(27, sum(map(len, QUEEN_RAYS[Position.from_str('d4').inx()])))
+
+    def test_tables_are_immutable(self):
+        self.assertIsInstance(KNIGHT_TARGETS, tuple)
+        self.assertIsInstance(ROOK_RAYS[0][0], tuple)
+
+
+if __name__ == '__main__':
+    unittest.main()
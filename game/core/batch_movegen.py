@@ -0,0 +1,293 @@
+from typing import Iterable, List, NamedTuple
+
+import numpy as np
+
+from game.core.attack_tables import RAYS, ROOK_SLOPES, QUEEN_SLOPES, KNIGHT_OFFSETS, KING_OFFSETS, KNIGHT_TARGETS, \
+    KING_TARGETS, PAWN_ATTACKS, PAWN_PUSHES
+from game.core.chessboard import Chessboard, Move, WHITE_SHORT_CASTLE, WHITE_LONG_CASTLE
+from game.core.chesspiece import PieceColor
+from game.core.chesspieces import King, Knight, Pawn, Rook, Bishop, Queen
+
+# Move generation for many positions at once. A batch stores each board as a row of 64 int8 piece codes,
+# positive for white and negative for black pieces, and every step below works on all rows together.
+# Boards with black to move are mirrored first, so the side to move always plays up the board like white.
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+PIECE_CODES = {Pawn: PAWN, Knight: KNIGHT, Bishop: BISHOP, Rook: ROOK, Queen: QUEEN, King: KING}
+NO_SQUARE = -1
+# piece flyweights (and None for an empty square) to their codes
+_SIGNED_CODES = {None: 0,
+                 **{piece_type(PieceColor.WHITE): code for piece_type, code in PIECE_CODES.items()},
+                 **{piece_type(PieceColor.BLACK): -code for piece_type, code in PIECE_CODES.items()}}
+
+# square 64 stands for "off the board", so tables indexed by a missing king or a finished ray stay in bounds
+_OFF_BOARD = 64
+# square seen from the other side of the board
+_MIRROR = np.arange(64) ^ 56
+
+
+def _matrix(targets) -> np.ndarray:
+    matrix = np.zeros((65, 64), dtype=bool)
+    for inx, squares in enumerate(targets):
+        matrix[inx, list(squares)] = True
+    return matrix
+
+
+# (start squares, end squares) of every move in the targets table
+def _pairs(targets):
+    pairs = [(inx, target) for inx, squares in enumerate(targets) for target in squares]
+    return np.array([start for start, _ in pairs], dtype=np.intp), np.array([end for _, end in pairs], dtype=np.intp)
+
+
+# (start squares, end squares) of a single offset, each end square appearing once
+def _offset_pairs(offset):
+    dx, dy = offset
+    starts = [inx for inx in range(64) if 0 <= inx % 8 + dx < 8 and 0 <= inx // 8 + dy < 8]
+    return np.array(starts, dtype=np.intp), np.array([inx + dx + 8 * dy for inx in starts], dtype=np.intp)
+
+
+_KNIGHT_MATRIX = _matrix(KNIGHT_TARGETS)
+_KNIGHT_OFFSET_PAIRS = [_offset_pairs(offset) for offset in KNIGHT_OFFSETS]
+_KING_OFFSET_PAIRS = [_offset_pairs(offset) for offset in KING_OFFSETS]
+_PAWN_UP_OFFSET_PAIRS = [_offset_pairs((1, 1)), _offset_pairs((-1, 1))]
+_PAWN_DOWN_OFFSET_PAIRS = [_offset_pairs((1, -1)), _offset_pairs((-1, -1))]
+_PAWN_UP_ATTACK_MATRIX = _matrix(PAWN_ATTACKS[1])
+_PAWN_DOWN_ATTACK_MATRIX = _matrix(PAWN_ATTACKS[-1])
+_KNIGHT_PAIRS = _pairs(KNIGHT_TARGETS)
+_KING_PAIRS = _pairs(KING_TARGETS)
+_PAWN_CAPTURE_PAIRS = _pairs(PAWN_ATTACKS[1])
+_PAWN_PUSH_PAIRS = _pairs(tuple(pushes[:1] for pushes in PAWN_PUSHES[1]))
+_PAWN_DOUBLE_PUSH_PAIRS = _pairs(tuple(pushes[1:] for pushes in PAWN_PUSHES[1]))
+
+# _RAY_SQUARES[slope][inx] - the ray of RAYS padded with _OFF_BOARD to 7 squares; row 64 is all _OFF_BOARD
+_RAY_SQUARES = {slope: np.array([list(ray) + [_OFF_BOARD] * (7 - len(ray)) for ray in RAYS[slope]] +
+                                [[_OFF_BOARD] * 7], dtype=np.intp)
+                for slope in QUEEN_SLOPES}
+
+
+# (start squares, end squares, positions of the start squares in the previous step) of each step along a slope
+def _ray_steps(slope):
+    steps = []
+    for step in range(7):
+        starts = np.array([inx for inx in range(64) if len(RAYS[slope][inx]) > step], dtype=np.intp)
+        ends = np.array([RAYS[slope][inx][step] for inx in starts], dtype=np.intp)
+        previous = np.searchsorted(steps[-1][0], starts) if steps else None
+        steps.append((starts, ends, previous))
+    return steps
+
+
+_RAY_STEPS = {slope: _ray_steps(slope) for slope in QUEEN_SLOPES}
+
+# rights bit, squares that must be empty, squares the king passes, king destination - seen from white's side
+_CASTLES = ((WHITE_SHORT_CASTLE, [5, 6], [5, 6], 6),
+            (WHITE_LONG_CASTLE, [3, 2, 1], [3, 2], 2))
+_KING_HOME = 4
+
+
+# N positions: pieces (N, 64) int8 codes, turns (N,) +1 for white and -1 for black to move,
+# castling_rights (N,) Chessboard castling bits and en_passant (N,) square or NO_SQUARE
+class BoardBatch(NamedTuple):
+    pieces: np.ndarray
+    turns: np.ndarray
+    castling_rights: np.ndarray
+    en_passant: np.ndarray
+
+    @classmethod
+    def from_boards(cls, boards: Iterable[Chessboard]):
+        boards = list(boards)
+        pieces = np.array([[_SIGNED_CODES[board.piece_at(inx)] for inx in range(64)] for board in boards],
+                          dtype=np.int8).reshape(len(boards), 64)
+        return cls(pieces=pieces,
+                   turns=np.array([1 if board.get_turn() is PieceColor.WHITE else -1 for board in boards],
+                                  dtype=np.int8),
+                   castling_rights=np.array([board.get_castling_rights() for board in boards], dtype=np.uint8),
+                   en_passant=np.array([NO_SQUARE if not board.get_possible_en_passant_moves()
+                                        else board.get_en_passant_square() for board in boards], dtype=np.int8))
+
+    def __len__(self) -> int:
+        return len(self.pieces)
+
+
+# results for the side to move of every position
+class BatchMoves(NamedTuple):
+    # (N, 64) squares attacked by white and by black pieces, own pieces included
+    white_attacks: np.ndarray
+    black_attacks: np.ndarray
+    in_check: np.ndarray
+    # (N, 64, 64) legal moves as [start square, end square]
+    moves: np.ndarray
+
+    def counts(self) -> np.ndarray:
+        return self.moves.sum(axis=(1, 2))
+
+    def move_list(self, row: int) -> List[Move]:
+        return [Move.from_indexes(int(start), int(end)) for start, end in zip(*np.nonzero(self.moves[row]))]
+
+
+def _is_slider_along(pieces: np.ndarray, slope) -> np.ndarray:
+    line_piece = ROOK if slope in ROOK_SLOPES else BISHOP
+    return (pieces == line_piece) | (pieces == QUEEN)
+
+
+# Below, square arrays are laid out square-major - (64, N) - so selecting squares copies whole rows.
+
+# for every step along the slope, (starts, N) whether the step's end square is reached from its start square
+def _reached(occupied: np.ndarray, slope) -> List[np.ndarray]:
+    steps = _RAY_STEPS[slope]
+    reached = [np.ones((len(steps[0][0]), occupied.shape[1]), dtype=bool)]
+    for (_, previous_ends, _), (_, _, previous) in zip(steps, steps[1:]):
+        reached.append(reached[-1][previous] & ~occupied[previous_ends[previous]])
+    return reached
+
+
+# (64, N) squares attacked by the pieces with positive codes, their pawns moving up or down the board
+def _attacked_by(pieces: np.ndarray, occupied: np.ndarray, pawns_up: bool, reached=None) -> np.ndarray:
+    attacked = np.zeros(pieces.shape, dtype=bool)
+    for piece, offset_pairs in ((KNIGHT, _KNIGHT_OFFSET_PAIRS), (KING, _KING_OFFSET_PAIRS),
+                                (PAWN, _PAWN_UP_OFFSET_PAIRS if pawns_up else _PAWN_DOWN_OFFSET_PAIRS)):
+        leapers = pieces == piece
+        for starts, ends in offset_pairs:
+            attacked[ends] |= leapers[starts]
+    for slope in QUEEN_SLOPES:
+        sliders = _is_slider_along(pieces, slope)
+        if not sliders.any():
+            continue
+        slope_reached = _reached(occupied, slope) if reached is None else reached[slope]
+        for (starts, ends, _), step_reached in zip(_RAY_STEPS[slope], slope_reached):
+            attacked[ends] |= sliders[starts] & step_reached
+    return attacked
+
+
+def _mirror_columns(squares: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    squares = squares.copy()
+    squares[:, columns] = squares[_MIRROR][:, columns]
+    return squares
+
+
+def _padded(squares: np.ndarray, value) -> np.ndarray:
+    return np.concatenate([squares, np.full((1, squares.shape[1]), value, dtype=squares.dtype)])
+
+
+# Legal moves, attack maps and check status of every position of the batch.
+# Follows game.core.legal_moves: check and pin masks, king moves against the attacks seen through the king,
+# and en passant verified by playing it.
+def generate_batch_moves(batch: BoardBatch) -> BatchMoves:
+    turns = batch.turns.astype(np.int8)
+    columns = np.arange(len(turns))
+    black_columns = np.flatnonzero(turns < 0)
+    # own pieces positive, enemy pieces negative
+    relative = _mirror_columns((batch.pieces.astype(np.int8) * turns[:, None]).T, black_columns)
+    castling_rights = batch.castling_rights.astype(np.intp)
+    castling_rights[black_columns] >>= 2
+    en_passant = batch.en_passant.astype(np.intp)
+    en_passant[black_columns] = np.where(en_passant[black_columns] >= 0, en_passant[black_columns] ^ 56, NO_SQUARE)
+
+    own = relative > 0
+    enemy = relative < 0
+    occupied = own | enemy
+    not_own = ~own
+
+    reached = {slope: _reached(occupied, slope) for slope in QUEEN_SLOPES}
+    own_attacks = _attacked_by(relative, occupied, True, reached)
+    enemy_attacks = _attacked_by(-relative, occupied, False, reached)
+
+    kings = relative == KING
+    king_inx = np.where(kings.any(axis=0), kings.argmax(axis=0), _OFF_BOARD)
+    in_check = _padded(enemy_attacks, False)[king_inx, columns]
+
+    # moves[start, end, board]
+    moves = np.zeros((64, 64, len(columns)), dtype=bool)
+    starts, ends = _KNIGHT_PAIRS
+    moves[starts, ends] = (relative[starts] == KNIGHT) & not_own[ends]
+    for slope in QUEEN_SLOPES:
+        sliders = _is_slider_along(relative, slope)
+        for (starts, ends, _), step_reached in zip(_RAY_STEPS[slope], reached[slope]):
+            moves[starts, ends] |= sliders[starts] & step_reached & not_own[ends]
+    pawns = relative == PAWN
+    starts, ends = _PAWN_PUSH_PAIRS
+    moves[starts, ends] |= pawns[starts] & ~occupied[ends]
+    starts, ends = _PAWN_DOUBLE_PUSH_PAIRS
+    moves[starts, ends] |= pawns[starts] & ~occupied[ends] & ~occupied[ends - 8]
+    starts, ends = _PAWN_CAPTURE_PAIRS
+    moves[starts, ends] |= pawns[starts] & enemy[ends]
+
+    _restrict_to_check_and_pins(moves, relative, king_inx)
+
+    # king moves, against the attacks computed with the king taken off the board
+    xray_attacks = _attacked_by(-relative, occupied & ~kings, False)
+    starts, ends = _KING_PAIRS
+    moves[starts, ends] |= kings[starts] & not_own[ends] & ~xray_attacks[ends]
+
+    _add_en_passant_moves(moves, relative, en_passant, king_inx)
+    for right, empty_squares, passed_squares, destination in _CASTLES:
+        can_castle = (castling_rights & right != 0) & (king_inx == _KING_HOME) & ~in_check & \
+            ~occupied[empty_squares].any(axis=0) & ~enemy_attacks[passed_squares].any(axis=0)
+        moves[_KING_HOME, destination, can_castle] = True
+
+    moves[:, :, black_columns] = moves[_MIRROR][:, _MIRROR][:, :, black_columns]
+    own_attacks = _mirror_columns(own_attacks, black_columns)
+    enemy_attacks = _mirror_columns(enemy_attacks, black_columns)
+    is_white = turns > 0
+    return BatchMoves(white_attacks=np.where(is_white, own_attacks, enemy_attacks).T,
+                      black_attacks=np.where(is_white, enemy_attacks, own_attacks).T,
+                      in_check=in_check,
+                      moves=np.ascontiguousarray(moves.transpose(2, 0, 1)))
+
+
+# keeps the moves of pieces other than the king that resolve a check and stay on their pin ray,
+# looking from the king along each slope for checkers and pinned pieces
+def _restrict_to_check_and_pins(moves: np.ndarray, relative: np.ndarray, king_inx: np.ndarray) -> None:
+    columns = np.arange(relative.shape[1])
+    padded_relative = _padded(relative, 0)
+    checkers = np.zeros(len(columns), dtype=np.intp)
+    # (N, 65) - squares a piece has to move to when in check
+    check_block = np.zeros((len(columns), 65), dtype=bool)
+    steps = np.arange(7)
+    for slope in QUEEN_SLOPES:
+        ray_squares = _RAY_SQUARES[slope][king_inx]
+        ray_pieces = padded_relative[ray_squares, columns[:, None]]
+        ray_occupied = ray_pieces != 0
+        first = ray_occupied.argmax(axis=1)
+        first_piece = ray_pieces[columns, first]
+        second_occupied = ray_occupied & (steps > first[:, None])
+        second = second_occupied.argmax(axis=1)
+        second_piece = np.where(second_occupied.any(axis=1), ray_pieces[columns, second], 0)
+
+        is_check = _is_slider_along(-first_piece, slope)
+        checkers += is_check
+        check_block[columns[:, None], ray_squares] |= is_check[:, None] & (steps <= first[:, None])
+
+        pinned = np.flatnonzero((first_piece > 0) & _is_slider_along(-second_piece, slope))
+        pin_ray = np.zeros((len(pinned), 65), dtype=bool)
+        pin_ray[np.arange(len(pinned))[:, None], ray_squares[pinned]] = steps <= second[pinned, None]
+        moves[ray_squares[pinned, first[pinned]], :, pinned] &= pin_ray[:, :64]
+
+    leaper_checkers = (_KNIGHT_MATRIX[king_inx] & (relative.T == -KNIGHT)) | \
+        (_PAWN_UP_ATTACK_MATRIX[king_inx] & (relative.T == -PAWN))
+    checkers += leaper_checkers.sum(axis=1)
+    check_block[:, :64] |= leaper_checkers
+
+    # no check - every square, one checker - capture or block it, double check - only the king moves
+    allowed = np.where(checkers[:, None] == 0, True, np.where(checkers[:, None] == 1, check_block[:, :64], False))
+    moves &= allowed.T[None]
+
+
+# en passant removes two pawns from one row, which the pin masks don't cover - play the captures on copies
+# of the boards that have one and check the king
+def _add_en_passant_moves(moves: np.ndarray, relative: np.ndarray, en_passant: np.ndarray,
+                          king_inx: np.ndarray) -> None:
+    ep_columns = np.flatnonzero(en_passant >= 0)
+    if not len(ep_columns):
+        return
+    # own pawns stand where an enemy pawn would attack from the en-passant square
+    attackers = _PAWN_DOWN_ATTACK_MATRIX[en_passant[ep_columns]] & (relative[:, ep_columns].T == PAWN)
+    candidate_columns, starts = np.nonzero(attackers)
+    columns = ep_columns[candidate_columns]
+    ends = en_passant[columns]
+    candidates = np.arange(len(columns))
+    played = relative[:, columns]
+    played[ends, candidates] = PAWN
+    played[starts, candidates] = 0
+    played[ends - 8, candidates] = 0
+    attacked = _attacked_by(-played, played != 0, False)
+    legal = ~_padded(attacked, False)[king_inx[columns], candidates]
+    moves[starts[legal], ends[legal], columns[legal]] = True
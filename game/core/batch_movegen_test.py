@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from game.core.batch_movegen import BoardBatch, generate_batch_moves
+from game.core.chessboard import Chessboard, Move
+from game.core.move_graph import MoveGraph
+from game.core.perft import PERFT_POSITIONS
+
+
+def boards_of(position):
+    board = position.new_board()
+    boards = [board.copy()]
+    for move in MoveGraph(board, side_to_move_only=True).moves:
+        board.push(move)
+        boards.append(board.copy())
+        board.pop()
+    return boards
+
+
+class BatchMovegenTestCase(unittest.TestCase):
+    def test_matches_move_graph(self):
+        boards = [board for position in PERFT_POSITIONS.values() for board in boards_of(position)]
+        result = generate_batch_moves(BoardBatch.from_boards(boards))
+        for row, board in enumerate(boards):
+            graph = MoveGraph(board, side_to_move_only=True)
+            self.assertEqual(set(graph.moves), set(result.move_list(row)), board.to_fen())
+            self.assertEqual(graph.legal_moves.checkers != 0, result.in_check[row], board.to_fen())
+
+    def test_attack_maps(self):
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/8/R3K3 w Q - 0 1')
+        result = generate_batch_moves(BoardBatch.from_boards([board]))
+        white_attacks = set(np.flatnonzero(result.white_attacks[0]))
+        self.assertEqual({1, 2, 3, 4, 8, 16, 24, 32, 40, 48, 56, 11, 12, 13, 5}, white_attacks)
+        self.assertTrue(result.black_attacks[0][Move.from_str('e8d7').get_end().inx()])
+
+    def test_check_and_mate(self):
+        boards = [Chessboard.from_moves_list(Move.from_str_list(['f2f3', 'e7e5', 'g2g4', 'd8h4'])),
+                  Chessboard.from_moves_list(Move.from_str_list(['e2e4', 'd7d5', 'f1b5']))]
+        result = generate_batch_moves(BoardBatch.from_boards(boards))
+        self.assertEqual([True, True], list(result.in_check))
+        self.assertEqual([0, 5], list(result.counts()))
+
+    def test_empty_batch(self):
+        result = generate_batch_moves(BoardBatch.from_boards([]))
+        self.assertEqual((0, 64, 64), result.moves.shape)
+
+
+if __name__ == '__main__':
+    unittest.main()
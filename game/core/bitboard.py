@@ -0,0 +1,95 @@
+from typing import Dict, Iterator, List, Tuple, Type
+
+from game.core.chessboard import Chessboard
+from game.core.chesspiece import ChessPiece, PieceColor
+from game.core.chesspieces import King, Knight, Pawn, Rook, Bishop, Queen
+from game.core.position import Position
+
+PIECE_TYPES = (Pawn, Knight, Bishop, Rook, Queen, King)
+# concrete piece types an abstract one like DynamicChessPiece stands for, filled on first query
+_COVERED_TYPES: Dict[Type[ChessPiece], Tuple[Type[ChessPiece], ...]] = {}
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+# Chessboard that answers set queries with one 64-bit integer per (color, piece type).
+# The mailbox list of the base class is still kept, because get_piece must return
+# the piece objects themselves.
+class BitboardChessboard(Chessboard):
+    def __init__(self):
+        self._bitboards: Dict[Tuple[PieceColor, Type[ChessPiece]], int] = {
+            (color, piece_type): 0 for color in (PieceColor.WHITE, PieceColor.BLACK) for piece_type in PIECE_TYPES}
+        self._occupancy: Dict[PieceColor, int] = {PieceColor.WHITE: 0, PieceColor.BLACK: 0}
+        super().__init__()
+        for inx, piece in enumerate(self._pieces):
+            if piece is not None:
+                self._add_bit(inx, piece)
+
+    def _set_piece(self, inx: int, piece: ChessPiece) -> None:
+        old_piece = self._pieces[inx]
+        if old_piece is not None:
+            self._remove_bit(inx, old_piece)
+        if piece is not None:
+            self._add_bit(inx, piece)
+        super()._set_piece(inx, piece)
+
+    def _restore_piece(self, inx: int, piece: ChessPiece) -> None:
+        old_piece = self._pieces[inx]
+        if old_piece is not None:
+            self._remove_bit(inx, old_piece)
+        if piece is not None:
+            self._add_bit(inx, piece)
+        super()._restore_piece(inx, piece)
+
+    def _add_bit(self, inx: int, piece: ChessPiece) -> None:
+        bit = 1 << inx
+        self._bitboards[(piece.get_color(), type(piece))] |= bit
+        self._occupancy[piece.get_color()] |= bit
+
+    def _remove_bit(self, inx: int, piece: ChessPiece) -> None:
+        mask = ~(1 << inx)
+        self._bitboards[(piece.get_color(), type(piece))] &= mask
+        self._occupancy[piece.get_color()] &= mask
+
+    def copy(self):
+        board = super().copy()
+        board._bitboards = dict(self._bitboards)
+        board._occupancy = dict(self._occupancy)
+        return board
+
+    def get_bitboard(self, color: PieceColor, piece_type: Type[ChessPiece]) -> int:
+        bitboard = self._bitboards.get((color, piece_type))
+        if bitboard is not None:
+            return bitboard
+        covered = _COVERED_TYPES.get(piece_type)
+        if covered is None:
+            covered = _COVERED_TYPES[piece_type] = tuple(t for t in PIECE_TYPES if issubclass(t, piece_type))
+        mask = 0
+        for covered_type in covered:
+            mask |= self._bitboards[(color, covered_type)]
+        return mask
+
+    def get_occupancy(self, color: PieceColor = None) -> int:
+        if color is None:
+            return self._occupancy[PieceColor.WHITE] | self._occupancy[PieceColor.BLACK]
+        return self._occupancy[color]
+
+    def is_empty(self, position: Position):
+        return not (self.get_occupancy() >> position.inx()) & 1
+
+    def get_all_pieces_positions(self):
+        return [*self.get_pieces_positions_by_color(PieceColor.WHITE),
+                *self.get_pieces_positions_by_color(PieceColor.BLACK)]
+
+    def get_pieces_positions_by_color(self, color: PieceColor) -> List[Position]:
+        return [Position.from_inx(inx) for inx in iter_bits(self._occupancy[color])]
+
+    def get_pieces_positions_by_type(self, piece_type: Type[ChessPiece]) -> List[Position]:
+        return [Position.from_inx(inx)
+                for color in (PieceColor.WHITE, PieceColor.BLACK)
+                for inx in iter_bits(self.get_bitboard(color, piece_type))]
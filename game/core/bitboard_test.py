@@ -0,0 +1,46 @@
+import unittest
+
+from game.core.bitboard import BitboardChessboard, iter_bits
+from game.core.chessboard import Chessboard, Move, Position
+from game.core.chesspiece import PieceColor, StaticChessPiece, DynamicChessPiece
+from game.core.chesspieces import Pawn, King, Rook, Queen
+from game.core.move_graph import MoveGraph
+
+GAME_CODES = ['e2e4', 'd7d5', 'e4d5', 'g8f6', 'f1b5', 'c7c6', 'd5c6', 'e7e5', 'c6b7', 'f8e7', 'b7a8', 'e8g8']
+
+
+class BitboardChessboardTestCase(unittest.TestCase):
+    def test_iter_bits(self):
+        self.assertEqual([0, 3, 63], list(iter_bits((1 << 0) | (1 << 3) | (1 << 63))))
+
+    def test_queries_match_mailbox_board(self):
+        for ply in range(len(GAME_CODES) + 1):
+            moves = Move.from_str_list(GAME_CODES[:ply])
+            board = Chessboard.from_moves_list(moves)
+            bit_board = BitboardChessboard.from_moves_list(moves)
+            for color in (PieceColor.WHITE, PieceColor.BLACK):
+                self.assertEqual([str(pos) for pos in board.get_pieces_positions_by_color(color)],
+                                 [str(pos) for pos in bit_board.get_pieces_positions_by_color(color)])
+            for piece_type in (Pawn, King, StaticChessPiece, DynamicChessPiece):
+                self.assertEqual([str(pos) for pos in board.get_pieces_positions_by_type(piece_type)],
+                                 [str(pos) for pos in bit_board.get_pieces_positions_by_type(piece_type)])
+            for pos in Chessboard.all_positions():
+                self.assertEqual(board.is_empty(pos), bit_board.is_empty(pos))
+
+    def test_promotion_updates_bitboards(self):
+        board = BitboardChessboard.from_moves_list(Move.from_str_list(GAME_CODES[:10]))
+        a8 = Position.from_str('a8').inx()
+        self.assertTrue(board.get_bitboard(PieceColor.BLACK, Rook) >> a8 & 1)
+        board.make_move(Move.from_str('b7a8'))
+        self.assertFalse(board.get_bitboard(PieceColor.BLACK, Rook) >> a8 & 1)
+        self.assertFalse(board.get_bitboard(PieceColor.WHITE, Pawn) >> Position.from_str('b7').inx() & 1)
+        self.assertTrue(board.get_bitboard(PieceColor.WHITE, Queen) >> a8 & 1)
+
+    def test_move_graph_runs_on_bitboards(self):
+        moves = Move.from_str_list(GAME_CODES)
+        self.assertEqual(MoveGraph(Chessboard.from_moves_list(moves)).as_dict(),
+                         MoveGraph(BitboardChessboard.from_moves_list(moves)).as_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
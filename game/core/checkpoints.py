@@ -0,0 +1,58 @@
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Type
+
+from game.core.chessboard import Chessboard, Move
+from game.core.move_codec import decode_move
+
+# A game's board is stored every CHECKPOINT_INTERVAL plies as a Chessboard snapshot, so the board after
+# any ply is restored from the checkpoint before it with at most CHECKPOINT_INTERVAL - 1 moves.
+CHECKPOINT_INTERVAL = 16
+
+
+def is_checkpoint_ply(ply: int) -> bool:
+    return ply > 0 and ply % CHECKPOINT_INTERVAL == 0
+
+
+# ply of the checkpoint a board after ply plies is restored from, 0 being the initial position
+def checkpoint_ply_before(ply: int) -> int:
+    return ply - ply % CHECKPOINT_INTERVAL
+
+
+# (ply, snapshot) of every checkpoint of the game
+def build_checkpoints(moves: Iterable[Move]) -> List[Tuple[int, bytes]]:
+    board = Chessboard()
+    checkpoints = []
+    for move in moves:
+        board.push(move)
+        if is_checkpoint_ply(board.get_ply()):
+            checkpoints.append((board.get_ply(), board.to_snapshot()))
+    return checkpoints
+
+
+# Board after ply plies of the game with the given move codes, restored from the checkpoint snapshot
+# stored before that ply. A missing or broken checkpoint means replaying from the initial position.
+def board_at_ply(codes: Sequence[int], ply: int, checkpoint: Optional[bytes] = None,
+                 board_class: Type[Chessboard] = Chessboard) -> Chessboard:
+    if not 0 <= ply <= len(codes):
+        raise ValueError(f'Ply {ply} is outside of the game, which has {len(codes)} plies')
+    board = None
+    if checkpoint:
+        try:
+            board = board_class.from_snapshot(checkpoint)
+        except ValueError:
+            pass
+    if board is None or board.get_ply() > ply:
+        board = board_class()
+    for code in codes[board.get_ply():ply]:
+        board.push(decode_move(code))
+    return board
+
+
+# Boards after plies start to start + count - 1, walked one move at a time from a single checkpoint.
+# The same board is yielded every time, advanced in place.
+def iter_boards(codes: Sequence[int], start: int, count: int, checkpoint: Optional[bytes] = None,
+                board_class: Type[Chessboard] = Chessboard) -> Iterator[Chessboard]:
+    board = board_at_ply(codes, start, checkpoint, board_class)
+    for ply in range(start, min(start + count, len(codes) + 1)):
+        if ply > start:
+            board.push(decode_move(codes[ply - 1]))
+        yield board
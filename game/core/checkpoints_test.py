@@ -0,0 +1,49 @@
+import unittest
+
+from game.core.checkpoints import CHECKPOINT_INTERVAL, board_at_ply, build_checkpoints, checkpoint_ply_before, \
+    iter_boards
+from game.core.chessboard import Chessboard, Move
+from game.core.move_codec import pack_moves, unpack_codes
+
+# 40 plies, with castling by both sides
+GAME_CODES = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'g8f6', 'e1g1', 'f8c5', 'd2d3', 'e8g8',
+              'c2c3', 'd7d6', 'b1d2', 'a7a6', 'a2a4', 'c8e6', 'c4e6', 'f7e6', 'd1b3', 'd8c8',
+              'f3g5', 'c8e8', 'g5e6', 'e8e6', 'b3e6', 'g8h8', 'e6c4', 'f8f7', 'b2b4', 'c5a7',
+              'c1a3', 'a8f8', 'd2f3', 'f6g4', 'h2h3', 'g4f2', 'f1f2', 'f7f3', 'g2f3', 'f8f3']
+MOVES = Move.from_str_list(GAME_CODES)
+CODES = unpack_codes(pack_moves(MOVES))
+
+
+class CheckpointsTestCase(unittest.TestCase):
+    def test_build_checkpoints(self):
+        checkpoints = build_checkpoints(MOVES)
+        self.assertEqual([16, 32], [ply for ply, _ in checkpoints])
+        self.assertEqual(Chessboard.from_moves_list(MOVES[:32]).to_fen(),
+                         Chessboard.from_snapshot(checkpoints[1][1]).to_fen())
+
+    def test_board_at_ply(self):
+        checkpoints = dict(build_checkpoints(MOVES))
+        for ply in range(len(MOVES) + 1):
+            checkpoint = checkpoints.get(checkpoint_ply_before(ply))
+            board = board_at_ply(CODES, ply, checkpoint)
+            self.assertEqual(Chessboard.from_moves_list(MOVES[:ply]).to_fen(), board.to_fen())
+            self.assertEqual(ply, board.get_ply())
+            self.assertLess(len(board._undo_stack), CHECKPOINT_INTERVAL)
+
+    def test_missing_or_broken_checkpoint_replays(self):
+        expected = Chessboard.from_moves_list(MOVES[:20]).to_fen()
+        self.assertEqual(expected, board_at_ply(CODES, 20).to_fen())
+        self.assertEqual(expected, board_at_ply(CODES, 20, b'broken').to_fen())
+        # a checkpoint after the ply is not used
+        self.assertEqual(expected, board_at_ply(CODES, 20, dict(build_checkpoints(MOVES))[32]).to_fen())
+        with self.assertRaises(ValueError):
+            board_at_ply(CODES, len(MOVES) + 1)
+
+    def test_iter_boards(self):
+        checkpoint = dict(build_checkpoints(MOVES))[16]
+        fens = [board.to_fen() for board in iter_boards(CODES, 30, 20, checkpoint)]
+        self.assertEqual([Chessboard.from_moves_list(MOVES[:ply]).to_fen() for ply in range(30, 41)], fens)
+
+
+if __name__ == '__main__':
+    unittest.main()
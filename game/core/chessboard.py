@@ -1,9 +1,57 @@
-from typing import List, Type
+import struct
+from typing import List, NamedTuple, Optional, Tuple, Type
 
+from game.core.attack_tables import RAYS, SLOPES_BETWEEN
 from game.core.field import Field
 from game.core.chesspiece import ChessPiece, PieceColor
 from game.core.position import Position, Move
 from game.core.chesspieces import King, Knight, Pawn, Rook, Bishop, Queen
+from game.core import zobrist
+
+
+_ALL_POSITIONS = tuple(Position.from_inx(i) for i in range(0, 64))
+
+# castling rights bits
+WHITE_SHORT_CASTLE = 1
+WHITE_LONG_CASTLE = 2
+BLACK_SHORT_CASTLE = 4
+BLACK_LONG_CASTLE = 8
+ALL_CASTLES = WHITE_SHORT_CASTLE | WHITE_LONG_CASTLE | BLACK_SHORT_CASTLE | BLACK_LONG_CASTLE
+
+# rights kept when a piece moves from or to the square - moving a king or rook, or capturing a rook, loses them
+_CASTLING_RIGHTS_KEPT = [ALL_CASTLES] * 64
+_CASTLING_RIGHTS_KEPT[4] = ALL_CASTLES & ~(WHITE_SHORT_CASTLE | WHITE_LONG_CASTLE)
+_CASTLING_RIGHTS_KEPT[0] = ALL_CASTLES & ~WHITE_LONG_CASTLE
+_CASTLING_RIGHTS_KEPT[7] = ALL_CASTLES & ~WHITE_SHORT_CASTLE
+_CASTLING_RIGHTS_KEPT[60] = ALL_CASTLES & ~(BLACK_SHORT_CASTLE | BLACK_LONG_CASTLE)
+_CASTLING_RIGHTS_KEPT[56] = ALL_CASTLES & ~BLACK_LONG_CASTLE
+_CASTLING_RIGHTS_KEPT[63] = ALL_CASTLES & ~BLACK_SHORT_CASTLE
+
+# squares each piece attacks from every square - rays walked until the first piece for the sliders,
+# single steps for the others
+_ATTACK_RAYS = {piece: tuple(piece.get_rays(inx) for inx in range(64))
+                for piece in (piece_type(color) for piece_type in (Rook, Bishop, Queen) for color in PieceColor)}
+_ATTACK_STEPS = {
+    **{piece: tuple(piece.get_targets(inx) for inx in range(64))
+       for piece in (piece_type(color) for piece_type in (Knight, King) for color in PieceColor)},
+    **{Pawn(color): tuple(Pawn(color).get_attack_targets(inx) for inx in range(64)) for color in PieceColor}}
+
+
+# everything push() changes that can't be derived from the move itself
+class UndoRecord(NamedTuple):
+    move: Move
+    piece: ChessPiece
+    captured: Optional[ChessPiece]
+    captured_inx: int
+    rook_move: Optional[Move]
+    castling_rights: int
+    last_move: Optional[Move]
+    en_passant_square: Optional[int]
+    halfmove_clock: int
+    special_move_info: Tuple[bool, bool, bool]
+    zobrist_hash: int
+    attackers: Tuple[int, ...]
+    color_squares: Tuple[int, int]
 
 
 class Chessboard:
@@ -18,6 +66,27 @@ class Chessboard:
         self._last_move_enpassant = False
         self._last_move_castled = False
         self._last_move = None
+        self._en_passant_square = None
+        self._castling_rights = ALL_CASTLES
+        self._turn = PieceColor.WHITE
+        # plies since the last capture or pawn move, and the number of the move being played
+        self._halfmove_clock = 0
+        self._fullmove_number = 1
+        self._undo_stack: List[UndoRecord] = []
+        self._hash = self.compute_hash()
+        # _attackers[inx] - squares of the pieces of both colors attacking inx, kept up to date by _set_piece
+        # and restored by pop
+        self._attackers = [0] * 64
+        self._color_squares = {PieceColor.WHITE: 0, PieceColor.BLACK: 0}
+        for inx, piece in enumerate(self._pieces):
+            if piece is not None:
+                self._color_squares[piece.get_color()] |= 1 << inx
+                self._toggle_attacks(inx, piece)
+        # how many times each position hash occurred in this game, for repetition draws
+        self._position_counts = {self._hash: 1}
+        # plies and recent position hashes of a board restored from a snapshot, before its undo stack
+        self._base_ply = 0
+        self._base_hashes: List[int] = []
 
     def did_last_move_promote(self):
         return self._last_move_promoted
@@ -25,27 +94,158 @@ class Chessboard:
     def get_piece(self, position: Position) -> ChessPiece:
         return self._pieces[position.inx()]
 
+    def piece_at(self, inx: int) -> ChessPiece:
+        return self._pieces[inx]
+
     def is_empty(self, position: Position):
         return self._pieces[position.inx()] is None
 
     def make_move(self, move: Move):
+        self.push(move)
+
+    # make a move and remember how to take it back with pop()
+    def push(self, move: Move) -> None:
+        start_inx = move.get_start().inx()
+        end_inx = move.get_end().inx()
+        piece = self._pieces[start_inx]
+        rook_move = self.get_castle_rook_move(king_move=move) if self.is_castle(move) else None
+        captured_inx = end_inx
+        if self.is_en_passant(move):
+            captured_inx = Position(move.get_end().x(), move.get_start().y()).inx()
+
+        self._undo_stack.append(UndoRecord(
+            move=move,
+            piece=piece,
+            captured=self._pieces[captured_inx],
+            captured_inx=captured_inx,
+            rook_move=rook_move,
+            castling_rights=self._castling_rights,
+            last_move=self._last_move,
+            en_passant_square=self._en_passant_square,
+            halfmove_clock=self._halfmove_clock,
+            special_move_info=(self._last_move_promoted, self._last_move_castled, self._last_move_enpassant),
+            zobrist_hash=self._hash,
+            attackers=tuple(self._attackers),
+            color_squares=(self._color_squares[PieceColor.WHITE], self._color_squares[PieceColor.BLACK])))
+
+        self._hash ^= self._state_hash()
         self.reset_special_move_info()
-        if self.is_castle(move):
-            self.move_rook_on_castle(king_move=move)
+        if rook_move is not None:
+            self._move_piece(rook_move)
             self._last_move_castled = True
-        self._pieces[move.get_end().inx()] = self._pieces[move.get_start().inx()]
-        self._pieces[move.get_end().inx()].mark_moved()
-        if any(map(lambda enp_move: enp_move == move, self.get_possible_en_passant_moves())):
+        if captured_inx != end_inx:
+            self._set_piece(captured_inx, None)
             self._last_move_enpassant = True
-            pos_to_clear = Position(move.get_end().x(),
-                                    move.get_start().y())
-            self._pieces[pos_to_clear.inx()] = None
+        self._move_piece(move)
 
-        self._pieces[move.get_start().inx()] = None
         self._last_move = move
+        self._en_passant_square = self._find_en_passant_square(move)
+        self._castling_rights &= _CASTLING_RIGHTS_KEPT[start_inx] & _CASTLING_RIGHTS_KEPT[end_inx]
+        is_irreversible = isinstance(piece, Pawn) or self._undo_stack[-1].captured is not None
+        self._halfmove_clock = 0 if is_irreversible else self._halfmove_clock + 1
+        if self._turn is PieceColor.BLACK:
+            self._fullmove_number += 1
+        self._turn = PieceColor.enemy_color(self._turn)
         if self.can_promote():
             self.promote_to_queen(move.get_end())
             self._last_move_promoted = True
+        self._hash ^= self._state_hash()
+        self._position_counts[self._hash] = self._position_counts.get(self._hash, 0) + 1
+
+    # take back the last pushed move
+    def pop(self) -> Move:
+        record = self._undo_stack.pop()
+        if self._position_counts[self._hash] == 1:
+            del self._position_counts[self._hash]
+        else:
+            self._position_counts[self._hash] -= 1
+        move = record.move
+        self._restore_piece(move.get_end().inx(), None)
+        self._restore_piece(record.captured_inx, record.captured)
+        self._restore_piece(move.get_start().inx(), record.piece)
+        if record.rook_move is not None:
+            rook = self.get_piece(record.rook_move.get_end())
+            self._restore_piece(record.rook_move.get_end().inx(), None)
+            self._restore_piece(record.rook_move.get_start().inx(), rook)
+        self._attackers = list(record.attackers)
+        self._color_squares = {PieceColor.WHITE: record.color_squares[0], PieceColor.BLACK: record.color_squares[1]}
+
+        self._last_move = record.last_move
+        self._en_passant_square = record.en_passant_square
+        self._castling_rights = record.castling_rights
+        self._halfmove_clock = record.halfmove_clock
+        if self._turn is PieceColor.WHITE:
+            self._fullmove_number -= 1
+        self._last_move_promoted, self._last_move_castled, self._last_move_enpassant = record.special_move_info
+        self._turn = PieceColor.enemy_color(self._turn)
+        self._hash = record.zobrist_hash
+        return move
+
+    def get_ply(self) -> int:
+        return self._base_ply + len(self._undo_stack)
+
+    def get_turn(self) -> PieceColor:
+        return self._turn
+
+    def get_halfmove_clock(self) -> int:
+        return self._halfmove_clock
+
+    def get_fullmove_number(self) -> int:
+        return self._fullmove_number
+
+    # how many times the current position occurred, including now
+    def get_repetition_count(self) -> int:
+        return self._position_counts[self._hash]
+
+    # neither side can ever checkmate: kings with at most one minor piece, or only bishops on one square color
+    def has_insufficient_material(self) -> bool:
+        pieces = [(inx, piece) for inx, piece in enumerate(self._pieces)
+                  if piece is not None and not isinstance(piece, King)]
+        if len(pieces) <= 1:
+            return all(isinstance(piece, (Knight, Bishop)) for _, piece in pieces)
+        return all(isinstance(piece, Bishop) for _, piece in pieces) and \
+            len({(inx % 8 + inx // 8) % 2 for inx, _ in pieces}) == 1
+
+    # hashes of the positions since the last capture or pawn move, oldest first - the only ones
+    # the current position can repeat
+    def get_recent_hashes(self) -> List[int]:
+        if self._halfmove_clock == 0:
+            return []
+        return (self._base_hashes + [record.zobrist_hash for record in self._undo_stack])[-self._halfmove_clock:]
+
+    # Zobrist hash of pieces, side to move, castling rights and en-passant square, kept up to date by push/pop
+    def get_hash(self) -> int:
+        return self._hash
+
+    def compute_hash(self) -> int:
+        pieces_hash = 0
+        for inx, piece in enumerate(self._pieces):
+            pieces_hash ^= zobrist.piece_key(piece, inx)
+        return pieces_hash ^ self._state_hash()
+
+    def _state_hash(self) -> int:
+        state_hash = zobrist.CASTLING_KEYS[self.get_castling_rights()]
+        if self._turn is PieceColor.BLACK:
+            state_hash ^= zobrist.BLACK_TO_MOVE_KEY
+        # the square only matters for the position when the capture is actually possible
+        if self.get_possible_en_passant_moves():
+            state_hash ^= zobrist.EN_PASSANT_KEYS[self._en_passant_square % 8]
+        return state_hash
+
+    # castling rights bits, lost for good once the king or the rook moves
+    def get_castling_rights(self) -> int:
+        return self._castling_rights
+
+    def _move_piece(self, move: Move) -> None:
+        piece = self._pieces[move.get_start().inx()]
+        self._set_piece(move.get_end().inx(), piece)
+        self._set_piece(move.get_start().inx(), None)
+
+    def _find_en_passant_square(self, move: Move):
+        if not isinstance(self.get_piece(move.get_end()), Pawn) or \
+                abs(move.get_start().y() - move.get_end().y()) != 2:
+            return None
+        return Position(move.get_end().x(), (move.get_start().y() + move.get_end().y()) // 2).inx()
 
     def reset_special_move_info(self):
         self._last_move_promoted = False
@@ -63,9 +263,75 @@ class Chessboard:
         return isinstance(piece, Pawn) and ((piece.get_color() == PieceColor.WHITE and position.y() == 7) or
                                             (piece.get_color() == PieceColor.BLACK and position.y() == 0))
 
+    # whether the move would take a pawn to the last row
+    def is_promotion(self, move: Move) -> bool:
+        return isinstance(self.get_piece(move.get_start()), Pawn) and move.get_end().y() in (0, 7)
+
     def promote_to_queen(self, position: Position):
         current_color = self.get_piece(position).get_color()
-        self._pieces[position.inx()] = Queen(current_color)
+        self._set_piece(position.inx(), Queen(current_color))
+
+    def _set_piece(self, inx: int, piece: ChessPiece) -> None:
+        old_piece = self._pieces[inx]
+        self._hash ^= zobrist.piece_key(old_piece, inx) ^ zobrist.piece_key(piece, inx)
+        if old_piece is not None:
+            self._toggle_attacks(inx, old_piece)
+            self._color_squares[old_piece.get_color()] ^= 1 << inx
+        self._pieces[inx] = piece
+        if (old_piece is None) is not (piece is None):
+            self._toggle_rays_through(inx)
+        if piece is not None:
+            self._toggle_attacks(inx, piece)
+            self._color_squares[piece.get_color()] ^= 1 << inx
+
+    # pop() puts the pieces back without _set_piece's bookkeeping - the hash and the attack maps
+    # are restored from the undo record
+    def _restore_piece(self, inx: int, piece: ChessPiece) -> None:
+        self._pieces[inx] = piece
+
+    # adds or removes the piece's attacks, which only depend on the other squares
+    def _toggle_attacks(self, inx: int, piece: ChessPiece) -> None:
+        bit = 1 << inx
+        attackers = self._attackers
+        rays = _ATTACK_RAYS.get(piece)
+        if rays is None:
+            for target in _ATTACK_STEPS[piece][inx]:
+                attackers[target] ^= bit
+            return
+        pieces = self._pieces
+        for ray in rays[inx]:
+            for target in ray:
+                attackers[target] ^= bit
+                if pieces[target] is not None:
+                    break
+
+    # the square got occupied or emptied - sliders attacking it now stop there or see past it
+    def _toggle_rays_through(self, inx: int) -> None:
+        attackers = self._attackers
+        pieces = self._pieces
+        sources = attackers[inx]
+        while sources:
+            bit = sources & -sources
+            sources ^= bit
+            start_inx = bit.bit_length() - 1
+            if pieces[start_inx] not in _ATTACK_RAYS:
+                continue
+            for target in RAYS[SLOPES_BETWEEN[start_inx][inx]][inx]:
+                attackers[target] ^= bit
+                if pieces[target] is not None:
+                    break
+
+    # squares of the pieces attacking inx, of one color or of both
+    def attackers_of(self, inx: int, by_color: PieceColor = None) -> int:
+        if by_color is None:
+            return self._attackers[inx]
+        return self._attackers[inx] & self._color_squares[by_color]
+
+    def is_attacked(self, inx: int, by_color: PieceColor) -> bool:
+        return bool(self._attackers[inx] & self._color_squares[by_color])
+
+    def attack_count(self, inx: int, by_color: PieceColor) -> int:
+        return bin(self.attackers_of(inx, by_color)).count('1')
 
     def get_all_pieces_positions(self):
         return [*self.get_pieces_positions_by_color(PieceColor.WHITE),
@@ -80,34 +346,32 @@ class Chessboard:
                            self.get_all_pieces_positions()))
 
     def get_possible_en_passant_moves(self) -> List[Move]:
-        last_move = self._last_move
-        if last_move is None:
-            return []
-        last_piece = self.get_piece(last_move.get_end())
-        if not isinstance(last_piece, Pawn):
-            return []
-
-        if not abs(last_move.get_start().y() - last_move.get_end().y()) == 2:
+        if self._en_passant_square is None:
             return []
 
-        move_end = last_move.get_end()
-        passed_pos = Position(move_end.x(), move_end.y() + (-1 if last_piece.get_color() is PieceColor.WHITE else 1))
+        # the pawn that passed the square stands one row further from its own side
+        passed_pos = Position.from_inx(self._en_passant_square)
+        move_end = Position(passed_pos.x(), 3 if passed_pos.y() == 2 else 4)
+        enemy_color = PieceColor.enemy_color(self.get_piece(move_end).get_color())
         attacker_positions = [Position(move_end.x() - 1, move_end.y()), Position(move_end.x() + 1, move_end.y())]
         attacker_positions = list(filter(Position.is_valid, attacker_positions))
-        attacker_positions = list(
-            filter(lambda pos: pos in self.get_pieces_positions_by_type(Pawn), attacker_positions))
-        attacker_positions = list(
-            filter(lambda pos: pos in self.get_pieces_positions_by_color(PieceColor.enemy_color(last_piece.get_color())),
-                   attacker_positions))
+        attacker_positions = list(filter(lambda pos: isinstance(self.get_piece(pos), Pawn) and
+                                         self.get_piece(pos).get_color() is enemy_color, attacker_positions))
         return [Move(attacker_pos, passed_pos) for attacker_pos in attacker_positions]
 
+    def get_en_passant_square(self):
+        return self._en_passant_square
+
+    def is_en_passant(self, move: Move) -> bool:
+        return move in self.get_possible_en_passant_moves()
+
     def is_castle(self, move: Move) -> bool:
 
         piece = self.get_piece(move.get_start())
         x_diff = abs(move.get_start().x() - move.get_end().x())
-        return not piece.has_moved() and isinstance(piece, King) and x_diff > 1
+        return isinstance(piece, King) and x_diff > 1
 
-    def move_rook_on_castle(self, king_move: Move):
+    def get_castle_rook_move(self, king_move: Move) -> Move:
         x_diff = king_move.get_end().x() - king_move.get_start().x()
         y = king_move.get_start().y()
         rook_pos = None
@@ -120,7 +384,18 @@ class Chessboard:
             # short castle
             rook_pos = Position(7, y)
             move_to = Position(5, y)
-        self.make_move(Move(rook_pos, move_to))
+        return Move(rook_pos, move_to)
+
+    # independent board in the same position; pieces are shared flyweights, so only lists are copied
+    def copy(self):
+        board = object.__new__(type(self))
+        board.__dict__.update(self.__dict__)
+        board._pieces = list(self._pieces)
+        board._undo_stack = list(self._undo_stack)
+        board._position_counts = dict(self._position_counts)
+        board._attackers = list(self._attackers)
+        board._color_squares = dict(self._color_squares)
+        return board
 
     def get_rows(self, perspective: PieceColor) -> List[List[Field]]:
         row_range = range(0, 8) if perspective == PieceColor.BLACK else range(7, -1, -1)
@@ -145,7 +420,7 @@ class Chessboard:
 
     @staticmethod
     def all_positions():
-        return [Position.from_inx(i) for i in range(0, 64)]
+        return list(_ALL_POSITIONS)
 
     @staticmethod
     def _new_bottom_line(color: PieceColor) -> List[ChessPiece]:
@@ -156,10 +431,155 @@ class Chessboard:
     def _new_pawn_line(color: PieceColor) -> List[Pawn]:
         return [Pawn(color)] * 8
 
-    @staticmethod
-    def from_moves_list(moves: List[Move]):
-        chessboard = Chessboard()
+    # Board in the position described by a FEN record. Only the board is required,
+    # missing side to move, castling, en-passant and clock fields take their initial values.
+    @classmethod
+    def from_fen(cls, fen: str):
+        fields = fen.split()
+        if not 1 <= len(fields) <= 6:
+            raise ValueError(f"Invalid FEN '{fen}': expected 1 to 6 fields")
+        placement, turn, castling, en_passant, halfmove_clock, fullmove_number = \
+            fields + ['w', '-', '-', '0', '1'][len(fields) - 1:]
+
+        rows = placement.split('/')
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN '{fen}': expected 8 rows")
+        pieces = []
+        for row in reversed(rows):
+            row_pieces = []
+            for char in row:
+                if char.isdigit():
+                    row_pieces.extend([None] * int(char))
+                elif char in _FEN_PIECES:
+                    row_pieces.append(_FEN_PIECES[char])
+                else:
+                    raise ValueError(f"Invalid FEN '{fen}': unknown piece '{char}'")
+            if len(row_pieces) != 8:
+                raise ValueError(f"Invalid FEN '{fen}': row '{row}' does not have 8 fields")
+            pieces.extend(row_pieces)
+
+        if turn not in ('w', 'b') or not all(char in _FEN_CASTLES for char in castling.strip('-')):
+            raise ValueError(f"Invalid FEN '{fen}': bad side to move or castling rights")
+        if en_passant != '-' and not (len(en_passant) == 2 and en_passant[0] in 'abcdefgh' and en_passant[1] in '36'):
+            raise ValueError(f"Invalid FEN '{fen}': bad en-passant square '{en_passant}'")
+        en_passant_square = None if en_passant == '-' else Position.from_str(en_passant).inx()
+        if en_passant_square is not None:
+            # the pawn that just passed the square stands in front of it, seen from its own side
+            passed_color = PieceColor.WHITE if en_passant[1] == '3' else PieceColor.BLACK
+            step = 8 if passed_color is PieceColor.WHITE else -8
+            if turn != ('b' if passed_color is PieceColor.WHITE else 'w') \
+                    or pieces[en_passant_square + step] is not Pawn(passed_color) \
+                    or pieces[en_passant_square] is not None or pieces[en_passant_square - step] is not None:
+                raise ValueError(f"Invalid FEN '{fen}': no pawn has just passed en-passant square '{en_passant}'")
+        for char in castling.strip('-'):
+            color = PieceColor.WHITE if char.isupper() else PieceColor.BLACK
+            row = 0 if color is PieceColor.WHITE else 56
+            if pieces[row + 4] is not King(color) or pieces[row + (7 if char in 'Kk' else 0)] is not Rook(color):
+                raise ValueError(f"Invalid FEN '{fen}': castling right '{char}' without the king and rook "
+                                 f"on their home squares")
+        try:
+            halfmove_clock = int(halfmove_clock)
+            fullmove_number = int(fullmove_number)
+        except ValueError:
+            raise ValueError(f"Invalid FEN '{fen}': bad move clocks")
+
+        board = cls()
+        for inx, piece in enumerate(pieces):
+            board._set_piece(inx, piece)
+        board._turn = PieceColor.WHITE if turn == 'w' else PieceColor.BLACK
+        board._castling_rights = sum(_FEN_CASTLES[char] for char in set(castling.strip('-')))
+        board._en_passant_square = en_passant_square
+        board._halfmove_clock = halfmove_clock
+        board._fullmove_number = fullmove_number
+        board._hash = board.compute_hash()
+        board._position_counts = {board._hash: 1}
+        return board
+
+    def to_fen(self) -> str:
+        rows = []
+        for y in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for piece in self._pieces[8 * y: 8 * (y + 1)]:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += _FEN_CODES[(type(piece), piece.get_color())]
+            rows.append(row + (str(empty) if empty else ''))
+
+        castling = ''.join(char for char, right in _FEN_CASTLES.items() if self._castling_rights & right) or '-'
+        # like the position hash, the en-passant square is only written when the capture is possible
+        en_passant = str(Position.from_inx(self._en_passant_square)) if self.get_possible_en_passant_moves() else '-'
+        turn = 'w' if self._turn is PieceColor.WHITE else 'b'
+        return f"{'/'.join(rows)} {turn} {castling} {en_passant} {self._halfmove_clock} {self._fullmove_number}"
+
+    # Compact binary record of the position: everything FEN holds, the ply, the hash and the recent
+    # position hashes, so that repetitions are still detected on the restored board
+    def to_snapshot(self) -> bytes:
+        squares = bytes(_SNAPSHOT_CODES[self._pieces[inx]] | _SNAPSHOT_CODES[self._pieces[inx + 1]] << 4
+                        for inx in range(0, 64, 2))
+        flags = (self._turn is PieceColor.BLACK) | self._castling_rights << 1
+        en_passant = 255 if self._en_passant_square is None else self._en_passant_square
+        recent_hashes = self.get_recent_hashes()
+        return _SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, squares, flags, en_passant, self._halfmove_clock,
+                                     self._fullmove_number, self.get_ply(), self._hash) + \
+            struct.pack(f'<{len(recent_hashes)}Q', *recent_hashes)
+
+    # Board restored from to_snapshot(), in constant time. Its ply continues from the snapshot's,
+    # but moves made before it can't be popped.
+    @classmethod
+    def from_snapshot(cls, snapshot: bytes):
+        if len(snapshot) < _SNAPSHOT_HEADER.size or (len(snapshot) - _SNAPSHOT_HEADER.size) % 8 \
+                or snapshot[0] != SNAPSHOT_VERSION:
+            raise ValueError('Invalid position snapshot')
+        _, squares, flags, en_passant, halfmove_clock, fullmove_number, ply, position_hash = \
+            _SNAPSHOT_HEADER.unpack_from(snapshot)
+        board = cls()
+        for inx in range(64):
+            code = squares[inx // 2] >> 4 * (inx % 2) & 0xF
+            if code not in _SNAPSHOT_PIECES:
+                raise ValueError(f'Invalid position snapshot: unknown piece code {code}')
+            board._set_piece(inx, _SNAPSHOT_PIECES[code])
+        board._turn = PieceColor.BLACK if flags & 1 else PieceColor.WHITE
+        board._castling_rights = flags >> 1 & ALL_CASTLES
+        board._en_passant_square = None if en_passant == 255 else en_passant
+        board._halfmove_clock = halfmove_clock
+        board._fullmove_number = fullmove_number
+        board._base_ply = ply
+        board._base_hashes = list(struct.unpack_from(f'<{(len(snapshot) - _SNAPSHOT_HEADER.size) // 8}Q',
+                                                     snapshot, _SNAPSHOT_HEADER.size))
+        board._hash = board.compute_hash()
+        if board._hash != position_hash:
+            raise ValueError('Invalid position snapshot: position hash does not match')
+        board._position_counts = {}
+        for recent_hash in board._base_hashes + [board._hash]:
+            board._position_counts[recent_hash] = board._position_counts.get(recent_hash, 0) + 1
+        return board
+
+    @classmethod
+    def from_moves_list(cls, moves: List[Move]):
+        chessboard = cls()
         for move in moves:
             chessboard.make_move(move)
 
         return chessboard
+
+
+_FEN_PIECES = {piece_type(color).get_code().upper() if color is PieceColor.WHITE
+               else piece_type(color).get_code().lower(): piece_type(color)
+               for piece_type in (Pawn, Knight, Bishop, Rook, Queen, King)
+               for color in (PieceColor.WHITE, PieceColor.BLACK)}
+_FEN_CODES = {(type(piece), piece.get_color()): char for char, piece in _FEN_PIECES.items()}
+_FEN_CASTLES = {'K': WHITE_SHORT_CASTLE, 'Q': WHITE_LONG_CASTLE, 'k': BLACK_SHORT_CASTLE, 'q': BLACK_LONG_CASTLE}
+
+# snapshot layout: version, 4 bits per square, side to move and castling rights, en-passant square,
+# halfmove clock, fullmove number, ply and Zobrist hash, then the recent position hashes
+SNAPSHOT_VERSION = 1
+_SNAPSHOT_HEADER = struct.Struct('<B32sBBHHHQ')
+_SNAPSHOT_PIECES = {0: None, **{code + 8 * (color is PieceColor.BLACK): piece_type(color)
+                                for code, piece_type in enumerate((Pawn, Knight, Bishop, Rook, Queen, King), start=1)
+                                for color in (PieceColor.WHITE, PieceColor.BLACK)}}
+_SNAPSHOT_CODES = {piece: code for code, piece in _SNAPSHOT_PIECES.items()}
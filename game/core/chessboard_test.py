@@ -44,6 +44,213 @@ class ChessboardTestCase(unittest.TestCase):
         board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'd7d5', 'e4e5', 'f7f5']))
         self.assertEqual('e5f6', str(board.get_possible_en_passant_moves().pop()))
 
+    def test_push_pop_restores_board(self):
+        codes = ['e2e4', 'g8f6', 'e4e5', 'd7d5', 'e5d6', 'c7d6', 'g1f3', 'b8c6', 'f1e2', 'c8f5', 'e1g1', 'd8d7']
+        board = cb.Chessboard()
+        snapshots = []
+        for code in codes:
+            snapshots.append(board_snapshot(board))
+            board.push(cb.Move.from_str(code))
+        self.assertEqual(len(codes), board.get_ply())
+        self.assertTrue(board.get_special_move_info()['castled'] is False)
+        for code in reversed(codes):
+            self.assertEqual(code, str(board.pop()))
+            self.assertEqual(snapshots.pop(), board_snapshot(board))
+
+    def test_pop_en_passant_and_castle(self):
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'a7a6', 'e4e5', 'd7d5']))
+        before = board_snapshot(board)
+        board.push(cb.Move.from_str('e5d6'))
+        self.assertTrue(board.get_special_move_info()['enpassant'])
+        self.assertTrue(board.is_empty(cb.Position.from_str('d5')))
+        board.pop()
+        self.assertEqual(before, board_snapshot(board))
+        self.assertEqual(cb.PieceColor.WHITE, board.get_turn())
+
+    def test_incremental_hash_matches_full_hash(self):
+        codes = ['e2e4', 'g8f6', 'e4e5', 'd7d5', 'e5d6', 'c7d6', 'g1f3', 'b8c6', 'f1e2', 'c8f5', 'e1g1', 'd8d7']
+        board = cb.Chessboard()
+        for code in codes:
+            board.push(cb.Move.from_str(code))
+            self.assertEqual(board.compute_hash(), board.get_hash())
+        for _ in codes:
+            board.pop()
+            self.assertEqual(board.compute_hash(), board.get_hash())
+
+    def test_hash_of_transposed_positions(self):
+        start_hash = cb.Chessboard().get_hash()
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['g1f3', 'g8f6', 'f3g1', 'f6g8']))
+        self.assertEqual(start_hash, board.get_hash())
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['g1f3', 'g8f6', 'f3g1']))
+        self.assertNotEqual(start_hash, board.get_hash())
+        # same pieces, but the king has lost its castling rights
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'e7e5', 'e1e2', 'e8e7', 'e2e1', 'e7e8']))
+        board_with_rights = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'e7e5', 'g1f3', 'g8f6',
+                                                                                 'f3g1', 'f6g8']))
+        self.assertEqual(0, board.get_castling_rights())
+        self.assertNotEqual(board.get_hash(), board_with_rights.get_hash())
+
+    def test_castling_rights(self):
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'e7e5', 'g1f3', 'g8f6', 'h1g1']))
+        self.assertEqual(cb.ALL_CASTLES & ~cb.WHITE_SHORT_CASTLE, board.get_castling_rights())
+        board.push(cb.Move.from_str('e8e7'))
+        self.assertEqual(cb.WHITE_LONG_CASTLE, board.get_castling_rights())
+        board.pop()
+        board.pop()
+        self.assertEqual(cb.ALL_CASTLES, board.get_castling_rights())
+
+    def test_pieces_are_flyweights(self):
+        board = cb.Chessboard()
+        self.assertIs(board.piece_at(8), board.piece_at(15))
+        self.assertIs(cb.Queen(cb.PieceColor.WHITE), board.get_piece(cb.Position.from_str('d1')))
+        with self.assertRaises(AttributeError):
+            board.piece_at(8).color = cb.PieceColor.BLACK
+
+    def test_copy_is_independent(self):
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'e7e5']))
+        board_copy = board.copy()
+        board_copy.push(cb.Move.from_str('g1f3'))
+        self.assertTrue(board.is_empty(cb.Position.from_str('f3')))
+        self.assertEqual(2, board.get_ply())
+        board_copy.pop()
+        self.assertEqual(board.get_hash(), board_copy.get_hash())
+
+    def test_attack_maps(self):
+        board = cb.Chessboard()
+        f3 = cb.Position.from_str('f3').inx()
+        self.assertTrue(board.is_attacked(f3, cb.PieceColor.WHITE))
+        self.assertFalse(board.is_attacked(f3, cb.PieceColor.BLACK))
+        self.assertEqual((1 << cb.Position.from_str('g1').inx()) | (1 << cb.Position.from_str('e2').inx())
+                         | (1 << cb.Position.from_str('g2').inx()), board.attackers_of(f3))
+        self.assertEqual(3, board.attack_count(f3, cb.PieceColor.WHITE))
+        board.push(cb.Move.from_str('e2e4'))
+        h5 = cb.Position.from_str('h5').inx()
+        self.assertEqual(1 << cb.Position.from_str('d1').inx(), board.attackers_of(h5, cb.PieceColor.WHITE))
+
+    def test_attack_maps_follow_push_and_pop(self):
+        # en passant, castling by both sides, a promotion with capture
+        codes = ['e2e4', 'g8f6', 'e4e5', 'd7d5', 'e5d6', 'e7e6', 'd6c7', 'f8e7', 'g1f3', 'e8g8', 'f1e2', 'h7h6',
+                 'e1g1', 'a7a6', 'c7d8']
+        board = cb.Chessboard()
+        for code in codes:
+            board.push(cb.Move.from_str(code))
+            self.assertEqual(scanned_attackers(board), [board.attackers_of(inx) for inx in range(64)])
+        board_copy = board.copy()
+        for _ in codes:
+            board.pop()
+            self.assertEqual(scanned_attackers(board), [board.attackers_of(inx) for inx in range(64)])
+        self.assertEqual(scanned_attackers(board_copy), [board_copy.attackers_of(inx) for inx in range(64)])
+
+    def test_fen_of_initial_position(self):
+        self.assertEqual('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', cb.Chessboard().to_fen())
+
+    def test_fen_round_trip(self):
+        fen = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b Kq - 3 17'
+        board = cb.Chessboard.from_fen(fen)
+        self.assertEqual(fen, board.to_fen())
+        self.assertEqual(cb.PieceColor.BLACK, board.get_turn())
+        self.assertEqual(cb.WHITE_SHORT_CASTLE | cb.BLACK_LONG_CASTLE, board.get_castling_rights())
+        self.assertEqual(board.compute_hash(), board.get_hash())
+
+    def test_fen_matches_played_moves(self):
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['e2e4', 'd7d5', 'e4e5', 'f7f5', 'g1f3']))
+        fen_board = cb.Chessboard.from_fen(board.to_fen())
+        self.assertEqual('rnbqkbnr/ppp1p1pp/8/3pPp2/8/5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 3', board.to_fen())
+        self.assertEqual(board.get_hash(), fen_board.get_hash())
+
+    def test_fen_en_passant(self):
+        board = cb.Chessboard.from_fen('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3')
+        self.assertEqual([cb.Move.from_str('e5f6')], board.get_possible_en_passant_moves())
+        board.push(cb.Move.from_str('e5f6'))
+        self.assertTrue(board.is_empty(cb.Position.from_str('f5')))
+        board.pop()
+        self.assertEqual('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', board.to_fen())
+
+    def test_move_clocks(self):
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(['g1f3', 'g8f6', 'f3g1']))
+        self.assertEqual((3, 2), (board.get_halfmove_clock(), board.get_fullmove_number()))
+        board.push(cb.Move.from_str('e7e5'))
+        self.assertEqual((0, 3), (board.get_halfmove_clock(), board.get_fullmove_number()))
+        board.pop()
+        self.assertEqual((3, 2), (board.get_halfmove_clock(), board.get_fullmove_number()))
+
+    def test_invalid_fen(self):
+        for fen in ['', '8/8/8 w - - 0 1', 'rnbqkbnr/ppppxppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+                    '9/8/8/8/8/8/8/8 w - - 0 1', '8/8/8/8/8/8/8/8 x - - 0 1', '8/8/8/8/8/8/8/8 w - z9 0 1']:
+            with self.assertRaises(ValueError):
+                cb.Chessboard.from_fen(fen)
+
+    def test_fen_en_passant_square_needs_passed_pawn(self):
+        for fen in ['rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b KQkq e3 0 1',
+                    'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e3 0 1',
+                    'rnbqkbnr/pppppppp/8/8/4P3/4N3/PPPP1PPP/RNBQKB1R b KQkq e3 0 1',
+                    'rnbqkbnr/ppp1pppp/8/4P3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2']:
+            with self.assertRaises(ValueError):
+                cb.Chessboard.from_fen(fen)
+        board = cb.Chessboard.from_fen('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1')
+        self.assertEqual(cb.Position.from_str('e3').inx(), board.get_en_passant_square())
+
+    def test_fen_castling_needs_king_and_rook_at_home(self):
+        for fen in ['4k3/8/8/8/8/8/8/R3K3 w K - 0 1', '4k3/8/8/8/8/8/8/R4K2 w Q - 0 1',
+                    'r3k3/8/8/8/8/8/8/4K3 w k - 0 1', '1r2k3/8/8/8/8/8/8/4K3 w q - 0 1']:
+            with self.assertRaises(ValueError):
+                cb.Chessboard.from_fen(fen)
+        self.assertEqual(cb.WHITE_LONG_CASTLE | cb.BLACK_SHORT_CASTLE,
+                         cb.Chessboard.from_fen('4k2r/8/8/8/8/8/8/R3K3 w Qk - 0 1').get_castling_rights())
+
+    def test_position_snapshot(self):
+        codes = ['e2e4', 'd7d5', 'g1f3', 'g8f6', 'f3g1', 'f6g8']
+        board = cb.Chessboard.from_moves_list(cb.Move.from_str_list(codes))
+        restored = cb.Chessboard.from_snapshot(board.to_snapshot())
+        self.assertEqual(board.to_fen(), restored.to_fen())
+        self.assertEqual(board.get_hash(), restored.get_hash())
+        self.assertEqual(6, restored.get_ply())
+        self.assertEqual(2, restored.get_repetition_count())
+        self.assertEqual(board.to_snapshot(), restored.to_snapshot())
+        # the moves made after the snapshot can be taken back, the earlier ones can't
+        for code in ['g1f3', 'g8f6', 'f3g1', 'f6g8']:
+            restored.push(cb.Move.from_str(code))
+            board.push(cb.Move.from_str(code))
+        self.assertEqual(3, restored.get_repetition_count())
+        self.assertEqual(board.to_snapshot(), restored.to_snapshot())
+        for _ in range(4):
+            restored.pop()
+        with self.assertRaises(IndexError):
+            restored.pop()
+
+    def test_invalid_snapshot(self):
+        snapshot = cb.Chessboard().to_snapshot()
+        for invalid in [b'', snapshot[:-1], b'\x02' + snapshot[1:], snapshot[:-8] + bytes(8)]:
+            with self.assertRaises(ValueError):
+                cb.Chessboard.from_snapshot(invalid)
+
+
+def board_snapshot(board):
+    return (list(map(board.piece_at, range(64))), board.get_castling_rights(),
+            board.get_en_passant_square(), board.get_special_move_info(), board.get_turn())
+
+
+def scanned_attackers(board):
+    attackers = [0] * 64
+    for inx in range(64):
+        piece = board.piece_at(inx)
+        if isinstance(piece, cb.Pawn):
+            targets = piece.get_attack_targets(inx)
+        elif isinstance(piece, (cb.Knight, cb.King)):
+            targets = piece.get_targets(inx)
+        elif piece is not None:
+            targets = []
+            for ray in piece.get_rays(inx):
+                for target in ray:
+                    targets.append(target)
+                    if board.piece_at(target) is not None:
+                        break
+        else:
+            targets = []
+        for target in targets:
+            attackers[target] |= 1 << inx
+    return attackers
+
 
 if __name__ == '__main__':
     unittest.main()
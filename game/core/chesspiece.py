@@ -1,4 +1,4 @@
-from typing import Callable, List, Optional
+from typing import Tuple
 from abc import ABC, abstractmethod
 from enum import Enum
 
@@ -12,22 +12,39 @@ class PieceColor(Enum):
         return cls.WHITE if color is cls.BLACK else cls.BLACK
 
 
+# Pieces are immutable flyweights - there is one instance per piece type and color,
+# returned by the constructor. Whether a king or rook has moved is kept by the board as castling rights.
 class ChessPiece(ABC):
-    def __init__(self, color: PieceColor):
-        self.color = color
-        self.code = self.get_code()
-        self.symbol = self.get_symbol()
-        self._has_moved = False
+    __slots__ = ('color',)
+    _instances = {}
 
-    def get_color(self) -> PieceColor:
-        return self.color
+    def __new__(cls, color: PieceColor):
+        piece = ChessPiece._instances.get((cls, color))
+        if piece is None:
+            piece = super().__new__(cls)
+            object.__setattr__(piece, 'color', color)
+            ChessPiece._instances[(cls, color)] = piece
+        return piece
 
-    @abstractmethod
-    def get_move_mappers(self) -> List[Callable]:
-        pass
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return type(self), (self.color,)
 
-    def get_attack_mappers(self) -> Optional[List[Callable]]:
-        return None
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.color})"
+
+    @property
+    def code(self) -> str:
+        return self.get_code()
+
+    @property
+    def symbol(self) -> str:
+        return self.get_symbol()
+
+    def get_color(self) -> PieceColor:
+        return self.color
 
     @abstractmethod
     def get_code(self) -> str:
@@ -41,20 +58,28 @@ class ChessPiece(ABC):
     def has_dynamic_possible_moves(self):
         pass
 
-    def mark_moved(self) -> None:
-        self._has_moved = True
-
-    def has_moved(self) -> bool:
-        return self._has_moved
-
 
 # A piece that has constant possible moves
 class StaticChessPiece(ChessPiece, ABC):
+    __slots__ = ()
+
     def has_dynamic_possible_moves(self):
         return False
 
+    # squares reachable from inx on an empty board
+    @abstractmethod
+    def get_targets(self, inx: int) -> Tuple[int, ...]:
+        pass
+
 
 # A piece that has variable possible moves
 class DynamicChessPiece(ChessPiece, ABC):
+    __slots__ = ()
+
     def has_dynamic_possible_moves(self):
         return True
+
+    # rays walked from inx, each ordered from the nearest square
+    @abstractmethod
+    def get_rays(self, inx: int) -> Tuple[Tuple[int, ...], ...]:
+        pass
@@ -1,31 +1,13 @@
-from typing import Callable, List, Optional
-
-from game.core.position import Position
+from game.core.attack_tables import Squares, Rays, KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS, PAWN_PUSHES, \
+    ROOK_RAYS, BISHOP_RAYS, QUEEN_RAYS, ROOK_SLOPES, BISHOP_SLOPES
 from game.core.chesspiece import StaticChessPiece, DynamicChessPiece, PieceColor, ChessPiece
 
 
-def static_mapper(x_diff: int, y_diff: int) -> Callable:
-    return lambda start_pos: Position(start_pos.x() + x_diff, start_pos.y() + y_diff)
-
-
-def dynamic_mapper(x_diff_per_iter: int, y_diff_per_iter: int) -> Callable:
-    return lambda start_pos, iter_num: Position(start_pos.x() + iter_num * x_diff_per_iter,
-                                                start_pos.y() + iter_num * y_diff_per_iter)
-
-
 class Knight(StaticChessPiece):
-    def get_move_mappers(self) -> List[Callable]:
-        x_offsets = [1, 2, 2, 1]
-        y_offsets = [2, 1, -1, -2]
+    __slots__ = ()
 
-        positive_mappers = [static_mapper(x, y)
-                            for x, y in zip(x_offsets, y_offsets)]
-        x_offsets = list(map(lambda n: -n, x_offsets))
-        y_offsets = list(map(lambda n: -n, y_offsets))
-        negative_mappers = [static_mapper(x, y)
-                            for x, y in zip(x_offsets, y_offsets)]
-
-        return positive_mappers + negative_mappers
+    def get_targets(self, inx: int) -> Squares:
+        return KNIGHT_TARGETS[inx]
 
     def get_code(self) -> str:
         return 'N'
@@ -35,12 +17,10 @@ class Knight(StaticChessPiece):
 
 
 class King(StaticChessPiece):
-    def get_move_mappers(self) -> List[Callable]:
-        x_offsets = [0, 1, 1, 1, 0, -1, -1, -1]
-        y_offsets = [1, 1, 0, -1, -1, -1, 0, 1]
+    __slots__ = ()
 
-        return [static_mapper(x, y)
-                for x, y in zip(x_offsets, y_offsets)]
+    def get_targets(self, inx: int) -> Squares:
+        return KING_TARGETS[inx]
 
     def get_code(self) -> str:
         return 'K'
@@ -50,25 +30,21 @@ class King(StaticChessPiece):
 
 
 class Pawn(ChessPiece):
+    __slots__ = ()
+
     def has_dynamic_possible_moves(self):
         return True
 
-    def get_move_mappers(self) -> List[Callable]:
-        return [static_mapper(0, self._get_direction()),
-                lambda pos: self._start_double_move(pos)]
+    # squares in front of the pawn, two of them on its starting row
+    def get_push_ray(self, inx: int) -> Squares:
+        return PAWN_PUSHES[self._get_direction()][inx]
 
-    def get_attack_mappers(self) -> List[Callable]:
-        return [static_mapper(i, self._get_direction()) for i in (1, -1)]
+    def get_attack_targets(self, inx: int) -> Squares:
+        return PAWN_ATTACKS[self._get_direction()][inx]
 
     def _get_direction(self):
         return 1 if self.color == PieceColor.WHITE else -1 if self.color == PieceColor.BLACK else None
 
-    def _get_starting_y(self):
-        return 1 if self.color == PieceColor.WHITE else 6 if self.color == PieceColor.BLACK else None
-
-    def _start_double_move(self, pos) -> Optional[Position]:
-        return Position(pos.x(), pos.y() + 2 * self._get_direction()) if pos.y() == self._get_starting_y() else None
-
     def get_code(self) -> str:
         return 'p'
 
@@ -77,11 +53,11 @@ class Pawn(ChessPiece):
 
 
 class Bishop(DynamicChessPiece):
-    _slopes = [(1, 1), (1, -1), (-1, -1), (-1, 1)]
+    __slots__ = ()
+    _slopes = list(BISHOP_SLOPES)
 
-    def get_move_mappers(self) -> List[Callable]:
-        return [dynamic_mapper(x, y)
-                for x, y in Bishop._slopes]
+    def get_rays(self, inx: int) -> Rays:
+        return BISHOP_RAYS[inx]
 
     def get_code(self) -> str:
         return 'B'
@@ -95,11 +71,11 @@ class Bishop(DynamicChessPiece):
 
 
 class Rook(DynamicChessPiece):
-    _slopes = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    __slots__ = ()
+    _slopes = list(ROOK_SLOPES)
 
-    def get_move_mappers(self) -> List[Callable]:
-        return [dynamic_mapper(x, y)
-                for x, y in Rook._slopes]
+    def get_rays(self, inx: int) -> Rays:
+        return ROOK_RAYS[inx]
 
     def get_code(self) -> str:
         return 'R'
@@ -113,9 +89,10 @@ class Rook(DynamicChessPiece):
 
 
 class Queen(DynamicChessPiece):
-    def get_move_mappers(self) -> List[Callable]:
-        return [dynamic_mapper(x, y)
-                for x, y in Rook.get_slopes() + Bishop.get_slopes()]
+    __slots__ = ()
+
+    def get_rays(self, inx: int) -> Rays:
+        return QUEEN_RAYS[inx]
 
     def get_code(self) -> str:
         return 'Q'
@@ -0,0 +1,397 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from game.core.chessboard import Chessboard, Move
+from game.core.chesspiece import PieceColor
+from game.core.chesspieces import King, Knight, Pawn, Rook, Bishop, Queen
+from game.core.legal_moves import find_king, generate_legal_moves, is_square_attacked
+from game.core.move_codec import unpack_moves
+from game.core.opening_book import OpeningBook
+from game.core.tablebase import Tablebase, WIN, LOSS
+
+# Alpha-beta search with iterative deepening. Scores are in centipawns from the point of view
+# of the side to move; a mate in n plies scores MATE_SCORE - n.
+MATE_SCORE = 100000
+MAX_DEPTH = 64
+
+PIECE_VALUES = {Pawn: 100, Knight: 320, Bishop: 330, Rook: 500, Queen: 900, King: 0}
+
+# piece-square bonuses for white, rank 8 first as the board is usually drawn
+_PIECE_SQUARE_ROWS = {
+    Pawn: (0, 0, 0, 0, 0, 0, 0, 0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+           5, 5, 10, 25, 25, 10, 5, 5,
+           0, 0, 0, 20, 20, 0, 0, 0,
+           5, -5, -10, 0, 0, -10, -5, 5,
+           5, 10, 10, -20, -20, 10, 10, 5,
+           0, 0, 0, 0, 0, 0, 0, 0),
+    Knight: (-50, -40, -30, -30, -30, -30, -40, -50,
+             -40, -20, 0, 0, 0, 0, -20, -40,
+             -30, 0, 10, 15, 15, 10, 0, -30,
+             -30, 5, 15, 20, 20, 15, 5, -30,
+             -30, 0, 15, 20, 20, 15, 0, -30,
+             -30, 5, 10, 15, 15, 10, 5, -30,
+             -40, -20, 0, 5, 5, 0, -20, -40,
+             -50, -40, -30, -30, -30, -30, -40, -50),
+    Bishop: (-20, -10, -10, -10, -10, -10, -10, -20,
+             -10, 0, 0, 0, 0, 0, 0, -10,
+             -10, 0, 5, 10, 10, 5, 0, -10,
+             -10, 5, 5, 10, 10, 5, 5, -10,
+             -10, 0, 10, 10, 10, 10, 0, -10,
+             -10, 10, 10, 10, 10, 10, 10, -10,
+             -10, 5, 0, 0, 0, 0, 5, -10,
+             -20, -10, -10, -10, -10, -10, -10, -20),
+    Rook: (0, 0, 0, 0, 0, 0, 0, 0,
+           5, 10, 10, 10, 10, 10, 10, 5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           -5, 0, 0, 0, 0, 0, 0, -5,
+           0, 0, 0, 5, 5, 0, 0, 0),
+    Queen: (-20, -10, -10, -5, -5, -10, -10, -20,
+            -10, 0, 0, 0, 0, 0, 0, -10,
+            -10, 0, 5, 5, 5, 5, 0, -10,
+            -5, 0, 5, 5, 5, 5, 0, -5,
+            0, 0, 5, 5, 5, 5, 0, -5,
+            -10, 5, 5, 5, 5, 5, 0, -10,
+            -10, 0, 5, 0, 0, 0, 0, -10,
+            -20, -10, -10, -5, -5, -10, -10, -20),
+    King: (-30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -30, -40, -40, -50, -50, -40, -40, -30,
+           -20, -30, -30, -40, -40, -30, -30, -20,
+           -10, -20, -20, -20, -20, -20, -20, -10,
+           20, 20, 0, 0, 0, 0, 20, 20,
+           20, 30, 10, 0, 0, 10, 30, 20),
+}
+
+
+# material plus square bonus of every piece, indexed by square, for white and for black
+def _piece_square_values(piece_type, color: PieceColor) -> tuple:
+    rows = _PIECE_SQUARE_ROWS[piece_type]
+    if color is PieceColor.WHITE:
+        return tuple(PIECE_VALUES[piece_type] + rows[(7 - inx // 8) * 8 + inx % 8] for inx in range(64))
+    return tuple(PIECE_VALUES[piece_type] + rows[inx] for inx in range(64))
+
+
+_PIECE_SQUARE_VALUES = {piece_type(color): _piece_square_values(piece_type, color)
+                        for piece_type in _PIECE_SQUARE_ROWS for color in PieceColor}
+
+
+class SearchResult(NamedTuple):
+    # None when the side to move has no legal move
+    move: Optional[Move]
+    score: int
+    # deepest fully searched iteration
+    depth: int
+    nodes: int
+    seconds: float
+    # the move was taken from the opening book without searching
+    book: bool = False
+    # the move was taken from the endgame tablebase without searching
+    tablebase: bool = False
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {'move': str(self.move) if self.move is not None else None,
+                'score': self.score,
+                'depth': self.depth,
+                'nodes': self.nodes,
+                'seconds': round(self.seconds, 6),
+                'nodes_per_second': round(self.nodes_per_second(), 1),
+                'book': self.book,
+                'tablebase': self.tablebase}
+
+
+# material and piece-square evaluation from the point of view of the side to move
+def evaluate(board: Chessboard) -> int:
+    score = 0
+    for inx in range(64):
+        piece = board.piece_at(inx)
+        if piece is None:
+            continue
+        if piece.get_color() is PieceColor.WHITE:
+            score += _PIECE_SQUARE_VALUES[piece][inx]
+        else:
+            score -= _PIECE_SQUARE_VALUES[piece][inx]
+    return score if board.get_turn() is PieceColor.WHITE else -score
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+class _Search:
+    def __init__(self, board: Chessboard, time_limit: Optional[float], node_limit: Optional[int]):
+        self.board = board
+        self.node_limit = node_limit
+        self.start = time.perf_counter()
+        self.deadline = self.start + time_limit if time_limit is not None else None
+        self.nodes = 0
+        self.best_moves = {}
+
+    def _count_node(self) -> None:
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise _BudgetExhausted()
+        if self.deadline is not None and self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise _BudgetExhausted()
+
+    # previous best move of the position first, then captures by most valuable victim and least
+    # valuable attacker, then promotions
+    def _ordered(self, moves: List[Move]) -> List[Move]:
+        board = self.board
+        best_move = self.best_moves.get(board.get_hash())
+
+        def priority(move: Move) -> int:
+            if move is best_move:
+                return 100000
+            victim = board.piece_at(move.get_end().inx())
+            attacker = board.piece_at(move.get_start().inx())
+            value = 10 * PIECE_VALUES[type(victim)] - PIECE_VALUES[type(attacker)] // 10 \
+                if victim is not None else 0
+            if board.is_promotion(move):
+                value += PIECE_VALUES[Queen]
+            return value
+        return sorted(moves, key=priority, reverse=True)
+
+    def _is_tactical(self, move: Move) -> bool:
+        board = self.board
+        return board.piece_at(move.get_end().inx()) is not None or board.is_promotion(move) \
+            or board.is_en_passant(move)
+
+    def _is_draw(self) -> bool:
+        board = self.board
+        # a repetition inside the search is scored as a draw, the opponent would just repeat it again
+        return board.get_halfmove_clock() >= 100 or board.get_repetition_count() > 1 \
+            or board.has_insufficient_material()
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self._count_node()
+        board = self.board
+        if ply > 0 and self._is_draw():
+            return 0
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+        legal_moves = generate_legal_moves(board)
+        if not legal_moves.moves:
+            return -MATE_SCORE + ply if legal_moves.checkers else 0
+
+        best_score = -MATE_SCORE
+        best_move = None
+        for move in self._ordered(legal_moves.moves):
+            board.push(move)
+            try:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        self.best_moves[board.get_hash()] = best_move
+        return best_score
+
+    # captures and promotions only, or every evasion when in check, until the position is quiet.
+    # Legal moves are only generated when standing pat does not already cut off.
+    def quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        board = self.board
+        turn = board.get_turn()
+        king_inx = find_king(board, turn)
+        in_check = king_inx is not None and is_square_attacked(board, king_inx, PieceColor.enemy_color(turn))
+        if not in_check:
+            stand_pat = evaluate(board)
+            if stand_pat >= beta:
+                return stand_pat
+        legal_moves = generate_legal_moves(board).moves
+        if not legal_moves:
+            return -MATE_SCORE + ply if in_check else 0
+        if in_check:
+            best_score = -MATE_SCORE + ply
+        else:
+            best_score = stand_pat
+            alpha = max(alpha, stand_pat)
+            legal_moves = [move for move in legal_moves if self._is_tactical(move)]
+
+        for move in self._ordered(legal_moves):
+            board.push(move)
+            try:
+                self._count_node()
+                score = -self.quiescence(-beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            best_score = max(best_score, score)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_score
+
+    def run(self, max_depth: int) -> SearchResult:
+        board = self.board
+        root_moves = generate_legal_moves(board).moves
+        if not root_moves:
+            return self._result(None, 0, 0)
+        best_move, best_score, depth = root_moves[0], 0, 0
+        for iteration in range(1, max_depth + 1):
+            iteration_move = None
+            iteration_score = -MATE_SCORE
+            try:
+                alpha = -MATE_SCORE
+                for move in self._ordered(root_moves):
+                    board.push(move)
+                    try:
+                        score = -self.negamax(iteration - 1, -MATE_SCORE, -alpha, 1)
+                    finally:
+                        board.pop()
+                    if score > iteration_score:
+                        iteration_move, iteration_score = move, score
+                    alpha = max(alpha, score)
+            except _BudgetExhausted:
+                # the previous best move is searched first, anything that beat it is at least as good
+                if iteration_move is not None and iteration_score > best_score:
+                    best_move, best_score = iteration_move, iteration_score
+                break
+            best_move, best_score, depth = iteration_move, iteration_score, iteration
+            self.best_moves[board.get_hash()] = best_move
+            if abs(best_score) >= MATE_SCORE - MAX_DEPTH or len(root_moves) == 1:
+                break
+        return self._result(best_move, best_score, depth)
+
+    def _result(self, move: Optional[Move], score: int, depth: int) -> SearchResult:
+        return SearchResult(move=move, score=score, depth=depth, nodes=self.nodes,
+                            seconds=time.perf_counter() - self.start)
+
+
+# Best move of the side to move, searched one ply deeper at a time until the time (seconds) or node budget
+# is used up or max_depth is reached. At least one iteration is started, so a move is always returned
+# when there is one. The board is restored before returning.
+def search(board: Chessboard, time_limit: Optional[float] = 1.0, node_limit: Optional[int] = None,
+           max_depth: int = MAX_DEPTH) -> SearchResult:
+    if not 1 <= max_depth <= MAX_DEPTH:
+        raise ValueError(f"Search depth has to be between 1 and {MAX_DEPTH}, got {max_depth}")
+    return _Search(board, time_limit, node_limit).run(max_depth)
+
+
+# books and tablebases opened by this process, mapped once and kept for its lifetime
+_opening_books = {}
+_tablebases = {}
+
+
+def get_opening_book(path: str) -> OpeningBook:
+    if path not in _opening_books:
+        _opening_books[path] = OpeningBook(path)
+    return _opening_books[path]
+
+
+def get_tablebase(directory: str) -> Tablebase:
+    if directory not in _tablebases:
+        _tablebases[directory] = Tablebase(directory)
+    return _tablebases[directory]
+
+
+def tablebase_move(board: Chessboard, tablebase: Tablebase) -> Optional[SearchResult]:
+    start = time.perf_counter()
+    best = tablebase.best_move(board)
+    if best is None:
+        return None
+    move, result = best
+    score = {WIN: MATE_SCORE - result.plies, LOSS: result.plies - MATE_SCORE}.get(result.wdl, 0)
+    return SearchResult(move=move, score=score, depth=0, nodes=0, seconds=time.perf_counter() - start,
+                        tablebase=True)
+
+
+# Search from the position after the packed moves, played from the FEN position or the initial one.
+# A move of the opening book at book_path or of the tablebase in tablebase_directory is played without searching.
+def search_position(fen: Optional[str], packed_moves: bytes, time_limit: Optional[float], node_limit: Optional[int],
+                    max_depth: int = MAX_DEPTH, book_path: Optional[str] = None,
+                    tablebase_directory: Optional[str] = None) -> SearchResult:
+    start = time.perf_counter()
+    board = Chessboard.from_fen(fen) if fen is not None else Chessboard()
+    for move in unpack_moves(packed_moves):
+        board.push(move)
+    if book_path is not None:
+        book_move = get_opening_book(book_path).choose_move(board)
+        if book_move is not None:
+            return SearchResult(move=book_move, score=0, depth=0, nodes=0, seconds=time.perf_counter() - start,
+                                book=True)
+    if tablebase_directory is not None:
+        result = tablebase_move(board, get_tablebase(tablebase_directory))
+        if result is not None:
+            return result
+    return search(board, time_limit, node_limit, max_depth)
+
+
+# Searches on a pool of spawned worker processes, so a search never holds up the caller. Positions are sent
+# as packed move lists, optionally played from a FEN position. Totals of finished searches are kept to size
+# the pool: a worker does about nodes_per_second nodes per second and was busy for busy_seconds in total.
+# Book and tablebase moves are counted apart, they take no search.
+class EnginePool:
+    def __init__(self, workers: int = 1, time_limit: Optional[float] = 1.0, node_limit: Optional[int] = None,
+                 max_depth: int = MAX_DEPTH, book_path: Optional[str] = None, tablebase_directory: Optional[str] = None):
+        self.workers = workers
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.max_depth = max_depth
+        self.book_path = book_path
+        self.tablebase_directory = tablebase_directory
+        self.book_moves = 0
+        self.tablebase_moves = 0
+        self.searches = 0
+        self.pending = 0
+        self.nodes = 0
+        self.busy_seconds = 0.0
+        self.depth_total = 0
+        self.max_depth_reached = 0
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def search(self, packed_moves: bytes, fen: Optional[str] = None) -> 'Future[SearchResult]':
+        with self._lock:
+            self.pending += 1
+        future = self._executor.submit(search_position, fen, bytes(packed_moves), self.time_limit,
+                                       self.node_limit, self.max_depth, self.book_path, self.tablebase_directory)
+        future.add_done_callback(self._record)
+        return future
+
+    def _record(self, future: 'Future[SearchResult]') -> None:
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            result = future.result()
+            if result.book:
+                self.book_moves += 1
+                return
+            if result.tablebase:
+                self.tablebase_moves += 1
+                return
+            self.searches += 1
+            self.nodes += result.nodes
+            self.busy_seconds += result.seconds
+            self.depth_total += result.depth
+            self.max_depth_reached = max(self.max_depth_reached, result.depth)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'workers': self.workers,
+                    'pending': self.pending,
+                    'book_moves': self.book_moves,
+                    'tablebase_moves': self.tablebase_moves,
+                    'searches': self.searches,
+                    'nodes': self.nodes,
+                    'busy_seconds': round(self.busy_seconds, 6),
+                    'nodes_per_second': round(self.nodes / self.busy_seconds, 1) if self.busy_seconds > 0 else 0.0,
+                    'average_depth': round(self.depth_total / self.searches, 2) if self.searches else 0.0,
+                    'max_depth': self.max_depth_reached}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,59 @@
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.engine import MATE_SCORE, EnginePool, evaluate, search
+from game.core.move_codec import pack_moves
+
+SCHOLARS_MATE = 'r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 2 3'
+
+
+class EngineTestCase(unittest.TestCase):
+    def test_evaluate_is_symmetric(self):
+        self.assertEqual(0, evaluate(Chessboard()))
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/8/Q3K3 w - - 0 1')
+        self.assertGreater(evaluate(board), 800)
+        self.assertEqual(-evaluate(board), evaluate(Chessboard.from_fen('4k3/8/8/8/8/8/8/Q3K3 b - - 0 1')))
+
+    def test_finds_mate_in_one(self):
+        result = search(Chessboard.from_fen(SCHOLARS_MATE), time_limit=None, max_depth=3)
+        self.assertEqual(Move.from_str('h5f7'), result.move)
+        self.assertEqual(MATE_SCORE - 1, result.score)
+
+    def test_takes_hanging_queen(self):
+        board = Chessboard.from_fen('4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1')
+        self.assertEqual(Move.from_str('d2d5'), search(board, time_limit=None, max_depth=2).move)
+
+    def test_board_is_restored(self):
+        board = Chessboard.from_fen(SCHOLARS_MATE)
+        search(board, time_limit=None, max_depth=2)
+        self.assertEqual(SCHOLARS_MATE, board.to_fen())
+        self.assertEqual(0, board.get_ply())
+
+    def test_node_budget(self):
+        result = search(Chessboard(), time_limit=None, node_limit=500)
+        self.assertLessEqual(result.nodes, 501)
+        self.assertIsNotNone(result.move)
+        self.assertGreaterEqual(result.depth, 1)
+
+    def test_no_legal_move(self):
+        result = search(Chessboard.from_fen('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1'), time_limit=None, max_depth=2)
+        self.assertIsNone(result.move)
+        self.assertEqual(0, result.score)
+
+    def test_pool(self):
+        pool = EnginePool(workers=1, time_limit=None, max_depth=2)
+        try:
+            moves = Move.from_str_list(['e2e4', 'e7e5', 'f1c4', 'b8c6', 'd1h5', 'g8f6'])
+            result = pool.search(pack_moves(moves)).result()
+            self.assertEqual(Move.from_str('h5f7'), result.move)
+            self.assertEqual(Move.from_str('h5f7'), pool.search(b'', SCHOLARS_MATE).result().move)
+        finally:
+            pool.shutdown()
+        stats = pool.stats()
+        self.assertEqual(2, stats['searches'])
+        self.assertEqual(0, stats['pending'])
+        self.assertGreater(stats['nodes'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
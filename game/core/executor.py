@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+
+# Raised by BoundedExecutor.submit when max_queued calls already wait for a worker
+class ExecutorFull(Exception):
+    pass
+
+
+# Runs CPU-bound calls, like building a MoveGraph, on a fixed number of threads, so they never hold up the
+# event loop of an async consumer. Calls beyond the number of workers wait in the queue, at most max_queued
+# of them - further calls are rejected rather than let the queue and its latency grow without bound.
+# The queue depth and the time calls spent waiting and running are kept to size the pool.
+class BoundedExecutor:
+    def __init__(self, workers: int = 2, name: str = 'bounded-executor', max_queued: int = 64):
+        if workers < 1:
+            raise ValueError(f"Number of workers has to be positive, got {workers}")
+        if max_queued < 0:
+            raise ValueError(f"Queue size can't be negative, got {max_queued}")
+        self.workers = workers
+        self.max_queued = max_queued
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_latency = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+    def is_full(self) -> bool:
+        with self._lock:
+            return self.queued >= self.max_queued
+
+    def submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self.queued >= self.max_queued:
+                self.rejected += 1
+                raise ExecutorFull(f"{self.queued} calls already wait for a worker")
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        return self._executor.submit(self._call, time.perf_counter(), fn, args)
+
+    # the result of the call, awaited without blocking the event loop
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def _call(self, submitted: float, fn: Callable, args: tuple):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        failed = True
+        try:
+            result = fn(*args)
+            failed = False
+            return result
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.wait_seconds += started - submitted
+                self.run_seconds += finished - started
+                self.max_latency = max(self.max_latency, finished - submitted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self.completed + self.failed
+            return {'workers': self.workers,
+                    'queued': self.queued,
+                    'running': self.running,
+                    'max_queued': self.max_queued,
+                    'peak_queued': self.peak_queued,
+                    'rejected': self.rejected,
+                    'completed': self.completed,
+                    'failed': self.failed,
+                    'average_wait_ms': round(self.wait_seconds / calls * 1000, 3) if calls else 0.0,
+                    'average_run_ms': round(self.run_seconds / calls * 1000, 3) if calls else 0.0,
+                    'max_latency_ms': round(self.max_latency * 1000, 3)}
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
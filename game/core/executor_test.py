@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import unittest
+
+from game.core.chessboard import Chessboard
+from game.core.executor import BoundedExecutor, ExecutorFull
+from game.core.move_graph import MoveGraph
+
+
+class BoundedExecutorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.executor = BoundedExecutor(workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_run_from_event_loop(self):
+        graphs = asyncio.run(self.run_graphs(3))
+        self.assertEqual([MoveGraph(Chessboard(), side_to_move_only=True).as_dict()] * 3, graphs)
+        stats = self.executor.stats()
+        self.assertEqual(3, stats['completed'])
+        self.assertEqual(0, stats['queued'])
+        self.assertEqual(0, stats['running'])
+
+    async def run_graphs(self, count: int):
+        return await asyncio.gather(*(self.executor.run(lambda: MoveGraph(Chessboard(), side_to_move_only=True)
+                                                        .as_dict()) for _ in range(count)))
+
+    def test_queue_depth(self):
+        started, release = threading.Event(), threading.Event()
+        blocked = self.executor.submit(lambda: started.set() or release.wait())
+        started.wait()
+        queued = [self.executor.submit(pow, 2, power) for power in range(3)]
+        self.assertEqual(3, self.executor.stats()['queued'])
+        release.set()
+        self.assertTrue(blocked.result())
+        self.assertEqual([1, 2, 4], [future.result() for future in queued])
+        stats = self.executor.stats()
+        self.assertGreaterEqual(stats['peak_queued'], 3)
+        self.assertGreater(stats['max_latency_ms'], 0)
+
+    def test_full_queue_rejects_calls(self):
+        executor = BoundedExecutor(workers=1, max_queued=2)
+        self.addCleanup(executor.shutdown)
+        started, release = threading.Event(), threading.Event()
+        blocked = executor.submit(lambda: started.set() or release.wait())
+        started.wait()
+        queued = [executor.submit(pow, 2, power) for power in range(2)]
+        self.assertTrue(executor.is_full())
+        self.assertRaises(ExecutorFull, executor.submit, pow, 2, 2)
+        with self.assertRaises(ExecutorFull):
+            asyncio.run(executor.run(pow, 2, 3))
+        stats = executor.stats()
+        self.assertEqual(2, stats['queued'])
+        self.assertEqual(2, stats['rejected'])
+
+        release.set()
+        self.assertTrue(blocked.result())
+        self.assertEqual([1, 2], [future.result() for future in queued])
+        self.assertFalse(executor.is_full())
+        self.assertEqual(16, executor.submit(pow, 2, 4).result())
+        self.assertEqual(4, executor.stats()['completed'])
+
+    def test_failed_call(self):
+        with self.assertRaises(ZeroDivisionError):
+            asyncio.run(self.executor.run(divmod, 1, 0))
+        self.assertEqual(1, self.executor.stats()['failed'])
+
+    def test_invalid_workers(self):
+        self.assertRaises(ValueError, BoundedExecutor, 0)
+        self.assertRaises(ValueError, BoundedExecutor, 1, max_queued=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,31 +1,109 @@
+from typing import Optional
+
+from game.core.chessboard import Chessboard
 from game.core.chesspiece import PieceColor
 from game.core.move_graph import MoveGraph
+from game.core.tablebase import Tablebase, TablebaseResult
+
+STALEMATE = 'stalemate'
+FIVEFOLD_REPETITION = 'fivefold_repetition'
+SEVENTY_FIVE_MOVE_RULE = 'seventy_five_move_rule'
+INSUFFICIENT_MATERIAL = 'insufficient_material'
+# draws a player may claim, but which don't end the game by themselves
+THREEFOLD_REPETITION = 'threefold_repetition'
+FIFTY_MOVE_RULE = 'fifty_move_rule'
+
+# plies without a capture or pawn move after which a draw can be claimed, and after which the game is drawn
+FIFTY_MOVE_PLIES = 100
+SEVENTY_FIVE_MOVE_PLIES = 150
+
+
+# draw that depends on how the position was reached rather than on the position itself
+def get_history_draw_reason(board: Chessboard) -> Optional[str]:
+    if board.get_repetition_count() >= 5:
+        return FIVEFOLD_REPETITION
+    if board.get_halfmove_clock() >= SEVENTY_FIVE_MOVE_PLIES:
+        return SEVENTY_FIVE_MOVE_RULE
+    return None
+
+
+# draw the side to move may claim in the position as it was reached
+def get_claimable_draw_reason(board: Chessboard) -> Optional[str]:
+    if board.get_repetition_count() >= 3:
+        return THREEFOLD_REPETITION
+    if board.get_halfmove_clock() >= FIFTY_MOVE_PLIES:
+        return FIFTY_MOVE_RULE
+    return None
 
 
+# GameState.as_dict() of the last position of a game that ended with a claimed draw
+def claimed_draw_state(game_state: dict, claimed_draw_reason: str) -> dict:
+    return {**game_state, 'is_draw': True, 'draw_reason': claimed_draw_reason, 'claimable_draw_reason': None}
+
+
+# Status of the game for the side to move, evaluated once from the move graph and its board.
+# Draws follow the FIDE laws: stalemate, insufficient material, fivefold repetition and the seventy-five-move
+# rule end the game, while threefold repetition and the fifty-move rule are only reported as claimable;
+# a claim ends the game outside of GameState (see game.util.claim_game_draw).
+# With a tablebase, endings it covers also get their result with perfect play.
 class GameState:
-    def __init__(self, move_graph: MoveGraph, turn: PieceColor):
+    def __init__(self, move_graph: MoveGraph, turn: PieceColor, tablebase: Tablebase = None):
         self.move_graph = move_graph
         self.turn = turn
+        legal_moves = move_graph.legal_moves
+        if legal_moves is not None and legal_moves.color is turn:
+            self._is_check = legal_moves.checkers != 0
+            self._can_player_move = bool(legal_moves.moves)
+        else:
+            self._is_check = bool(move_graph.get_check_attacks())
+            self._can_player_move = bool(move_graph.get_moves_by_piece_color(turn))
+        self._draw_reason = None if self.is_checkmate() else self._find_draw_reason(move_graph.board)
+        self._claimable_draw_reason = get_claimable_draw_reason(move_graph.board) \
+            if not self.is_checkmate() and not self.is_draw() else None
+        self._tablebase_result = tablebase.probe(move_graph.board) \
+            if tablebase is not None and not self.is_checkmate() and not self.is_draw() else None
+
+    def _find_draw_reason(self, board: Chessboard) -> Optional[str]:
+        if not self._can_player_move:
+            return STALEMATE
+        if board.has_insufficient_material():
+            return INSUFFICIENT_MATERIAL
+        return get_history_draw_reason(board)
 
     def is_check(self) -> bool:
-        return bool(self.move_graph.get_check_attacks())
+        return self._is_check
 
     def is_checkmate(self) -> bool:
-        return self.is_check() and not self.can_player_move()
+        return self._is_check and not self._can_player_move
 
-    def is_draw(self):
-        return not self.is_check() and not self.can_player_move()
+    def is_draw(self) -> bool:
+        return self._draw_reason is not None
+
+    # one of the draw reason constants, None when the game is not drawn
+    def get_draw_reason(self) -> Optional[str]:
+        return self._draw_reason
+
+    # THREEFOLD_REPETITION or FIFTY_MOVE_RULE when the game goes on but the side to move may claim a draw
+    def get_claimable_draw_reason(self) -> Optional[str]:
+        return self._claimable_draw_reason
 
     def can_player_move(self) -> bool:
-        return bool(self.move_graph.get_moves_by_piece_color(self.turn))
+        return self._can_player_move
 
     def get_turn(self) -> PieceColor:
         return self.turn
 
+    # None when there is no tablebase for the position
+    def get_tablebase_result(self) -> Optional[TablebaseResult]:
+        return self._tablebase_result
+
     def as_dict(self) -> dict:
         return {
             'turn': self.turn.value,
-            'is_check': self.is_check(),
+            'is_check': self._is_check,
             'is_checkmate': self.is_checkmate(),
-            'is_draw': self.is_draw()
+            'is_draw': self.is_draw(),
+            'draw_reason': self._draw_reason,
+            'claimable_draw_reason': self._claimable_draw_reason,
+            'tablebase': self._tablebase_result.as_dict() if self._tablebase_result is not None else None
         }
@@ -2,7 +2,8 @@ import unittest
 
 from game.core.chessboard import Chessboard, Move
 from game.core.chesspiece import PieceColor
-from game.core.game_state import GameState
+from game.core.game_state import GameState, STALEMATE, THREEFOLD_REPETITION, FIFTY_MOVE_RULE, \
+    INSUFFICIENT_MATERIAL, FIVEFOLD_REPETITION, SEVENTY_FIVE_MOVE_RULE
 from game.core.move_graph import MoveGraph
 
 
@@ -28,6 +29,73 @@ class GameStateTestCase(unittest.TestCase):
         self.assertFalse(state.is_draw())
         self.assertFalse(state.is_check())
 
+    def test_fen_loaded_board(self):
+        # smothered mate, black to move
+        board = Chessboard.from_fen('6rk/5Npp/8/8/8/8/8/6K1 b - - 0 1')
+        graph = MoveGraph(board, side_to_move_only=True)
+        state = GameState(graph, board.get_turn())
+        self.assertTrue(state.is_checkmate())
+
+    def test_stalemate(self):
+        state = state_of(Chessboard.from_fen('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1'))
+        self.assertFalse(state.is_check())
+        self.assertEqual(STALEMATE, state.get_draw_reason())
+
+    def test_repetitions(self):
+        board = Chessboard()
+        knight_moves = moves_from_codes(['g1f3', 'g8f6', 'f3g1', 'f6g8'])
+        for move in knight_moves:
+            board.push(move)
+        self.assertEqual(2, board.get_repetition_count())
+        self.assertIsNone(state_of(board).get_claimable_draw_reason())
+        for move in knight_moves:
+            board.push(move)
+        # threefold repetition can be claimed, the game only ends at the fifth
+        state = state_of(board)
+        self.assertFalse(state.is_draw())
+        self.assertEqual(THREEFOLD_REPETITION, state.get_claimable_draw_reason())
+        for move in knight_moves * 2:
+            board.push(move)
+        self.assertEqual(5, board.get_repetition_count())
+        state = state_of(board)
+        self.assertEqual(FIVEFOLD_REPETITION, state.get_draw_reason())
+        self.assertIsNone(state.get_claimable_draw_reason())
+        board.pop()
+        self.assertEqual(4, board.get_repetition_count())
+
+    def test_move_rules(self):
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/8/R3K3 w - - 99 80')
+        self.assertIsNone(state_of(board).get_claimable_draw_reason())
+        board.push(Move.from_str('a1a2'))
+        state = state_of(board)
+        self.assertFalse(state.is_draw())
+        self.assertEqual(FIFTY_MOVE_RULE, state.as_dict()['claimable_draw_reason'])
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/8/R3K3 w - - 149 105')
+        self.assertFalse(state_of(board).is_draw())
+        board.push(Move.from_str('a1a2'))
+        self.assertEqual(SEVENTY_FIVE_MOVE_RULE, state_of(board).as_dict()['draw_reason'])
+
+    def test_checkmate_is_not_drawn_by_seventy_five_move_rule(self):
+        board = Chessboard.from_fen('6k1/5ppp/8/8/8/8/8/R5K1 w - - 149 105')
+        board.push(Move.from_str('a1a8'))
+        state = state_of(board)
+        self.assertTrue(state.is_checkmate())
+        self.assertFalse(state.is_draw())
+
+    def test_insufficient_material(self):
+        for fen, insufficient in [('8/8/4k3/8/8/3K4/8/8 w - - 0 1', True),
+                                  ('8/8/4k3/8/8/3KN3/8/8 w - - 0 1', True),
+                                  ('8/8/3bk3/8/8/3KB3/8/8 w - - 0 1', True),
+                                  ('8/8/2b1k3/8/8/3KB3/8/8 w - - 0 1', False),
+                                  ('8/8/4k3/8/8/3KNN2/8/8 w - - 0 1', False),
+                                  ('8/8/4k3/8/8/3KP3/8/8 w - - 0 1', False)]:
+            state = state_of(Chessboard.from_fen(fen))
+            self.assertEqual(insufficient, state.get_draw_reason() == INSUFFICIENT_MATERIAL, fen)
+
+
+def state_of(board):
+    return GameState(MoveGraph(board, side_to_move_only=True), board.get_turn())
+
 
 def moves_from_codes(codes):
     return [Move.from_str(code) for code in codes]
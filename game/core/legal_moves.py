@@ -0,0 +1,259 @@
+from typing import Dict, List, NamedTuple, Optional
+
+from game.core.attack_tables import RAYS, QUEEN_SLOPES, KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKS, SLOPES_BETWEEN
+from game.core.bitboard import iter_bits
+from game.core.chessboard import Chessboard, Move, WHITE_SHORT_CASTLE, WHITE_LONG_CASTLE, BLACK_SHORT_CASTLE, \
+    BLACK_LONG_CASTLE
+from game.core.chesspiece import ChessPiece, DynamicChessPiece, StaticChessPiece, PieceColor
+from game.core.chesspieces import King, Knight, Pawn, Rook, Bishop, Queen
+
+FULL_MASK = (1 << 64) - 1
+
+_PAWN_DIRECTION = {PieceColor.WHITE: 1, PieceColor.BLACK: -1}
+# king square, then (rights bit, squares that must be empty, squares the king passes, king destination)
+_CASTLES = {
+    PieceColor.WHITE: (4, ((WHITE_SHORT_CASTLE, (5, 6), (5, 6), 6),
+                           (WHITE_LONG_CASTLE, (3, 2, 1), (3, 2), 2))),
+    PieceColor.BLACK: (60, ((BLACK_SHORT_CASTLE, (61, 62), (61, 62), 62),
+                            (BLACK_LONG_CASTLE, (59, 58, 57), (59, 58), 58))),
+}
+
+
+# legal moves of one side together with the masks they were filtered with
+class LegalMoves(NamedTuple):
+    color: PieceColor
+    moves: List[Move]
+    king_inx: Optional[int]
+    checkers: int
+    # squares a piece other than the king has to move to
+    check_block: int
+    # pinned piece square -> squares on its pin ray
+    pins: Dict[int, int]
+
+
+def squares_mask(squares) -> int:
+    mask = 0
+    for inx in squares:
+        mask |= 1 << inx
+    return mask
+
+
+def is_slider_along(piece: ChessPiece, slope) -> bool:
+    if isinstance(piece, Queen):
+        return True
+    orthogonal = slope[0] == 0 or slope[1] == 0
+    return isinstance(piece, Rook) if orthogonal else isinstance(piece, Bishop)
+
+
+def find_king(board: Chessboard, color: PieceColor) -> Optional[int]:
+    for inx in range(64):
+        piece = board.piece_at(inx)
+        if isinstance(piece, King) and piece.get_color() is color:
+            return inx
+    return None
+
+
+def is_square_attacked(board: Chessboard, inx: int, by_color: PieceColor) -> bool:
+    return board.is_attacked(inx, by_color)
+
+
+# whether the king would be attacked on target, counting the sliders it only shields target from now
+def is_king_target_attacked(board: Chessboard, king_inx: int, target: int, by_color: PieceColor) -> bool:
+    if board.is_attacked(target, by_color):
+        return True
+    slope = SLOPES_BETWEEN[king_inx][target]
+    return slope is not None and any(SLOPES_BETWEEN[checker_inx][king_inx] == slope
+                                     and isinstance(board.piece_at(checker_inx), DynamicChessPiece)
+                                     for checker_inx in iter_bits(board.attackers_of(king_inx, by_color)))
+
+
+# Legal moves for one side (the side to move by default), using the board's attack maps for the king
+# and the pieces giving check, and a scan of the lines through the king for the pin rays.
+def generate_legal_moves(board: Chessboard, color: PieceColor = None) -> LegalMoves:
+    color = board.get_turn() if color is None else color
+    enemy_color = PieceColor.enemy_color(color)
+    own_pieces = []
+    king_inx = None
+    for inx in range(64):
+        piece = board.piece_at(inx)
+        if piece is not None and piece.get_color() is color:
+            own_pieces.append((inx, piece))
+            if isinstance(piece, King):
+                king_inx = inx
+
+    checkers = 0 if king_inx is None else board.attackers_of(king_inx, enemy_color)
+    check_block = checkers
+    # squares the sliders giving check attack through the king
+    behind_king = 0
+    for checker_inx in iter_bits(checkers):
+        if not isinstance(board.piece_at(checker_inx), DynamicChessPiece):
+            continue
+        slope = SLOPES_BETWEEN[checker_inx][king_inx]
+        for target in RAYS[slope][checker_inx]:
+            if target != king_inx:
+                check_block |= 1 << target
+                continue
+            if RAYS[slope][king_inx]:
+                behind_king |= 1 << RAYS[slope][king_inx][0]
+            break
+
+    if checkers == 0:
+        check_block = FULL_MASK
+    elif checkers & (checkers - 1):
+        # double check - only the king can move
+        check_block = 0
+
+    pins = {}
+    if king_inx is not None:
+        for slope in QUEEN_SLOPES:
+            ray = RAYS[slope][king_inx]
+            pinned_inx = None
+            for step, target in enumerate(ray):
+                piece = board.piece_at(target)
+                if piece is None:
+                    continue
+                if pinned_inx is None and piece.get_color() is color:
+                    pinned_inx = target
+                    continue
+                if pinned_inx is not None and piece.get_color() is enemy_color and is_slider_along(piece, slope):
+                    pins[pinned_inx] = squares_mask(ray[:step + 1])
+                break
+
+    moves = []
+    for inx, piece in own_pieces:
+        if isinstance(piece, King):
+            moves.extend(Move.from_indexes(inx, target) for target in piece.get_targets(inx)
+                         if not board.is_attacked(target, enemy_color) and not (behind_king >> target) & 1
+                         and not _is_own(board, target, color))
+            continue
+        allowed = check_block & pins.get(inx, FULL_MASK)
+        if not allowed:
+            continue
+        moves.extend(Move.from_indexes(inx, target) for target in _pseudo_targets(board, inx, piece)
+                     if (allowed >> target) & 1)
+
+    moves.extend(move for move in board.get_possible_en_passant_moves()
+                 if board.get_piece(move.get_start()).get_color() is color
+                 and _is_en_passant_legal(board, move, color))
+    if checkers == 0 and king_inx is not None:
+        moves.extend(_castle_moves(board, color, king_inx))
+
+    return LegalMoves(color=color, moves=moves, king_inx=king_inx, checkers=checkers,
+                      check_block=check_block, pins=pins)
+
+
+def _is_own(board: Chessboard, inx: int, color: PieceColor) -> bool:
+    piece = board.piece_at(inx)
+    return piece is not None and piece.get_color() is color
+
+
+def _pseudo_targets(board: Chessboard, inx: int, piece: ChessPiece) -> List[int]:
+    color = piece.get_color()
+    if isinstance(piece, Pawn):
+        targets = []
+        for target in piece.get_push_ray(inx):
+            if board.piece_at(target) is not None:
+                break
+            targets.append(target)
+        targets.extend(target for target in piece.get_attack_targets(inx)
+                       if board.piece_at(target) is not None and board.piece_at(target).get_color() is not color)
+        return targets
+    if isinstance(piece, StaticChessPiece):
+        return [target for target in piece.get_targets(inx) if not _is_own(board, target, color)]
+    targets = []
+    for ray in piece.get_rays(inx):
+        for target in ray:
+            target_piece = board.piece_at(target)
+            if target_piece is None:
+                targets.append(target)
+                continue
+            if target_piece.get_color() is not color:
+                targets.append(target)
+            break
+    return targets
+
+
+# en passant removes two pawns from one row, which the pin masks don't cover - try it on the board
+def _is_en_passant_legal(board: Chessboard, move: Move, color: PieceColor) -> bool:
+    board.push(move)
+    king_inx = find_king(board, color)
+    legal = king_inx is None or not is_square_attacked(board, king_inx, PieceColor.enemy_color(color))
+    board.pop()
+    return legal
+
+
+def _castle_moves(board: Chessboard, color: PieceColor, king_inx: int) -> List[Move]:
+    home_inx, castles = _CASTLES[color]
+    if king_inx != home_inx:
+        return []
+    enemy_color = PieceColor.enemy_color(color)
+    rights = board.get_castling_rights()
+    return [Move.from_indexes(king_inx, destination)
+            for right, empty_squares, passed_squares, destination in castles
+            if rights & right
+            and all(board.piece_at(inx) is None for inx in empty_squares)
+            and not any(board.is_attacked(inx, enemy_color) for inx in passed_squares)]
+
+
+# Whether one move of the side to move is legal, checked from the moving piece's own targets, the attack maps
+# and the lines through the king square only, without generating the moves of any other piece.
+def is_legal_move(board: Chessboard, move: Move) -> bool:
+    start_inx = move.get_start().inx()
+    end_inx = move.get_end().inx()
+    color = board.get_turn()
+    piece = board.piece_at(start_inx)
+    if piece is None or piece.get_color() is not color or _is_own(board, end_inx, color):
+        return False
+    enemy_color = PieceColor.enemy_color(color)
+    if isinstance(piece, King):
+        if end_inx in piece.get_targets(start_inx):
+            return not is_king_target_attacked(board, start_inx, end_inx, enemy_color)
+        return _is_castle_legal(board, color, start_inx, end_inx)
+
+    captured_inx = end_inx
+    if isinstance(piece, Pawn) and end_inx == board.get_en_passant_square() \
+            and end_inx in piece.get_attack_targets(start_inx):
+        # the captured pawn stands beside the capturing one
+        captured_inx = end_inx % 8 + start_inx - start_inx % 8
+    elif end_inx not in _pseudo_targets(board, start_inx, piece):
+        return False
+    king_inx = find_king(board, color)
+    return king_inx is None or not _is_attacked_after(board, king_inx, enemy_color, start_inx, end_inx, captured_inx)
+
+
+# is_square_attacked as it would be after the piece on start_inx went to end_inx and the one on
+# captured_inx was taken
+def _is_attacked_after(board: Chessboard, inx: int, by_color: PieceColor, start_inx: int, end_inx: int,
+                       captured_inx: int) -> bool:
+    def is_attacker(attacker_inx: int, piece_type) -> bool:
+        piece = board.piece_at(attacker_inx)
+        return isinstance(piece, piece_type) and piece.get_color() is by_color \
+            and attacker_inx != end_inx and attacker_inx != captured_inx
+
+    if any(is_attacker(attacker_inx, Knight) for attacker_inx in KNIGHT_TARGETS[inx]) \
+            or any(is_attacker(attacker_inx, King) for attacker_inx in KING_TARGETS[inx]) \
+            or any(is_attacker(attacker_inx, Pawn) for attacker_inx in PAWN_ATTACKS[-_PAWN_DIRECTION[by_color]][inx]):
+        return True
+    for slope in QUEEN_SLOPES:
+        for attacker_inx in RAYS[slope][inx]:
+            if attacker_inx == end_inx:
+                break
+            piece = board.piece_at(attacker_inx)
+            if piece is None or attacker_inx == start_inx or attacker_inx == captured_inx:
+                continue
+            if piece.get_color() is by_color and is_slider_along(piece, slope):
+                return True
+            break
+    return False
+
+
+def _is_castle_legal(board: Chessboard, color: PieceColor, king_inx: int, end_inx: int) -> bool:
+    home_inx, castles = _CASTLES[color]
+    if king_inx != home_inx:
+        return False
+    enemy_color = PieceColor.enemy_color(color)
+    rights = board.get_castling_rights()
+    return any(destination == end_inx and rights & right
+               and all(board.piece_at(inx) is None for inx in empty_squares)
+               and not any(board.is_attacked(inx, enemy_color) for inx in (king_inx, *passed_squares))
+               for right, empty_squares, passed_squares, destination in castles)
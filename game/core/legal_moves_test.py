@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from game.core.chessboard import Chessboard, Move, Position
+from game.core.legal_moves import generate_legal_moves, is_legal_move, is_square_attacked
+from game.core.chesspiece import PieceColor
+from game.core.move_graph import MoveGraph
+
+
+def legal_codes(codes, start=None):
+    board = Chessboard.from_moves_list(Move.from_str_list(codes))
+    moves = generate_legal_moves(board).moves
+    return {str(move) for move in moves if start is None or str(move.get_start()) == start}
+
+
+class LegalMovesTestCase(unittest.TestCase):
+    def test_start_position(self):
+        legal = generate_legal_moves(Chessboard())
+        self.assertEqual(20, len(legal.moves))
+        self.assertEqual(0, legal.checkers)
+
+    def test_pinned_piece(self):
+        self.assertEqual(set(), legal_codes(['e2e3', 'd7d6', 'd1h5'], start='f7'))
+        legal = generate_legal_moves(Chessboard.from_moves_list(Move.from_str_list(['e2e3', 'd7d6', 'd1h5'])))
+        self.assertIn(Position.from_str('f7').inx(), legal.pins)
+
+    def test_check_must_be_answered(self):
+        # 1.e4 d5 2.Bb5+
+        self.assertEqual({'c7c6', 'c8d7', 'b8c6', 'b8d7', 'd8d7'}, legal_codes(['e2e4', 'd7d5', 'f1b5']))
+
+    def test_king_cannot_take_protected_piece(self):
+        self.assertNotIn('e8f7', legal_codes(['e2e4', 'e7e5', 'f1c4', 'b8c6', 'd1h5', 'g8f6', 'h5f7']))
+        self.assertEqual(set(), legal_codes(['e2e4', 'e7e5', 'f1c4', 'b8c6', 'd1h5', 'g8f6', 'h5f7']))
+
+    def test_castling_through_attacked_square(self):
+        codes = ['e2e4', 'e7e5', 'g1f3', 'd7d5', 'f1c4', 'c8g4', 'd2d3', 'g4h3']
+        self.assertIn('e1g1', legal_codes(codes))
+        self.assertNotIn('e1g1', legal_codes(codes[:-1] + ['d8g5', 'b1c3', 'g5g2']))
+
+    def test_en_passant(self):
+        self.assertIn('e5f6', legal_codes(['e2e4', 'd7d5', 'e4e5', 'f7f5']))
+
+    def test_is_square_attacked(self):
+        board = Chessboard.from_moves_list(Move.from_str_list(['e2e4', 'd7d5']))
+        self.assertTrue(is_square_attacked(board, Position.from_str('d5').inx(), PieceColor.WHITE))
+        self.assertTrue(is_square_attacked(board, Position.from_str('h3').inx(), PieceColor.BLACK))
+        self.assertFalse(is_square_attacked(board, Position.from_str('e3').inx(), PieceColor.BLACK))
+
+    def test_move_graph_side_to_move_only(self):
+        board = Chessboard.from_moves_list(Move.from_str_list(['f2f3', 'e7e5', 'g2g4', 'd8h4']))
+        graph = MoveGraph(board, side_to_move_only=True)
+        self.assertEqual(['h4e1'], [str(move) for move in graph.get_check_attacks()])
+        self.assertEqual([], graph.moves)
+        self.assertEqual(64, len(graph.as_dict()))
+
+    def test_is_legal_move(self):
+        board = Chessboard.from_moves_list(Move.from_str_list(['e2e3', 'd7d6', 'd1h5']))
+        self.assertFalse(is_legal_move(board, Move.from_str('f7f6')))
+        self.assertFalse(is_legal_move(board, Move.from_str('e2e4')))
+        self.assertFalse(is_legal_move(board, Move.from_str('c8a6')))
+        self.assertTrue(is_legal_move(board, Move.from_str('g7g6')))
+        board = Chessboard.from_fen('8/8/8/K2pP2r/8/8/8/7k w - d6 0 1')
+        self.assertFalse(is_legal_move(board, Move.from_str('e5d6')))
+
+    def test_is_legal_move_agrees_with_generated_moves(self):
+        rng = random.Random(19)
+        all_moves = [Move.from_indexes(start, end) for start in range(64) for end in range(64) if start != end]
+        for _ in range(30):
+            board = Chessboard()
+            for _ in range(rng.randrange(60)):
+                moves = generate_legal_moves(board).moves
+                if not moves:
+                    break
+                board.push(rng.choice(moves))
+            legal = set(generate_legal_moves(board).moves)
+            self.assertEqual(legal, {move for move in all_moves if is_legal_move(board, move)})
+
+
+if __name__ == '__main__':
+    unittest.main()
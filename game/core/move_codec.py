@@ -0,0 +1,50 @@
+import sys
+from array import array
+from typing import Iterable, List, Sequence
+
+from game.core.position import Move
+
+# A move is encoded in 16 bits: bits 0-5 end square, bits 6-11 start square (together equal to Move.inx())
+# and bit 12 set when the move promotes a pawn. Packed move lists are little-endian arrays of those codes.
+MOVE_MASK = 0xFFF
+PROMOTION_FLAG = 1 << 12
+
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def encode_move(move: Move, promotion: bool = False) -> int:
+    return move.inx() | (PROMOTION_FLAG if promotion else 0)
+
+
+def decode_move(code: int) -> Move:
+    return Move.from_indexes(*divmod(code & MOVE_MASK, 64))
+
+
+def is_promotion_code(code: int) -> bool:
+    return bool(code & PROMOTION_FLAG)
+
+
+def pack_codes(codes: Iterable[int]) -> bytes:
+    packed = array('H', codes)
+    if not _NATIVE_LITTLE_ENDIAN:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def pack_moves(moves: Iterable[Move], promotions: Iterable[bool] = ()) -> bytes:
+    promotions = list(promotions)
+    return pack_codes(encode_move(move, inx < len(promotions) and promotions[inx])
+                      for inx, move in enumerate(moves))
+
+
+# codes of a packed move list; on little-endian hosts this is a view of the buffer, without copying
+def unpack_codes(buffer) -> Sequence[int]:
+    if _NATIVE_LITTLE_ENDIAN:
+        return memoryview(buffer).cast('B').cast('H')
+    codes = array('H', bytes(buffer))
+    codes.byteswap()
+    return codes
+
+
+def unpack_moves(buffer) -> List[Move]:
+    return [decode_move(code) for code in unpack_codes(buffer)]
@@ -0,0 +1,36 @@
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.move_codec import encode_move, decode_move, is_promotion_code, pack_moves, unpack_moves, \
+    unpack_codes, PROMOTION_FLAG
+
+
+class MoveCodecTestCase(unittest.TestCase):
+    def test_encode_decode(self):
+        move = Move.from_str('e2e4')
+        self.assertEqual(12 * 64 + 28, encode_move(move))
+        self.assertIs(move, decode_move(encode_move(move)))
+        code = encode_move(Move.from_str('g7h8'), promotion=True)
+        self.assertTrue(is_promotion_code(code))
+        self.assertLess(code, 1 << 16)
+        self.assertEqual('g7h8', str(decode_move(code)))
+
+    def test_pack_unpack(self):
+        moves = Move.from_str_list(['e2e4', 'e7e5', 'g1f3', 'b8c6'])
+        packed = pack_moves(moves)
+        self.assertEqual(8, len(packed))
+        self.assertEqual(moves, unpack_moves(packed))
+        self.assertEqual([], unpack_moves(b''))
+
+    def test_promotion_flags(self):
+        packed = pack_moves(Move.from_str_list(['a2a4', 'b7a8']), [False, True])
+        self.assertEqual([False, True], [bool(code & PROMOTION_FLAG) for code in unpack_codes(packed)])
+
+    def test_replay_from_packed(self):
+        moves = Move.from_str_list(['f2f3', 'e7e5', 'g2g4', 'd8h4'])
+        board = Chessboard.from_moves_list(unpack_moves(bytearray(pack_moves(moves))))
+        self.assertEqual(Chessboard.from_moves_list(moves).get_hash(), board.get_hash())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,19 +1,82 @@
 from itertools import chain
 
-from game.core.chessboard import Chessboard, Move, Position
+from game.core.chessboard import Chessboard, Move, Position, WHITE_SHORT_CASTLE, WHITE_LONG_CASTLE, \
+    BLACK_SHORT_CASTLE, BLACK_LONG_CASTLE
 from game.core.chesspiece import ChessPiece, StaticChessPiece, DynamicChessPiece, PieceColor
-from game.core.chesspieces import Pawn, King, Rook
+from game.core.chesspieces import Pawn, King
+from game.core.bitboard import iter_bits
+from game.core.legal_moves import LegalMoves, generate_legal_moves, is_king_target_attacked
 
-from typing import List, Type
+from typing import Dict, Iterable, List, Optional, Type
+
+_KING_HOME = {PieceColor.WHITE: 4, PieceColor.BLACK: 60}
+_CASTLES = {PieceColor.WHITE: (WHITE_SHORT_CASTLE, WHITE_LONG_CASTLE),
+            PieceColor.BLACK: (BLACK_SHORT_CASTLE, BLACK_LONG_CASTLE)}
+
+
+# moves indexed by start square, end square and color of the moving piece
+class MoveIndex:
+    def __init__(self, board: Chessboard, moves: Iterable[Move] = ()):
+        self.board = board
+        # dicts are used as insertion ordered sets of moves
+        self._all: Dict[Move, None] = {}
+        self._by_start: List[Dict[Move, None]] = [{} for _ in range(64)]
+        self._by_end: List[Dict[Move, None]] = [{} for _ in range(64)]
+        self._by_color: Dict[PieceColor, Dict[Move, None]] = {PieceColor.WHITE: {}, PieceColor.BLACK: {}}
+        self.extend(moves)
+
+    def add(self, move: Move) -> None:
+        start_inx = move.get_start().inx()
+        self._all[move] = None
+        self._by_start[start_inx][move] = None
+        self._by_end[move.get_end().inx()][move] = None
+        self._by_color[self.board.piece_at(start_inx).get_color()][move] = None
+
+    def extend(self, moves: Iterable[Move]) -> None:
+        for move in moves:
+            self.add(move)
+
+    def remove(self, move: Move) -> None:
+        start_inx = move.get_start().inx()
+        del self._all[move]
+        del self._by_start[start_inx][move]
+        del self._by_end[move.get_end().inx()][move]
+        del self._by_color[self.board.piece_at(start_inx).get_color()][move]
+
+    def by_start(self, inx: int) -> List[Move]:
+        return list(self._by_start[inx])
+
+    def by_end(self, inx: int) -> List[Move]:
+        return list(self._by_end[inx])
+
+    def by_color(self, color: PieceColor) -> List[Move]:
+        return list(self._by_color[color])
+
+    def __iter__(self):
+        return iter(list(self._all))
+
+    def __contains__(self, move: Move) -> bool:
+        return move in self._all
+
+    def __len__(self) -> int:
+        return len(self._all)
 
 
 # make_move graph of possible next moves
 # nodes - positions
 # edges - moves
 class MoveGraph:
-    def __init__(self, board: Chessboard):
+    # side_to_move_only - generate only the legal moves of the side to move, using check and pin masks
+    # instead of building and pruning the moves of both colors
+    def __init__(self, board: Chessboard, side_to_move_only: bool = False):
         self.board = board
-        self.moves = self.build()
+        self.legal_moves: Optional[LegalMoves] = None
+        if side_to_move_only:
+            self.legal_moves = generate_legal_moves(board)
+            self._moves = MoveIndex(board, self.legal_moves.moves)
+            return
+
+        self._moves = MoveIndex(board, self.build())
         self.add_special_moves()
         self.prevent_king_from_going_into_check()
         self.prevent_moving_pinned_pieces()
@@ -29,6 +92,14 @@ class MoveGraph:
                           *self.get_moves_by_piece_type(King),
                           *self.get_moves_by_piece_color(self.get_check_attacker_color())]
 
+    @property
+    def moves(self) -> List[Move]:
+        return list(self._moves)
+
+    @moves.setter
+    def moves(self, moves: List[Move]) -> None:
+        self._moves = MoveIndex(self.board, moves)
+
     def build(self) -> List[Move]:
         static_moves = flatten(list(map(self.get_static_moves,
                                         self.board.get_pieces_positions_by_type(StaticChessPiece))))
@@ -43,24 +114,29 @@ class MoveGraph:
 
     def get_static_moves(self, start_pos: Position) -> List[Move]:
         piece = self.board.get_piece(start_pos)
-        all_end_positions = list(map(lambda mapper: mapper(start_pos), piece.get_move_mappers()))
-        valid = list(filter(lambda position: position is not None and position.is_valid(), all_end_positions))
-        possible = list(filter(lambda position: self.can_move_to(piece, position), valid))
-        moves = list(map(lambda position: Move(start_pos, position), possible))
-        return moves
+        start_inx = start_pos.inx()
+        return [Move.from_indexes(start_inx, end_inx) for end_inx in piece.get_targets(start_inx)
+                if self.can_move_to(piece, Position.from_inx(end_inx))]
 
     def get_dynamic_moves(self, start_pos: Position) -> List[Move]:
-        positions = flatten(self.get_dynamic_piece_directions(start_pos))
-        moves = list(map(lambda position: Move(start_pos, position), positions))
+        piece = self.board.get_piece(start_pos)
+        start_inx = start_pos.inx()
+        moves = []
+        for ray in piece.get_rays(start_inx):
+            for end_inx in ray:
+                end_piece = self.board.piece_at(end_inx)
+                if end_piece is None:
+                    moves.append(Move.from_indexes(start_inx, end_inx))
+                    continue
+                if end_piece.get_color() != piece.get_color():
+                    moves.append(Move.from_indexes(start_inx, end_inx))
+                break
         return moves
 
     def get_dynamic_piece_directions_no_collision(self, start_pos: Position, with_self=False) -> List[List[Position]]:
         piece = self.board.get_piece(start_pos)
-        start_iter = 0 if with_self else 1
-        all_directions = list(
-            map(lambda mapper: [mapper(start_pos, i) for i in range(start_iter, 9)], piece.get_move_mappers()))
-        valid_directions = list(map(lambda pos_list: list(filter(Position.is_valid, pos_list)), all_directions))
-        return valid_directions
+        start = [start_pos] if with_self else []
+        return [start + [Position.from_inx(inx) for inx in ray] for ray in piece.get_rays(start_pos.inx())]
 
     def get_dynamic_piece_directions(self, start_pos: Position):
         piece = self.board.get_piece(start_pos)
@@ -68,21 +144,21 @@ class MoveGraph:
                         self.get_dynamic_piece_directions_no_collision(start_pos)))
 
     def get_pawn_moves(self, start_pos: Position) -> List[Move]:
-        moves = self.get_static_moves(start_pos)
-        if len(moves) == 1:
-            move = moves[0]
+        piece = self.board.get_piece(start_pos)
+        start_inx = start_pos.inx()
+        moves = []
+        for end_inx in piece.get_push_ray(start_inx):
             # disable jumping over
-            if abs(move.get_start().y() - move.get_end().y()) == 2:
-                return []
+            if self.board.piece_at(end_inx) is not None:
+                break
+            moves.append(Move.from_indexes(start_inx, end_inx))
         return moves
 
     def get_pawn_attack_moves(self, start_pos: Position) -> List[Move]:
         piece = self.board.get_piece(start_pos)
-        attack_end_positions = list(map(lambda mapper: mapper(start_pos), piece.get_attack_mappers()))
-        valid = list(filter(Position.is_valid, attack_end_positions))
-        possible = list(filter(lambda position: self.is_enemy_at_pos(piece, position), valid))
-        moves = list(map(lambda position: Move(start_pos, position), possible))
-        return moves
+        start_inx = start_pos.inx()
+        return [Move.from_indexes(start_inx, end_inx) for end_inx in piece.get_attack_targets(start_inx)
+                if self.is_enemy_at_pos(piece, Position.from_inx(end_inx))]
 
     def find_first_piece_inx(self, direction_position_list: List[Position]):
         for inx, position in enumerate(direction_position_list):
@@ -118,7 +194,7 @@ class MoveGraph:
 
     def prevent_king_from_going_into_check(self) -> None:
         for invalid_move in filter(self.is_move_going_into_enemy_attack_range, self.get_moves_by_piece_type(King)):
-            self.moves.remove(invalid_move)
+            self._moves.remove(invalid_move)
 
     def prevent_moving_pinned_pieces(self) -> None:
         no_collision_directions = flatten(
@@ -147,15 +223,21 @@ class MoveGraph:
         if isinstance(next_piece, King) and next_piece.get_color() == PieceColor.enemy_color(attacker_color):
             for illegal_move in filter(lambda move: move.get_end() not in direction,
                                        self.get_moves_by_start(potential_pinned_pos)):
-                self.moves.remove(illegal_move)
+                self._moves.remove(illegal_move)
 
+    # a king move, answered from the board's attack maps
     def is_move_going_into_enemy_attack_range(self, move: Move):
-        return move.get_end() in map(Move.get_end, self.get_moves_by_piece_color(
-            PieceColor.enemy_color(self.board.get_piece(move.get_start()).get_color())))
+        enemy_color = PieceColor.enemy_color(self.board.get_piece(move.get_start()).get_color())
+        return is_king_target_attacked(self.board, move.get_start().inx(), move.get_end().inx(), enemy_color)
 
     def get_check_attacks(self) -> List[Move]:
-        return flatten(list(map(self.get_moves_by_end,
-                                self.board.get_pieces_positions_by_type(King))))
+        if self.legal_moves is not None:
+            return [Move.from_indexes(checker_inx, self.legal_moves.king_inx)
+                    for checker_inx in iter_bits(self.legal_moves.checkers)]
+        return [Move(Position.from_inx(checker_inx), king_pos)
+                for king_pos in self.board.get_pieces_positions_by_type(King)
+                for checker_inx in iter_bits(self.board.attackers_of(
+                    king_pos.inx(), PieceColor.enemy_color(self.board.get_piece(king_pos).get_color())))]
 
     def get_check_attacker_color(self) -> PieceColor:
         return self.board.get_piece(self.get_check_attacks().pop().get_start()).get_color()
@@ -175,47 +257,46 @@ class MoveGraph:
                            self.get_moves_by_piece_color(defended_color)))
 
     def get_moves_by_start(self, position: Position) -> List[Move]:
-        return list(filter(lambda move: move.get_start() == position, self.moves))
+        return self._moves.by_start(position.inx())
 
     def get_moves_by_end(self, position: Position) -> List[Move]:
-        return list(filter(lambda move: move.get_end() == position, self.moves))
+        return self._moves.by_end(position.inx())
 
     def get_moves_by_piece_color(self, color: PieceColor) -> List[Move]:
-        return flatten((list(map(self.get_moves_by_start,
-                                 self.board.get_pieces_positions_by_color(color)))))
+        return self._moves.by_color(color)
 
     def get_moves_by_piece_type(self, piece_type: Type[ChessPiece]) -> List[Move]:
         return flatten((list(map(self.get_moves_by_start,
                                  self.board.get_pieces_positions_by_type(piece_type)))))
 
     def add_special_moves(self):
-        self.moves += self.board.get_possible_en_passant_moves()
-        self.moves += self.castle_moves()
+        self._moves.extend(self.board.get_possible_en_passant_moves())
+        self._moves.extend(self.castle_moves())
 
     def castle_moves(self):
         if self.get_check_attacks():
             # check - can't castle
             return []
 
-        not_moved_king_pos_list = list(filter(lambda pos: not self.board.get_piece(pos).has_moved(),
-                                              self.board.get_pieces_positions_by_type(King)))
-        not_moved_rook_pos_list = list(filter(lambda pos: not self.board.get_piece(pos).has_moved(),
-                                              self.board.get_pieces_positions_by_type(Rook)))
+        rights = self.board.get_castling_rights()
+        home_king_pos_list = [pos for pos in self.board.get_pieces_positions_by_type(King)
+                              if pos.inx() == _KING_HOME[self.board.get_piece(pos).get_color()]]
 
         castle_moves = []
-        for king_pos in not_moved_king_pos_list:
+        for king_pos in home_king_pos_list:
             king = self.board.get_piece(king_pos)
             y = king_pos.y()
+            short_castle, long_castle = _CASTLES[king.get_color()]
 
             right_direction = [Position(x, y) for x in range(5, 8)]
             right_clear = len(self.cut_after_piece_collision(king, right_direction)) == 2
             passing_through_right_check = self.is_move_going_into_enemy_attack_range(Move(king_pos, right_direction[0]))
-            right_rook_not_moved = any(map(Position(7, y).__eq__, not_moved_rook_pos_list))
+            right_rook_not_moved = bool(rights & short_castle)
 
             left_direction = [Position(x, y) for x in range(3, -1, -1)]
             left_clear = len(self.cut_after_piece_collision(king, left_direction)) == 3
             passing_through_left_check = self.is_move_going_into_enemy_attack_range(Move(king_pos, left_direction[0]))
-            left_rook_not_moved = any(map(Position(0, y).__eq__, not_moved_rook_pos_list))
+            left_rook_not_moved = bool(rights & long_castle)
 
             if left_clear and not passing_through_left_check and left_rook_not_moved:
                 castle_moves.append(Move(king_pos, left_direction[1]))
@@ -1,7 +1,8 @@
 import unittest
 
-from game.core.move_graph import MoveGraph
+from game.core.move_graph import MoveGraph, MoveIndex
 from game.core.chessboard import Chessboard, Move, Position
+from game.core.chesspiece import PieceColor
 
 
 class MoveGraphTestCase(unittest.TestCase):
@@ -28,6 +29,21 @@ class MoveGraphTestCase(unittest.TestCase):
         graph = MoveGraph(chessboard)
         self.assertEqual([], [str(move) for move in graph.get_moves_by_start(Position.from_str('f7'))])
 
+    def test_move_index(self):
+        chessboard = Chessboard()
+        index = MoveIndex(chessboard, Move.from_str_list(['e2e4', 'e2e3', 'd2d4', 'e7e5']))
+        self.assertEqual({'e2e4', 'e2e3'}, {str(move) for move in index.by_start(Position.from_str('e2').inx())})
+        self.assertEqual(['e2e4'], [str(move) for move in index.by_end(Position.from_str('e4').inx())])
+        self.assertEqual(['e7e5'], [str(move) for move in index.by_color(PieceColor.BLACK)])
+        index.remove(Move.from_str('e2e4'))
+        self.assertEqual([], index.by_end(Position.from_str('e4').inx()))
+        self.assertEqual(3, len(index))
+
+    def test_moves_by_color(self):
+        graph = MoveGraph(Chessboard())
+        self.assertEqual(20, len(graph.get_moves_by_piece_color(PieceColor.WHITE)))
+        self.assertEqual(40, len(graph.moves))
+
 
 if __name__ == '__main__':
     unittest.main()
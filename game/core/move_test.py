@@ -1,5 +1,5 @@
 import unittest
-from game.core.position import Move
+from game.core.position import Move, Position
 
 
 class MoveTest(unittest.TestCase):
@@ -7,6 +7,15 @@ class MoveTest(unittest.TestCase):
         self.assertEqual('e2e4', str(Move.from_str('e2e4')))
         self.assertEqual('a1b1', str(Move.from_indexes(0, 1)))
 
+    def test_interned(self):
+        self.assertIs(Move.from_str('e2e4'), Move.from_indexes(12, 28))
+        self.assertIs(Move(Position.from_str('e2'), Position.from_str('e4')), Move.from_str('e2e4'))
+        self.assertEqual(12 * 64 + 28, Move.from_str('e2e4').inx())
+
+    def test_hash(self):
+        self.assertIn(Move.from_str('e2e4'), {Move.from_indexes(12, 28)})
+        self.assertNotEqual(Move.from_str('e2e4'), Move.from_str('e4e2'))
+
 
 if __name__ == '__main__':
     unittest.main()
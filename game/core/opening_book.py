@@ -0,0 +1,120 @@
+import mmap
+import os
+import random
+import struct
+from collections import Counter
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from game.core.chessboard import Chessboard, Move
+from game.core.legal_moves import generate_legal_moves
+from game.core.move_codec import decode_move, encode_move
+
+# Opening book file: an 8-byte header followed by fixed-size little-endian entries of
+# (position hash, move code, weight), sorted by hash and, within a position, by descending weight.
+# The file is memory-mapped read-only, so every process reading it shares the page cache copy.
+BOOK_HEADER = b'DCBOOK\x00\x01'
+ENTRY_FORMAT = struct.Struct('<QHH')
+MAX_WEIGHT = 0xFFFF
+
+
+class BookEntry(NamedTuple):
+    # Chessboard.get_hash() of the position
+    position_hash: int
+    # move_codec code of the move
+    move_code: int
+    # how many games played the move in the position, capped at MAX_WEIGHT
+    weight: int
+
+    def get_move(self) -> Move:
+        return decode_move(self.move_code)
+
+
+# Entries of the positions reached in the first max_plies plies of the games, counting
+# moves played in at least min_games games
+def build_book_entries(games: Iterable[Iterable[Move]], max_plies: int = 24, min_games: int = 2) -> List[BookEntry]:
+    counts = Counter()
+    for moves in games:
+        board = Chessboard()
+        for ply, move in enumerate(moves):
+            if ply >= max_plies:
+                break
+            counts[(board.get_hash(), encode_move(move, board.is_promotion(move)))] += 1
+            board.push(move)
+    entries = [BookEntry(position_hash, move_code, min(count, MAX_WEIGHT))
+               for (position_hash, move_code), count in counts.items() if count >= min_games]
+    entries.sort(key=lambda entry: (entry.position_hash, -entry.weight, entry.move_code))
+    return entries
+
+
+# Written to a temporary file that then replaces path, so processes that have the old book mapped keep reading it
+def write_book(path: str, entries: Iterable[BookEntry]) -> int:
+    temporary_path = f'{path}.tmp{os.getpid()}'
+    count = 0
+    with open(temporary_path, 'wb') as book_file:
+        book_file.write(BOOK_HEADER)
+        for entry in entries:
+            book_file.write(ENTRY_FORMAT.pack(*entry))
+            count += 1
+    os.replace(temporary_path, path)
+    return count
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        with open(path, 'rb') as book_file:
+            self._mmap = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(BOOK_HEADER)] != BOOK_HEADER or \
+                (len(self._mmap) - len(BOOK_HEADER)) % ENTRY_FORMAT.size:
+            self._mmap.close()
+            raise ValueError(f"{path} is not an opening book")
+        self._count = (len(self._mmap) - len(BOOK_HEADER)) // ENTRY_FORMAT.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def entry(self, inx: int) -> BookEntry:
+        return BookEntry(*ENTRY_FORMAT.unpack_from(self._mmap, len(BOOK_HEADER) + inx * ENTRY_FORMAT.size))
+
+    def _position_hash(self, inx: int) -> int:
+        return ENTRY_FORMAT.unpack_from(self._mmap, len(BOOK_HEADER) + inx * ENTRY_FORMAT.size)[0]
+
+    # first entry of the position, found by binary search
+    def _lower_bound(self, position_hash: int) -> int:
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._position_hash(middle) < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_entries(self, position_hash: int) -> List[BookEntry]:
+        entries = []
+        inx = self._lower_bound(position_hash)
+        while inx < self._count:
+            entry = self.entry(inx)
+            if entry.position_hash != position_hash:
+                break
+            entries.append(entry)
+            inx += 1
+        return entries
+
+    # legal book moves of the position with their weights, heaviest first; a hash collision can't suggest
+    # a move that is illegal on the board
+    def get_moves(self, board: Chessboard) -> List[Tuple[Move, int]]:
+        entries = self.get_entries(board.get_hash())
+        if not entries:
+            return []
+        legal_moves = generate_legal_moves(board).moves
+        return [(entry.get_move(), entry.weight) for entry in entries if entry.get_move() in legal_moves]
+
+    # one of the book moves, picked at random in proportion to the weights
+    def choose_move(self, board: Chessboard, rng: random.Random = None) -> Optional[Move]:
+        moves = self.get_moves(board)
+        if not moves:
+            return None
+        return (rng or random).choices([move for move, _ in moves], [weight for _, weight in moves])[0]
+
+    def close(self) -> None:
+        self._mmap.close()
@@ -0,0 +1,71 @@
+import os
+import random
+import tempfile
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.engine import search_position
+from game.core.move_codec import pack_moves
+from game.core.opening_book import BookEntry, OpeningBook, build_book_entries, write_book
+
+GAMES = [Move.from_str_list(codes) for codes in (['e2e4', 'e7e5', 'g1f3'],
+                                                 ['e2e4', 'c7c5', 'g1f3'],
+                                                 ['e2e4', 'e7e5', 'f1c4'],
+                                                 ['d2d4', 'd7d5'])]
+
+
+class OpeningBookTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'book.bin')
+
+    def open_book(self, entries) -> OpeningBook:
+        write_book(self.path, entries)
+        book = OpeningBook(self.path)
+        self.addCleanup(book.close)
+        return book
+
+    def test_moves_are_weighted_by_games(self):
+        book = self.open_book(build_book_entries(GAMES, min_games=1))
+        self.assertEqual([(Move.from_str('e2e4'), 3), (Move.from_str('d2d4'), 1)], book.get_moves(Chessboard()))
+        board = Chessboard.from_moves_list(Move.from_str_list(['e2e4', 'e7e5']))
+        self.assertEqual({Move.from_str('g1f3'), Move.from_str('f1c4')}, {move for move, _ in book.get_moves(board)})
+
+    def test_min_games_and_max_plies(self):
+        book = self.open_book(build_book_entries(GAMES, max_plies=2, min_games=2))
+        self.assertEqual([(Move.from_str('e2e4'), 3)], book.get_moves(Chessboard()))
+        self.assertEqual(2, len(book))
+
+    def test_binary_search(self):
+        rng = random.Random(7)
+        entries = sorted(BookEntry(rng.getrandbits(64) & ~0xF, rng.randrange(4096), rng.randrange(1, 100))
+                         for _ in range(1000))
+        book = self.open_book(entries)
+        for entry in entries[::37]:
+            self.assertIn(entry, book.get_entries(entry.position_hash))
+        self.assertEqual([], book.get_entries(entries[0].position_hash | 1))
+        self.assertEqual([], book.get_entries(0))
+        self.assertEqual([], book.get_entries((1 << 64) - 1))
+
+    def test_illegal_book_move_is_skipped(self):
+        book = self.open_book([BookEntry(Chessboard().get_hash(), Move.from_str('e2e5').inx(), 10)])
+        self.assertEqual([], book.get_moves(Chessboard()))
+        self.assertIsNone(book.choose_move(Chessboard()))
+
+    def test_not_a_book(self):
+        with open(self.path, 'wb') as book_file:
+            book_file.write(b'not a book at all')
+        with self.assertRaises(ValueError):
+            OpeningBook(self.path)
+
+    def test_engine_plays_book_move(self):
+        write_book(self.path, build_book_entries(GAMES, min_games=1))
+        result = search_position(None, pack_moves(GAMES[3][:1]), None, None, 1, self.path)
+        self.assertTrue(result.book)
+        self.assertEqual(Move.from_str('d7d5'), result.move)
+        self.assertFalse(search_position(None, pack_moves(GAMES[3]), None, None, 1, self.path).book)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+
+from game.core.bitboard import BitboardChessboard
+from game.core.chessboard import Chessboard, Move
+from game.core.move_graph import MoveGraph
+
+
+# a named position reached by playing moves from the initial position, or from fen when given
+class PerftPosition(NamedTuple):
+    name: str
+    moves: Tuple[str, ...]
+    # leaf node counts for depth 1, 2, ... - pawns always promote to a queen in this engine,
+    # so positions with promotions are counted without under-promotions
+    expected: Tuple[int, ...]
+    fen: Optional[str] = None
+
+    def new_board(self, board_class: Type[Chessboard] = Chessboard) -> Chessboard:
+        board = board_class() if self.fen is None else board_class.from_fen(self.fen)
+        for move in Move.from_str_list(list(self.moves)):
+            board.push(move)
+        return board
+
+
+PERFT_POSITIONS: Dict[str, PerftPosition] = {position.name: position for position in [
+    PerftPosition('start', (), (20, 400, 8902, 197281)),
+    PerftPosition('castling', ('e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'f8c5'), (33, 1150, 37139, 1272509)),
+    PerftPosition('en-passant', ('e2e4', 'a7a6', 'e4e5', 'd7d5'), (31, 781, 24166, 630536)),
+    PerftPosition('check', ('e2e4', 'd7d5', 'f1b5'), (5, 173, 3980, 135212)),
+    PerftPosition('promotion', ('h2h4', 'g7g5', 'h4g5', 'h7h6', 'g5h6', 'f8g7', 'h6g7', 'g8f6'),
+                  (27, 629, 17724, 425965)),
+    PerftPosition('kiwipete', (), (48, 2039, 97862),
+                  'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'),
+    PerftPosition('endgame', (), (14, 191, 2812), '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'),
+    PerftPosition('mirrored', (), (6, 228, 8087),
+                  'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1'),
+    PerftPosition('middlegame', (), (41, 1373, 54007), 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8'),
+]}
+
+BOARD_CLASSES: Dict[str, Type[Chessboard]] = {'mailbox': Chessboard, 'bitboard': BitboardChessboard}
+
+
+class PerftResult(NamedTuple):
+    name: str
+    depth: int
+    nodes: int
+    expected: Optional[int]
+    seconds: float
+    divide: Dict[str, int]
+
+    def is_correct(self) -> Optional[bool]:
+        return None if self.expected is None else self.nodes == self.expected
+
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {'name': self.name,
+                'depth': self.depth,
+                'nodes': self.nodes,
+                'expected': self.expected,
+                'correct': self.is_correct(),
+                'seconds': round(self.seconds, 6),
+                'nodes_per_second': round(self.nodes_per_second(), 1),
+                'divide': self.divide}
+
+
+def legal_moves(board: Chessboard) -> List[Move]:
+    return MoveGraph(board, side_to_move_only=True).moves
+
+
+# number of leaf nodes of the move tree of the given depth
+def perft(board: Chessboard, depth: int) -> int:
+    if depth == 0:
+        return 1
+    moves = legal_moves(board)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+# perft split by the first move
+def divide(board: Chessboard, depth: int) -> Dict[str, int]:
+    counts = {}
+    for move in legal_moves(board):
+        board.push(move)
+        counts[str(move)] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
+def run_perft(position: PerftPosition, depth: int, board_class: Type[Chessboard] = Chessboard,
+              with_divide: bool = False) -> PerftResult:
+    board = position.new_board(board_class)
+    start = time.perf_counter()
+    if with_divide:
+        counts = divide(board, depth)
+        nodes = sum(counts.values())
+    else:
+        counts = {}
+        nodes = perft(board, depth)
+    seconds = time.perf_counter() - start
+    expected = position.expected[depth - 1] if depth <= len(position.expected) else None
+    return PerftResult(name=position.name, depth=depth, nodes=nodes, expected=expected, seconds=seconds,
+                       divide=counts)
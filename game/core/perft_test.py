@@ -0,0 +1,31 @@
+import unittest
+
+from game.core.perft import PERFT_POSITIONS, BOARD_CLASSES, run_perft, perft, divide
+
+
+class PerftTestCase(unittest.TestCase):
+    def test_reference_positions(self):
+        for position in PERFT_POSITIONS.values():
+            for board_class in BOARD_CLASSES.values():
+                result = run_perft(position, 2, board_class)
+                self.assertTrue(result.is_correct(), f'{position.name} on {board_class.__name__}: {result.nodes}')
+
+    def test_start_position_depth_3(self):
+        self.assertEqual(8902, perft(PERFT_POSITIONS['start'].new_board(), 3))
+
+    def test_divide(self):
+        board = PERFT_POSITIONS['check'].new_board()
+        counts = divide(board, 2)
+        self.assertEqual({'b8c6', 'b8d7', 'c7c6', 'c8d7', 'd8d7'}, set(counts))
+        self.assertEqual(173, sum(counts.values()))
+        # the board is left as it was
+        self.assertEqual(3, board.get_ply())
+
+    def test_result_dict(self):
+        result = run_perft(PERFT_POSITIONS['start'], 1, with_divide=True)
+        self.assertEqual(20, len(result.as_dict()['divide']))
+        self.assertTrue(result.as_dict()['correct'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+from game.core.chessboard import Chessboard, Move
+from game.core.chesspiece import PieceColor
+from game.core.chesspieces import King, Knight, Pawn, Rook, Bishop, Queen
+from game.core.game_state import GameState
+from game.core.legal_moves import generate_legal_moves
+from game.core.move_graph import MoveGraph
+
+# PGN reading and writing. Games are read and written one at a time, so only a single game
+# is ever held in memory regardless of the size of the file.
+WHITE_WINS = '1-0'
+BLACK_WINS = '0-1'
+DRAW = '1/2-1/2'
+UNFINISHED = '*'
+RESULTS = (WHITE_WINS, BLACK_WINS, DRAW, UNFINISHED)
+
+# the seven tag roster, written first and in this order
+TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+_PIECE_LETTERS = {Knight: 'N', Bishop: 'B', Rook: 'R', Queen: 'Q', King: 'K'}
+_LETTER_PIECES = {letter: piece_type for piece_type, letter in _PIECE_LETTERS.items()}
+_SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+_TAG_PATTERN = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_TOKEN_PATTERN = re.compile(r'[{}();]|[^\s{}();]+')
+_MOVE_NUMBER_PATTERN = re.compile(r'^\d+\.*')
+_LINE_LENGTH = 79
+
+
+class PgnGame(NamedTuple):
+    headers: Dict[str, str]
+    # moves in standard algebraic notation
+    san_moves: List[str]
+    result: str
+
+
+# SAN of a legal move, without the check suffix
+def move_san(board: Chessboard, move: Move, legal_moves: List[Move] = None) -> str:
+    piece = board.get_piece(move.get_start())
+    if board.is_castle(move):
+        return 'O-O' if move.get_end().x() == 6 else 'O-O-O'
+    is_capture = not board.is_empty(move.get_end()) or board.is_en_passant(move)
+    target = str(move.get_end())
+    if isinstance(piece, Pawn):
+        san = (str(move.get_start())[0] + 'x' if is_capture else '') + target
+        return san + '=Q' if board.is_promotion(move) else san
+
+    legal_moves = generate_legal_moves(board).moves if legal_moves is None else legal_moves
+    # other pieces of the same kind that can move to the same square
+    rivals = [other.get_start() for other in legal_moves
+              if other.get_end() is move.get_end() and other.get_start() is not move.get_start()
+              and type(board.get_piece(other.get_start())) is type(piece)]
+    start = move.get_start()
+    if not rivals:
+        disambiguation = ''
+    elif all(rival.x() != start.x() for rival in rivals):
+        disambiguation = str(start)[0]
+    elif all(rival.y() != start.y() for rival in rivals):
+        disambiguation = str(start)[1]
+    else:
+        disambiguation = str(start)
+    return _PIECE_LETTERS[type(piece)] + disambiguation + ('x' if is_capture else '') + target
+
+
+# SANs of moves played one after another, with check and mate suffixes; the moves are pushed onto the board
+def iter_san(moves: Iterable[Move], board: Chessboard = None) -> Iterator[str]:
+    board = Chessboard() if board is None else board
+    legal_moves = generate_legal_moves(board)
+    for move in moves:
+        if move not in legal_moves.moves:
+            raise ValueError(f"Move {move} is illegal in {board.to_fen()}")
+        san = move_san(board, move, legal_moves.moves)
+        board.push(move)
+        legal_moves = generate_legal_moves(board)
+        if legal_moves.checkers:
+            san += '+' if legal_moves.moves else '#'
+        yield san
+
+
+def parse_san(board: Chessboard, san: str, legal_moves: List[Move] = None) -> Move:
+    legal_moves = generate_legal_moves(board).moves if legal_moves is None else legal_moves
+    code = san.rstrip('+#!?')
+    if code in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        candidates = [move for move in legal_moves if board.is_castle(move)
+                      and (move.get_end().x() == 6) == (len(code) == 3)]
+    else:
+        match = _SAN_PATTERN.match(code)
+        if match is None:
+            raise ValueError(f"Invalid SAN '{san}'")
+        piece_letter, from_file, from_rank, target, promotion = match.groups()
+        if promotion is not None and promotion != 'Q':
+            raise ValueError(f"Under-promotion '{san}' is not supported, pawns always promote to a queen")
+        piece_type = _LETTER_PIECES.get(piece_letter, Pawn)
+        candidates = [move for move in legal_moves
+                      if str(move.get_end()) == target
+                      and type(board.get_piece(move.get_start())) is piece_type
+                      and (from_file is None or str(move.get_start())[0] == from_file)
+                      and (from_rank is None or str(move.get_start())[1] == from_rank)]
+    if len(candidates) != 1:
+        problem = 'illegal' if not candidates else 'ambiguous'
+        raise ValueError(f"SAN '{san}' is {problem} in {board.to_fen()}")
+    return candidates[0]
+
+
+# moves of SANs played one after another from the board, each with whether it promotes a pawn;
+# the moves are pushed onto the board
+def iter_san_moves(san_moves: Iterable[str], board: Chessboard = None) -> Iterator[Tuple[Move, bool]]:
+    board = Chessboard() if board is None else board
+    for san in san_moves:
+        move = parse_san(board, san)
+        promotion = board.is_promotion(move)
+        board.push(move)
+        yield move, promotion
+
+
+def game_result(board: Chessboard) -> str:
+    state = GameState(MoveGraph(board, side_to_move_only=True), board.get_turn())
+    if state.is_checkmate():
+        return BLACK_WINS if board.get_turn() is PieceColor.WHITE else WHITE_WINS
+    return DRAW if state.is_draw() else UNFINISHED
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', r'\1', value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+# Games of a PGN text given line by line. Comments, variations and annotations are skipped.
+def read_pgn(lines: Iterable[str]) -> Iterator[PgnGame]:
+    headers: Dict[str, str] = {}
+    san_moves: List[str] = []
+    in_comment = False
+    variation_depth = 0
+    for line in lines:
+        line = line.strip()
+        if not in_comment and variation_depth == 0:
+            if line.startswith('%'):
+                continue
+            tag = _TAG_PATTERN.match(line)
+            if tag is not None:
+                # a tag after moves starts the next game, even when the previous one had no result
+                if san_moves:
+                    yield PgnGame(headers, san_moves, headers.get('Result', UNFINISHED))
+                    headers, san_moves = {}, []
+                headers[tag.group(1)] = _unescape(tag.group(2))
+                continue
+        for token in _TOKEN_PATTERN.findall(line):
+            if in_comment:
+                in_comment = token != '}'
+            elif token == '{':
+                in_comment = True
+            elif token == ';':
+                break
+            elif token == '(':
+                variation_depth += 1
+            elif token == ')':
+                variation_depth = max(variation_depth - 1, 0)
+            elif variation_depth or token.startswith('$'):
+                continue
+            elif token in RESULTS:
+                yield PgnGame(headers, san_moves, token)
+                headers, san_moves = {}, []
+            else:
+                san = _MOVE_NUMBER_PATTERN.sub('', token)
+                if san:
+                    san_moves.append(san)
+    if san_moves or headers:
+        yield PgnGame(headers, san_moves, headers.get('Result', UNFINISHED))
+
+
+# PGN text of a game played from the initial position, ending with an empty line.
+# The Result tag is set from the final position unless given.
+def write_pgn_game(headers: Dict[str, str], moves: Iterable[Move]) -> str:
+    board = Chessboard()
+    words = []
+    for ply, san in enumerate(iter_san(moves, board)):
+        words.append(f'{ply // 2 + 1}. {san}' if ply % 2 == 0 else san)
+    result = headers.get('Result') or game_result(board)
+    words.append(result)
+
+    headers = {**{tag: '?' for tag in TAG_ROSTER}, **headers, 'Result': result}
+    tags = [*TAG_ROSTER, *(tag for tag in headers if tag not in TAG_ROSTER)]
+    lines = [f'[{tag} "{_escape(str(headers[tag]))}"]' for tag in tags]
+    lines.append('')
+    line = ''
+    for word in words:
+        if line and len(line) + 1 + len(word) > _LINE_LENGTH:
+            lines.append(line)
+            line = word
+        else:
+            line = f'{line} {word}' if line else word
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def write_pgn(games: Iterable[Tuple[Dict[str, str], Iterable[Move]]]) -> Iterator[str]:
+    for headers, moves in games:
+        yield write_pgn_game(headers, moves)
@@ -0,0 +1,84 @@
+import io
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.pgn import PgnGame, move_san, iter_san, parse_san, iter_san_moves, read_pgn, write_pgn_game
+
+PGN = '''[Event "Casual"]
+[White "Anna \\\\ \\"A\\""]
+[Black "Ben"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 {threatening mate; (not really)} Nc6 (2... Nf6?? 3. Qxe5+) 3. Bc4 $1 Nf6?? 4. Qxf7# 1-0
+
+[Event "Second"]
+[Result "*"]
+
+1.d4 d5 ; the rest is lost
+2.c4 *
+'''
+
+
+class PgnTestCase(unittest.TestCase):
+    def test_san_disambiguation(self):
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/1N3N2/R3K2R w KQ - 0 1')
+        self.assertEqual('Nbd3', move_san(board, Move.from_str('b2d3')))
+        self.assertEqual('Rd1', move_san(board, Move.from_str('a1d1')))
+        self.assertEqual('O-O', move_san(board, Move.from_str('e1g1')))
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/4K3/R6R w - - 0 1')
+        self.assertEqual('Rad1', move_san(board, Move.from_str('a1d1')))
+        board = Chessboard.from_fen('4k3/8/8/8/Q7/8/8/Q2QK3 w - - 0 1')
+        self.assertEqual('Qa1d4', move_san(board, Move.from_str('a1d4')))
+        self.assertEqual('Q4d4', move_san(board, Move.from_str('a4d4')))
+
+    def test_san_of_pawn_moves(self):
+        board = Chessboard.from_fen('1r2k3/P7/8/3pP3/8/8/8/4K3 w - d6 0 1')
+        self.assertEqual('exd6', move_san(board, Move.from_str('e5d6')))
+        self.assertEqual('a8=Q', move_san(board, Move.from_str('a7a8')))
+        self.assertEqual('axb8=Q', move_san(board, Move.from_str('a7b8')))
+
+    def test_check_and_mate_suffixes(self):
+        moves = Move.from_str_list(['f2f3', 'e7e5', 'g2g4', 'd8h4'])
+        self.assertEqual(['f3', 'e5', 'g4', 'Qh4#'], list(iter_san(moves)))
+        moves = Move.from_str_list(['e2e4', 'd7d5', 'f1b5'])
+        self.assertEqual('Bb5+', list(iter_san(moves))[-1])
+
+    def test_parse_san(self):
+        board = Chessboard.from_fen('4k3/8/8/8/8/8/1N3N2/R3K2R w KQ - 0 1')
+        self.assertEqual(Move.from_str('f2d3'), parse_san(board, 'Nfd3'))
+        self.assertEqual(Move.from_str('e1c1'), parse_san(board, 'O-O-O'))
+        self.assertRaises(ValueError, parse_san, board, 'Nd3')
+        self.assertRaises(ValueError, parse_san, board, 'Ke3x')
+        board = Chessboard.from_fen('4k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+        self.assertEqual(Move.from_str('a7a8'), parse_san(board, 'a8=Q+'))
+        self.assertRaises(ValueError, parse_san, board, 'a8=N')
+
+    def test_read_pgn(self):
+        games = list(read_pgn(io.StringIO(PGN)))
+        self.assertEqual(2, len(games))
+        self.assertEqual(PgnGame({'Event': 'Casual', 'White': 'Anna \\ "A"', 'Black': 'Ben', 'Result': '1-0'},
+                                 ['e4', 'e5', 'Qh5', 'Nc6', 'Bc4', 'Nf6??', 'Qxf7#'], '1-0'), games[0])
+        self.assertEqual(['d4', 'd5', 'c4'], games[1].san_moves)
+        self.assertEqual('*', games[1].result)
+        moves = [move for move, _ in iter_san_moves(games[0].san_moves)]
+        self.assertEqual(Move.from_str('h5f7'), moves[-1])
+
+    def test_write_and_read_back(self):
+        moves = Move.from_str_list(['e2e4', 'e7e5', 'd1h5', 'b8c6', 'f1c4', 'g8f6', 'h5f7'])
+        text = write_pgn_game({'White': 'Anna "A"', 'Black': 'Ben', 'Event': 'Casual'}, moves)
+        self.assertTrue(text.startswith('[Event "Casual"]\n[Site "?"]\n[Date "?"]\n[Round "?"]\n'
+                                        '[White "Anna \\"A\\""]\n[Black "Ben"]\n[Result "1-0"]\n\n'))
+        self.assertIn('1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0\n\n', text)
+        game = next(read_pgn(io.StringIO(text)))
+        self.assertEqual('Anna "A"', game.headers['White'])
+        self.assertEqual(moves, [move for move, _ in iter_san_moves(game.san_moves)])
+
+    def test_long_games_are_wrapped(self):
+        moves = Move.from_str_list(['g1f3', 'g8f6', 'f3g1', 'f6g8'] * 10)
+        text = write_pgn_game({}, moves)
+        self.assertTrue(all(len(line) <= 79 for line in text.splitlines()))
+        self.assertIn('1/2-1/2', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,15 +1,27 @@
 from typing import List
 
 
+# Immutable board coordinates. Positions on the board are interned - Position(x, y), from_inx
+# and from_str return one of 64 preallocated instances; off-board positions are created on demand.
 class Position:
-    def __init__(self, x: int, y: int):
-        self._x_coord = x
-        self._y_coord = y
-        self.id = self.inx()
+    __slots__ = ('_x_coord', '_y_coord', 'id')
+
+    def __new__(cls, x: int, y: int):
+        if 0 <= x < 8 and 0 <= y < 8 and _POSITIONS:
+            return _POSITIONS[x + 8 * y]
+        return cls._create(x, y)
+
+    @classmethod
+    def _create(cls, x: int, y: int):
+        position = object.__new__(cls)
+        object.__setattr__(position, '_x_coord', x)
+        object.__setattr__(position, '_y_coord', y)
+        object.__setattr__(position, 'id', x + 8 * y)
+        return position
 
     @staticmethod
     def from_inx(inx: int):
-        return Position(inx % 8, inx // 8)
+        return _POSITIONS[inx]
 
     @staticmethod
     def from_str(code: str):
@@ -25,28 +37,59 @@ class Position:
         return self._y_coord
 
     def inx(self) -> int:
-        return self._x_coord + 8 * self._y_coord
+        return self.id
 
     def is_valid(self) -> bool:
-        return self.x() in range(0, 8) and self.y() in range(0, 8)
+        return 0 <= self._x_coord < 8 and 0 <= self._y_coord < 8
 
     def __str__(self) -> str:
         return f"{chr(ord('a') + self.x())}{self.y() + 1}"
 
+    def __repr__(self) -> str:
+        return f"Position({self._x_coord}, {self._y_coord})"
+
     def __eq__(self, other):
-        return self.inx() == other.inx()
+        if self is other:
+            return True
+        if not isinstance(other, Position):
+            return NotImplemented
+        return self._x_coord == other._x_coord and self._y_coord == other._y_coord
+
+    def __hash__(self):
+        return self.id
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
+    def __reduce__(self):
+        return Position, (self._x_coord, self._y_coord)
 
+
+_POSITIONS: List[Position] = []
+_POSITIONS.extend(Position._create(inx % 8, inx // 8) for inx in range(64))
+
+
+# Immutable move between two positions. Moves between board positions are interned in a table
+# of 64 * 64 instances indexed by start index * 64 + end index.
 class Move:
-    def __init__(self, start_pos: Position, end_pos: Position):
-        self._start_pos = start_pos
-        self._end_pos = end_pos
+    __slots__ = ('_start_pos', '_end_pos', '_inx')
+
+    def __new__(cls, start_pos: Position, end_pos: Position):
+        if _MOVES and start_pos.is_valid() and end_pos.is_valid():
+            return _MOVES[start_pos.inx() * 64 + end_pos.inx()]
+        return cls._create(start_pos, end_pos)
+
+    @classmethod
+    def _create(cls, start_pos: Position, end_pos: Position):
+        move = object.__new__(cls)
+        object.__setattr__(move, '_start_pos', start_pos)
+        object.__setattr__(move, '_end_pos', end_pos)
+        object.__setattr__(move, '_inx', start_pos.inx() * 64 + end_pos.inx())
+        return move
 
     @staticmethod
     def from_str(code: str):
-        start_pos = Position.from_str(code[0:2])
-        end_pos = Position.from_str(code[2:4])
-        return Move(start_pos, end_pos)
+        return _MOVES_BY_CODE.get(code[0:4]) or Move(Position.from_str(code[0:2]), Position.from_str(code[2:4]))
 
     @staticmethod
     def from_str_list(code_list: List[str]):
@@ -54,7 +97,7 @@ class Move:
 
     @staticmethod
     def from_indexes(start_inx: int, end_inx: int):
-        return Move(Position.from_inx(start_inx), Position.from_inx(end_inx))
+        return _MOVES[start_inx * 64 + end_inx]
 
     def as_dict(self):
         return {'start_pos': self._start_pos.inx(),
@@ -66,8 +109,32 @@ class Move:
     def get_end(self) -> Position:
         return self._end_pos
 
+    def inx(self) -> int:
+        return self._inx
+
     def __str__(self):
         return str(self._start_pos) + str(self._end_pos)
 
+    def __repr__(self) -> str:
+        return f"Move.from_str('{self}')"
+
     def __eq__(self, other):
-        return str(self) == str(other)
+        if self is other:
+            return True
+        if not isinstance(other, Move):
+            return NotImplemented
+        return self._start_pos == other._start_pos and self._end_pos == other._end_pos
+
+    def __hash__(self):
+        return self._inx
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return Move, (self._start_pos, self._end_pos)
+
+
+_MOVES: List[Move] = []
+_MOVES.extend(Move._create(_POSITIONS[inx // 64], _POSITIONS[inx % 64]) for inx in range(64 * 64))
+_MOVES_BY_CODE = {str(move): move for move in _MOVES}
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 from game.core.position import Position
 
@@ -21,6 +22,19 @@ class PositionTestCase(unittest.TestCase):
         self.assertEqual(Position.from_str('e2'),
                          Position.from_str('e2'))
 
+    def test_interned(self):
+        self.assertIs(Position.from_str('e2'), Position.from_inx(12))
+        self.assertIs(Position(4, 1), Position.from_inx(12))
+        self.assertIs(Position.from_inx(12), pickle.loads(pickle.dumps(Position.from_inx(12))))
+
+    def test_hash(self):
+        self.assertEqual({Position.from_str('e2')}, {Position(4, 1)})
+        self.assertNotEqual(Position(-1, 1), Position(7, 0))
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            Position.from_str('e2')._x_coord = 0
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,146 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from game.core.chessboard import Chessboard, Move
+from game.core.legal_moves import generate_legal_moves
+from game.core.move_codec import decode_move, encode_move, unpack_codes
+
+# Bulk replay of stored games. Everything here works on plain values so that worker processes
+# only need game.core - the rows are read from the database by the caller.
+
+
+# one stored game: its players, PlayerGameMove rows ordered by index and the packed move list of the Game row
+class GameRecord(NamedTuple):
+    game_id: int
+    white_player_id: Optional[int]
+    black_player_id: Optional[int]
+    # (index, player id, move code) of every PlayerGameMove
+    moves: Sequence[tuple]
+    packed_moves: bytes
+    # the Game row's position snapshot, None when it is not checked
+    snapshot: Optional[bytes] = None
+
+
+# the moves are fine, only the position snapshot has to be rewritten
+STALE_SNAPSHOT_ERROR = 'position snapshot does not match the replayed game'
+
+
+class ReplayResult(NamedTuple):
+    game_id: int
+    plies: int
+    # what is wrong with the game, None when it is valid
+    error: Optional[str]
+
+
+class ChunkResult(NamedTuple):
+    worker: int
+    results: List[ReplayResult]
+    seconds: float
+
+
+class WorkerTiming(NamedTuple):
+    chunks: int
+    games: int
+    plies: int
+    seconds: float
+
+
+class ValidationReport(NamedTuple):
+    games: int
+    plies: int
+    seconds: float
+    invalid: List[ReplayResult]
+    workers: Dict[int, WorkerTiming]
+
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds > 0 else 0.0
+
+    def plies_per_second(self) -> float:
+        return self.plies / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {'games': self.games,
+                'plies': self.plies,
+                'seconds': round(self.seconds, 6),
+                'games_per_second': round(self.games_per_second(), 1),
+                'plies_per_second': round(self.plies_per_second(), 1),
+                'invalid': [result._asdict() for result in self.invalid],
+                'workers': {str(worker): timing._asdict() for worker, timing in self.workers.items()}}
+
+
+def replay_game(record: GameRecord) -> ReplayResult:
+    board = Chessboard()
+    codes = unpack_codes(record.packed_moves)
+    players = (record.white_player_id, record.black_player_id)
+    for ply, (index, player_id, move_code) in enumerate(record.moves):
+        if index != ply + 1:
+            return ReplayResult(record.game_id, ply, f'move {move_code} has index {index}, expected {ply + 1}')
+        player = players[ply % 2]
+        if player is not None and player_id != player:
+            return ReplayResult(record.game_id, ply, f'move {index} {move_code} was made by player {player_id}, '
+                                                     f'expected {player}')
+        try:
+            move = Move.from_str(move_code)
+        except (IndexError, ValueError):
+            return ReplayResult(record.game_id, ply, f'move {index} has invalid code {move_code!r}')
+        if move not in generate_legal_moves(board).moves:
+            return ReplayResult(record.game_id, ply, f'move {index} {move_code} is illegal in {board.to_fen()}')
+        if ply >= len(codes) or codes[ply] != encode_move(move, board.is_promotion(move)):
+            packed = str(decode_move(codes[ply])) if ply < len(codes) else 'nothing'
+            return ReplayResult(record.game_id, ply, f'packed move list has {packed} as move {index}, '
+                                                     f'expected {move_code}')
+        board.push(move)
+    if len(codes) != len(record.moves):
+        return ReplayResult(record.game_id, len(record.moves),
+                            f'packed move list has {len(codes)} moves, expected {len(record.moves)}')
+    if record.snapshot is not None and record.snapshot != board.to_snapshot():
+        return ReplayResult(record.game_id, len(record.moves), STALE_SNAPSHOT_ERROR)
+    return ReplayResult(record.game_id, len(record.moves), None)
+
+
+def replay_chunk(records: List[GameRecord]) -> ChunkResult:
+    start = time.perf_counter()
+    results = [replay_game(record) for record in records]
+    return ChunkResult(worker=os.getpid(), results=results, seconds=time.perf_counter() - start)
+
+
+# Replays chunks of games on a process pool. Chunks are read lazily, keeping at most
+# two per worker in flight, so the whole archive is never held in memory. Workers are spawned
+# rather than forked, so they don't inherit the caller's Django setup or database connections.
+def validate_games(chunks: Iterable[List[GameRecord]], workers: Optional[int] = None) -> ValidationReport:
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    games = 0
+    plies = 0
+    invalid = []
+    timings: Dict[int, WorkerTiming] = {}
+
+    def collect(chunk_result: ChunkResult):
+        nonlocal games, plies
+        games += len(chunk_result.results)
+        plies += sum(result.plies for result in chunk_result.results)
+        invalid.extend(result for result in chunk_result.results if result.error is not None)
+        timing = timings.get(chunk_result.worker, WorkerTiming(0, 0, 0, 0.0))
+        timings[chunk_result.worker] = WorkerTiming(
+            chunks=timing.chunks + 1,
+            games=timing.games + len(chunk_result.results),
+            plies=timing.plies + sum(result.plies for result in chunk_result.results),
+            seconds=timing.seconds + chunk_result.seconds)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future.result())
+            pending.add(executor.submit(replay_chunk, chunk))
+        for future in wait(pending).done:
+            collect(future.result())
+
+    invalid.sort(key=lambda result: result.game_id)
+    return ValidationReport(games=games, plies=plies, seconds=time.perf_counter() - start, invalid=invalid,
+                            workers=timings)
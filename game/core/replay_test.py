@@ -0,0 +1,61 @@
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.move_codec import pack_moves
+from game.core.replay import STALE_SNAPSHOT_ERROR, GameRecord, replay_game, validate_games
+
+WHITE, BLACK = 1, 2
+
+
+def record_of(game_id, codes, players=None, packed_codes=None):
+    moves = Move.from_str_list(codes)
+    players = players or [(WHITE, BLACK)[ply % 2] for ply in range(len(codes))]
+    return GameRecord(game_id=game_id, white_player_id=WHITE, black_player_id=BLACK,
+                      moves=[(ply + 1, players[ply], code) for ply, code in enumerate(codes)],
+                      packed_moves=pack_moves(Move.from_str_list(packed_codes) if packed_codes is not None else moves))
+
+
+class ReplayTestCase(unittest.TestCase):
+    def test_valid_game(self):
+        result = replay_game(record_of(1, ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'g8f6', 'e1g1']))
+        self.assertIsNone(result.error)
+        self.assertEqual(7, result.plies)
+
+    def test_illegal_move(self):
+        result = replay_game(record_of(1, ['e2e4', 'e7e5', 'e1e3']))
+        self.assertEqual(2, result.plies)
+        self.assertIn('e1e3 is illegal', result.error)
+
+    def test_wrong_player(self):
+        result = replay_game(record_of(1, ['e2e4', 'e7e5'], players=[WHITE, WHITE]))
+        self.assertIn('made by player 1', result.error)
+
+    def test_packed_moves_differ(self):
+        self.assertIn('d2d4 as move 1', replay_game(record_of(1, ['e2e4'], packed_codes=['d2d4'])).error)
+        self.assertIn('has 2 moves', replay_game(record_of(1, ['e2e4'], packed_codes=['e2e4', 'e7e5'])).error)
+
+    def test_promotion_flag_is_checked(self):
+        codes = ['h2h4', 'g7g5', 'h4g5', 'h7h6', 'g5h6', 'f8g7', 'h6g7', 'g8f6', 'g7h8']
+        record = record_of(1, codes)._replace(packed_moves=pack_moves(Move.from_str_list(codes), [False] * 8 + [True]))
+        self.assertIsNone(replay_game(record).error)
+        self.assertIn('as move 9', replay_game(record_of(1, codes)).error)
+
+    def test_snapshot_is_checked(self):
+        codes = ['e2e4', 'e7e5', 'g1f3']
+        snapshot = Chessboard.from_moves_list(Move.from_str_list(codes)).to_snapshot()
+        self.assertIsNone(replay_game(record_of(1, codes)._replace(snapshot=snapshot)).error)
+        self.assertEqual(STALE_SNAPSHOT_ERROR, replay_game(record_of(1, codes[:2])._replace(snapshot=snapshot)).error)
+        self.assertEqual(STALE_SNAPSHOT_ERROR, replay_game(record_of(1, codes)._replace(snapshot=b'')).error)
+
+    def test_validate_games_on_process_pool(self):
+        chunks = [[record_of(1, ['e2e4', 'e7e5']), record_of(2, ['e2e5'])], [record_of(3, ['d2d4'])]]
+        report = validate_games(iter(chunks), workers=2)
+        self.assertEqual(3, report.games)
+        self.assertEqual(3, report.plies)
+        self.assertEqual([2], [result.game_id for result in report.invalid])
+        self.assertEqual(3, sum(timing.games for timing in report.workers.values()))
+        self.assertEqual(3, report.as_dict()['games'])
+
+
+if __name__ == '__main__':
+    unittest.main()
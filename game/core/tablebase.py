@@ -0,0 +1,574 @@
+import itertools
+import mmap
+import os
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from game.core.attack_tables import KING_TARGETS, KNIGHT_TARGETS, PAWN_ATTACKS, PAWN_PUSHES, RAYS, \
+    BISHOP_SLOPES, ROOK_SLOPES
+from game.core.chessboard import Chessboard, Move
+from game.core.chesspiece import PieceColor
+from game.core.legal_moves import generate_legal_moves
+
+# Endgame tablebases built by retrograde analysis. A table holds every position of one material set,
+# e.g. 'KQKR' (white king and queen against black king and rook), with both sides to move. Each position is
+# one byte: DRAW, INVALID or the number of plies to mate plus one - odd plies mean the side to move mates,
+# even plies that it gets mated. Tables are stored with the stronger side as white; positions of the other
+# color are looked up mirrored. Castling rights, en passant and the fifty-move rule are not covered.
+DRAW = 0
+INVALID = 255
+MAX_PLIES = INVALID - 2
+
+WIN = 1
+LOSS = -1
+
+TABLE_HEADER = b'DCTB\x00\x00\x00\x01'
+TABLE_SUFFIX = '.tb'
+
+PIECE_ORDER = 'KQRBNP'
+_PIECE_VALUES = {'K': 0, 'Q': 9, 'R': 5, 'B': 3, 'N': 3, 'P': 1}
+_WHITE, _BLACK = 0, 1
+_COLORS = {PieceColor.WHITE: _WHITE, PieceColor.BLACK: _BLACK}
+_PAWN_DIRECTION = (1, -1)
+_LAST_RANK = (7, 0)
+
+_KING_TARGET_SETS = tuple(frozenset(targets) for targets in KING_TARGETS)
+_KNIGHT_TARGET_SETS = tuple(frozenset(targets) for targets in KNIGHT_TARGETS)
+_PAWN_ATTACK_SETS = tuple(tuple(frozenset(targets) for targets in PAWN_ATTACKS[direction])
+                          for direction in _PAWN_DIRECTION)
+_ROOK_RAYS = tuple(tuple(RAYS[slope][inx] for slope in ROOK_SLOPES if RAYS[slope][inx]) for inx in range(64))
+_BISHOP_RAYS = tuple(tuple(RAYS[slope][inx] for slope in BISHOP_SLOPES if RAYS[slope][inx]) for inx in range(64))
+_SLIDER_RAYS = {'R': _ROOK_RAYS, 'B': _BISHOP_RAYS,
+                'Q': tuple(rook + bishop for rook, bishop in zip(_ROOK_RAYS, _BISHOP_RAYS))}
+
+
+# (squares strictly between, whether on a rank or file) for every pair of squares on one line, else None
+def _line(start: int, end: int):
+    for slopes, orthogonal in ((ROOK_SLOPES, True), (BISHOP_SLOPES, False)):
+        for slope in slopes:
+            ray = RAYS[slope][start]
+            if end in ray:
+                return ray[:ray.index(end)], orthogonal
+    return None
+
+
+_LINES = tuple(tuple(_line(start, end) for end in range(64)) for start in range(64))
+
+# the eight symmetries of the board, as square index maps
+_SYMMETRIES = tuple(tuple(new_x(inx % 8, inx // 8) + 8 * new_y(inx % 8, inx // 8) for inx in range(64))
+                    for new_x, new_y in ((lambda x, y: x, lambda x, y: y),
+                                         (lambda x, y: 7 - x, lambda x, y: y),
+                                         (lambda x, y: x, lambda x, y: 7 - y),
+                                         (lambda x, y: 7 - x, lambda x, y: 7 - y),
+                                         (lambda x, y: y, lambda x, y: x),
+                                         (lambda x, y: 7 - y, lambda x, y: x),
+                                         (lambda x, y: y, lambda x, y: 7 - x),
+                                         (lambda x, y: 7 - y, lambda x, y: 7 - x)))
+# white king squares of stored positions: the a1-d1-d4 triangle without pawns, files a-d with them
+_PAWNLESS_KING_SQUARES = tuple(x + 8 * y for y in range(4) for x in range(y, 4))
+_PAWN_KING_SQUARES = tuple(x + 8 * y for y in range(8) for x in range(4))
+
+
+class TablebaseResult(NamedTuple):
+    # WIN, DRAW or LOSS for the side to move
+    wdl: int
+    # plies until mate, 0 for a draw
+    plies: int
+
+    def as_dict(self) -> dict:
+        return {'wdl': self.wdl, 'plies': self.plies}
+
+
+def decode_value(value: int) -> Optional[TablebaseResult]:
+    if value == INVALID:
+        return None
+    if value == DRAW:
+        return TablebaseResult(DRAW, 0)
+    plies = value - 1
+    return TablebaseResult(WIN if plies % 2 else LOSS, plies)
+
+
+def _side_key(pieces: str) -> str:
+    return ''.join(sorted(pieces, key=PIECE_ORDER.index))
+
+
+def _strength(side: str) -> tuple:
+    return sum(_PIECE_VALUES[piece] for piece in side), [-PIECE_ORDER.index(piece) for piece in side]
+
+
+def _split_key(key: str) -> Tuple[str, str]:
+    black_king = key.index('K', 1)
+    return key[:black_king], key[black_king:]
+
+
+# name of the stored table and whether the colors are swapped in it
+def normalize_key(key: str) -> Tuple[str, bool]:
+    white, black = _split_key(key)
+    white, black = _side_key(white), _side_key(black)
+    if _strength(black) > _strength(white):
+        return black + white, True
+    return white + black, False
+
+
+def _pieces_key(pieces: Sequence[Tuple[int, str, int]]) -> str:
+    return ''.join(_side_key(''.join(kind for color, kind, _ in pieces if color == side)) for side in (_WHITE, _BLACK))
+
+
+# Index layout of one material set: white king, the other white pieces, black king, the other black pieces,
+# each group of equal pieces sorted by square. Only one of the positions equal up to a symmetry is stored.
+class _Layout:
+    def __init__(self, key: str):
+        white, black = _split_key(key)
+        self.key = key
+        self.slots = [(_WHITE, kind) for kind in white] + [(_BLACK, kind) for kind in black]
+        self.has_pawns = 'P' in key
+        king_squares = _PAWN_KING_SQUARES if self.has_pawns else _PAWNLESS_KING_SQUARES
+        symmetries = _SYMMETRIES[:2] if self.has_pawns else _SYMMETRIES
+        self.king_squares = king_squares
+        self.king_slots = {inx: slot for slot, inx in enumerate(king_squares)}
+        self.symmetries_of_king = tuple(tuple(symmetry for symmetry in symmetries if symmetry[inx] in self.king_slots)
+                                        for inx in range(64))
+        self.groups = [(start, end) for start, end in self._groups() if end - start > 1]
+        self.size = 2 * len(king_squares) * 64 ** (len(self.slots) - 1)
+
+    def _groups(self):
+        start = 0
+        for inx in range(1, len(self.slots) + 1):
+            if inx == len(self.slots) or self.slots[inx] != self.slots[start]:
+                yield start, inx
+                start = inx
+
+    def canonical(self, squares: Sequence[int]) -> List[int]:
+        symmetries = self.symmetries_of_king[squares[0]]
+        if len(symmetries) == 1 and not self.groups:
+            symmetry = symmetries[0]
+            return [symmetry[inx] for inx in squares]
+        best = None
+        for symmetry in symmetries:
+            mapped = [symmetry[inx] for inx in squares]
+            for start, end in self.groups:
+                mapped[start:end] = sorted(mapped[start:end])
+            if best is None or mapped < best:
+                best = mapped
+        return best
+
+    def index(self, side: int, canonical_squares: Sequence[int]) -> int:
+        inx = side * len(self.king_squares) + self.king_slots[canonical_squares[0]]
+        for square in canonical_squares[1:]:
+            inx = inx * 64 + square
+        return inx
+
+    def canonical_index(self, side: int, squares: Sequence[int]) -> int:
+        return self.index(side, self.canonical(squares))
+
+
+# Position of a table during generation and probing: squares of the layout slots and the side to move
+class _Position:
+    def __init__(self, layout: _Layout, squares: List[int], side: int):
+        self.layout = layout
+        self.squares = squares
+        self.side = side
+        self.occupied = {inx: slot for slot, inx in enumerate(squares)}
+
+    def attacks(self, slot: int, target: int, ignored: int = -1) -> bool:
+        color, kind = self.layout.slots[slot]
+        start = self.squares[slot]
+        if kind == 'K':
+            return target in _KING_TARGET_SETS[start]
+        if kind == 'N':
+            return target in _KNIGHT_TARGET_SETS[start]
+        if kind == 'P':
+            return target in _PAWN_ATTACK_SETS[color][start]
+        line = _LINES[start][target]
+        if line is None or (kind == 'R' and not line[1]) or (kind == 'B' and line[1]):
+            return False
+        return all(inx not in self.occupied or inx == ignored for inx in line[0])
+
+    def is_attacked(self, target: int, by_color: int, ignored: int = -1) -> bool:
+        return any(self.layout.slots[slot][0] == by_color and self.attacks(slot, target, ignored)
+                   for slot in range(len(self.squares)) if self.squares[slot] != ignored)
+
+    def king_square(self, color: int) -> int:
+        return self.squares[0] if color == _WHITE else self.squares[self.layout.slots.index((_BLACK, 'K'))]
+
+    def is_valid(self) -> bool:
+        if len(self.occupied) != len(self.squares):
+            return False
+        for slot, (color, kind) in enumerate(self.layout.slots):
+            if kind == 'P' and self.squares[slot] // 8 in (0, 7):
+                return False
+        # the side that just moved can't have left its king attacked
+        return not self.is_attacked(self.king_square(1 - self.side), self.side)
+
+    # (slot, target square, captured slot or None) of every move the side to move could make
+    def pseudo_moves(self):
+        for slot, (color, kind) in enumerate(self.layout.slots):
+            if color != self.side:
+                continue
+            start = self.squares[slot]
+            if kind == 'P':
+                for target in PAWN_PUSHES[_PAWN_DIRECTION[color]][start]:
+                    if target in self.occupied:
+                        break
+                    yield slot, target, None
+                for target in _PAWN_ATTACK_SETS[color][start]:
+                    captured = self.occupied.get(target)
+                    if captured is not None and self.layout.slots[captured][0] != color:
+                        yield slot, target, captured
+                continue
+            if kind in _SLIDER_RAYS:
+                for ray in _SLIDER_RAYS[kind][start]:
+                    for target in ray:
+                        captured = self.occupied.get(target)
+                        if captured is None:
+                            yield slot, target, None
+                            continue
+                        if self.layout.slots[captured][0] != color:
+                            yield slot, target, captured
+                        break
+                continue
+            for target in (_KING_TARGETS_OF[kind][start]):
+                captured = self.occupied.get(target)
+                if captured is None or self.layout.slots[captured][0] != color:
+                    yield slot, target, captured
+
+    # in_check - whether the side to move is in check before the move
+    def is_legal(self, slot: int, target: int, captured: Optional[int], in_check: bool = True) -> bool:
+        start = self.squares[slot]
+        enemy = 1 - self.side
+        is_king_move = self.layout.slots[slot][1] == 'K'
+        king = target if is_king_move else self.king_square(self.side)
+        # a piece that isn't on a line with its king can't be pinned
+        if not in_check and not is_king_move and _LINES[king][start] is None:
+            return True
+        del self.occupied[start]
+        moved_over = self.occupied.get(target)
+        self.occupied[target] = slot
+        self.squares[slot] = target
+        try:
+            return not any(self.layout.slots[other][0] == enemy and other != captured
+                           and self.attacks(other, king) for other in range(len(self.squares)))
+        finally:
+            self.squares[slot] = start
+            if moved_over is None:
+                del self.occupied[target]
+            else:
+                self.occupied[target] = moved_over
+            self.occupied[start] = slot
+
+    # pieces as (color, kind, square) after the move, for moves that leave the table
+    def pieces_after(self, slot: int, target: int, captured: Optional[int]) -> List[Tuple[int, str, int]]:
+        pieces = []
+        for other, (color, kind) in enumerate(self.layout.slots):
+            if other == captured:
+                continue
+            if other == slot:
+                if kind == 'P' and target // 8 == _LAST_RANK[color]:
+                    kind = 'Q'
+                pieces.append((color, kind, target))
+            else:
+                pieces.append((color, kind, self.squares[other]))
+        return pieces
+
+    def leaves_table(self, slot: int, target: int, captured: Optional[int]) -> bool:
+        color, kind = self.layout.slots[slot]
+        return captured is not None or (kind == 'P' and target // 8 == _LAST_RANK[color])
+
+    # squares the piece of the side that just moved could have come from without capturing
+    def unmove_origins(self, slot: int):
+        color, kind = self.layout.slots[slot]
+        end = self.squares[slot]
+        if kind == 'P':
+            direction = _PAWN_DIRECTION[color]
+            start = end - 8 * direction
+            if start in self.occupied or start // 8 in (0, 7):
+                return
+            yield start
+            double_start = end - 16 * direction
+            if double_start // 8 == (1 if color == _WHITE else 6) and double_start not in self.occupied:
+                yield double_start
+            return
+        if kind in _SLIDER_RAYS:
+            for ray in _SLIDER_RAYS[kind][end]:
+                for start in ray:
+                    if start in self.occupied:
+                        break
+                    yield start
+            return
+        for start in _KING_TARGETS_OF[kind][end]:
+            if start not in self.occupied:
+                yield start
+
+
+_KING_TARGETS_OF = {'K': KING_TARGETS, 'N': KNIGHT_TARGETS}
+
+
+# Tables by material key, either loaded from files or just generated
+class Tablebase:
+    def __init__(self, directory: Optional[str] = None):
+        self._tables: Dict[str, Sequence[int]] = {}
+        self._layouts: Dict[str, _Layout] = {}
+        self._files = []
+        if directory is not None and os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(TABLE_SUFFIX):
+                    self._load(os.path.join(directory, name), name[:-len(TABLE_SUFFIX)])
+
+    def _load(self, path: str, key: str) -> None:
+        with open(path, 'rb') as table_file:
+            table = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        layout = _Layout(key)
+        if table[:len(TABLE_HEADER)] != TABLE_HEADER or len(table) != len(TABLE_HEADER) + layout.size:
+            table.close()
+            raise ValueError(f"{path} is not a {key} table")
+        self._files.append(table)
+        self._tables[key] = memoryview(table)[len(TABLE_HEADER):]
+        self._layouts[key] = layout
+
+    def add_table(self, key: str, table: Sequence[int]) -> None:
+        self._tables[key] = table
+        self._layouts[key] = _Layout(key)
+
+    def keys(self) -> List[str]:
+        return sorted(self._tables)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._tables
+
+    # table value of the pieces given as (color, kind, square), None when the material has no table
+    def probe_value(self, pieces: Sequence[Tuple[int, str, int]], side: int) -> Optional[int]:
+        key, swapped = normalize_key(_pieces_key(pieces))
+        if key == 'KK':
+            return DRAW
+        if key not in self._tables:
+            return None
+        layout = self._layouts[key]
+        if swapped:
+            pieces = [(1 - color, kind, inx ^ 56) for color, kind, inx in pieces]
+            side = 1 - side
+        squares = [None] * len(layout.slots)
+        for color, kind, inx in sorted(pieces, key=lambda piece: (piece[0], PIECE_ORDER.index(piece[1]))):
+            slot = layout.slots.index((color, kind))
+            while squares[slot] is not None:
+                slot += 1
+            squares[slot] = inx
+        return self._tables[key][layout.canonical_index(side, squares)]
+
+    def probe(self, board: Chessboard) -> Optional[TablebaseResult]:
+        if board.get_castling_rights() or board.get_possible_en_passant_moves():
+            return None
+        pieces = []
+        for inx in range(64):
+            piece = board.piece_at(inx)
+            if piece is not None:
+                pieces.append((_COLORS[piece.get_color()], piece.get_code().upper(), inx))
+                if len(pieces) > 4:
+                    return None
+        value = self.probe_value(pieces, _COLORS[board.get_turn()])
+        return decode_value(value) if value is not None else None
+
+    # The move keeping the best result: the fastest mate when winning, a drawing move when drawn and the
+    # slowest mate when losing. A reply position the tables don't cover, like one after a double pawn push
+    # allowing en passant, is searched one ply further; moves whose result stays unknown are not played.
+    # None when the position has no table or no move has a known result.
+    def best_move(self, board: Chessboard) -> Optional[Tuple[Move, TablebaseResult]]:
+        result = self.probe(board)
+        if result is None:
+            return None
+        best = None
+        for move in generate_legal_moves(board).moves:
+            board.push(move)
+            try:
+                reply = self._probe_or_search(board, 1)
+            finally:
+                board.pop()
+            if reply is None:
+                continue
+            rank = _move_rank(reply)
+            if best is None or rank > best[0]:
+                best = (rank, move)
+        if best is None:
+            return None
+        return best[1], result
+
+    # result of the position, from its best reply when it can't be probed and depth plies may still be searched
+    def _probe_or_search(self, board: Chessboard, depth: int) -> Optional[TablebaseResult]:
+        result = self.probe(board)
+        if result is not None or depth == 0:
+            return result
+        legal_moves = generate_legal_moves(board)
+        if not legal_moves.moves:
+            return TablebaseResult(LOSS, 0) if legal_moves.checkers else TablebaseResult(DRAW, 0)
+        best = None
+        for move in legal_moves.moves:
+            board.push(move)
+            try:
+                reply = self._probe_or_search(board, depth - 1)
+            finally:
+                board.pop()
+            if reply is None:
+                return None
+            if best is None or _move_rank(reply) > _move_rank(best):
+                best = reply
+        if best.wdl == DRAW:
+            return best
+        return TablebaseResult(-best.wdl, best.plies + 1)
+
+    def close(self) -> None:
+        self._tables.clear()
+        for table in self._files:
+            table.close()
+        self._files.clear()
+
+
+# how good a move reaching a position with the reply result is for the side playing it
+def _move_rank(reply: TablebaseResult) -> tuple:
+    return -reply.wdl, reply.plies if reply.wdl == WIN else -reply.plies
+
+
+# material sets a table needs for captures and promotions, normalized
+def required_keys(key: str) -> List[str]:
+    white, black = _split_key(key)
+    required = set()
+    for side, other, swap in ((white, black, False), (black, white, True)):
+        for inx in range(1, len(side)):
+            reduced = side[:inx] + side[inx + 1:]
+            required.add(normalize_key(other + reduced if swap else reduced + other)[0])
+            if side[inx] == 'P':
+                promoted = side[:inx] + 'Q' + side[inx + 1:]
+                required.add(normalize_key(other + promoted if swap else promoted + other)[0])
+    required.discard('KK')
+    return sorted(required)
+
+
+# Retrograde analysis of one material set. Tables of the material reached by captures and promotions have to be
+# in tablebase already. Mates are found first, then positions one ply further from mate at a time: a position
+# wins when a move reaches a lost position and loses once every move reaches a won one.
+def generate_table(key: str, tablebase: Tablebase) -> bytearray:
+    layout = _Layout(key)
+    values = bytearray([INVALID]) * layout.size
+    # distinct successor positions in the table not yet known to be won by the opponent
+    remaining = bytearray(layout.size)
+    # the longest mate of the opponent among the decided successors
+    longest = bytearray(layout.size)
+    # a move out of the table draws or wins, so the position can't be lost
+    not_lost = bytearray(layout.size)
+    levels = defaultdict(list)
+
+    for side in (_WHITE, _BLACK):
+        for king in layout.king_squares:
+            for rest in itertools.product(range(64), repeat=len(layout.slots) - 1):
+                squares = [king, *rest]
+                if len(set(squares)) != len(squares) or layout.canonical(squares) != squares:
+                    continue
+                position = _Position(layout, squares, side)
+                if not position.is_valid():
+                    continue
+                inx = layout.index(side, squares)
+                values[inx] = DRAW
+                successors = set()
+                has_moves = False
+                in_check = position.is_attacked(position.king_square(side), 1 - side)
+                for move in position.pseudo_moves():
+                    if not position.is_legal(*move, in_check):
+                        continue
+                    has_moves = True
+                    if not position.leaves_table(*move):
+                        slot, target, _ = move
+                        moved = list(squares)
+                        moved[slot] = target
+                        successors.add(layout.canonical_index(1 - side, moved))
+                        continue
+                    result = decode_value(tablebase.probe_value(position.pieces_after(*move), 1 - side))
+                    if result is None or result.wdl != WIN:
+                        not_lost[inx] = 1
+                    if result is not None and result.wdl == LOSS:
+                        levels[result.plies + 1].append(inx)
+                    elif result is not None and result.wdl == WIN:
+                        longest[inx] = max(longest[inx], result.plies)
+                if not has_moves:
+                    if in_check:
+                        levels[0].append(inx)
+                    continue
+                remaining[inx] = len(successors)
+                if not successors and not not_lost[inx]:
+                    levels[longest[inx] + 1].append(inx)
+
+    while levels:
+        level = min(levels)
+        decided = []
+        for inx in levels.pop(level):
+            if values[inx] == DRAW and level <= MAX_PLIES:
+                values[inx] = level + 1
+                decided.append(inx)
+        for inx in decided:
+            for previous in _previous_positions(layout, inx):
+                if values[previous] != DRAW:
+                    continue
+                if level % 2 == 0:
+                    levels[level + 1].append(previous)
+                    continue
+                remaining[previous] -= 1
+                longest[previous] = max(longest[previous], level)
+                if remaining[previous] == 0 and not not_lost[previous]:
+                    levels[longest[previous] + 1].append(previous)
+    return values
+
+
+def _decode_index(layout: _Layout, inx: int) -> Tuple[List[int], int]:
+    squares = []
+    for _ in range(len(layout.slots) - 1):
+        inx, square = divmod(inx, 64)
+        squares.append(square)
+    side, king_slot = divmod(inx, len(layout.king_squares))
+    return [layout.king_squares[king_slot], *reversed(squares)], side
+
+
+# canonical indexes of the distinct positions from which a move without capture or promotion reaches inx
+def _previous_positions(layout: _Layout, inx: int):
+    squares, side = _decode_index(layout, inx)
+    position = _Position(layout, squares, side)
+    previous = set()
+    mover = 1 - side
+    for slot, (color, kind) in enumerate(layout.slots):
+        if color != mover:
+            continue
+        for start in position.unmove_origins(slot):
+            moved = list(squares)
+            moved[slot] = start
+            previous.add(layout.canonical_index(mover, moved))
+    return previous
+
+
+def write_table(path: str, table: Sequence[int]) -> None:
+    temporary_path = f'{path}.tmp{os.getpid()}'
+    with open(temporary_path, 'wb') as table_file:
+        table_file.write(TABLE_HEADER)
+        table_file.write(bytes(table))
+    os.replace(temporary_path, path)
+
+
+# Generates the tables of the material sets and the ones they need into directory, skipping tables already
+# there. Returns the keys of the generated tables.
+def generate_tablebase(directory: str, keys: Sequence[str], progress=None) -> List[str]:
+    tablebase = Tablebase(directory)
+    generated = []
+
+    def generate(key: str):
+        if key in tablebase:
+            return
+        for required in required_keys(key):
+            generate(required)
+        if progress is not None:
+            progress(key)
+        table = generate_table(key, tablebase)
+        write_table(os.path.join(directory, key + TABLE_SUFFIX), table)
+        tablebase.add_table(key, table)
+        generated.append(key)
+
+    try:
+        for key in keys:
+            generate(normalize_key(key)[0])
+    finally:
+        tablebase.close()
+    return generated
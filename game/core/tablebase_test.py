@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.chesspiece import PieceColor
+from game.core.chesspieces import King
+from game.core.engine import MATE_SCORE, tablebase_move
+from game.core.game_state import GameState
+from game.core.move_graph import MoveGraph
+from game.core.tablebase import DRAW, INVALID, LOSS, WIN, Tablebase, TablebaseResult, generate_tablebase, \
+    normalize_key, required_keys
+
+
+class TablebaseKeysTestCase(unittest.TestCase):
+    def test_normalize_key(self):
+        self.assertEqual(('KQK', False), normalize_key('KQK'))
+        self.assertEqual(('KPK', True), normalize_key('KKP'))
+        self.assertEqual(('KQKR', True), normalize_key('KRKQ'))
+        self.assertEqual(('KRBK', False), normalize_key('KBRK'))
+
+    def test_required_keys(self):
+        self.assertEqual([], required_keys('KQK'))
+        self.assertEqual(['KQK'], required_keys('KPK'))
+        self.assertEqual(['KQK', 'KRK'], required_keys('KQKR'))
+        self.assertEqual(['KPK', 'KQKR', 'KRK'], required_keys('KRKP'))
+
+
+class TablebaseTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        generate_tablebase(cls.directory.name, ['KQK'])
+        cls.tablebase = Tablebase(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tablebase.close()
+        cls.directory.cleanup()
+
+    def probe(self, fen):
+        return self.tablebase.probe(Chessboard.from_fen(fen))
+
+    def test_table_file(self):
+        self.assertEqual(['KQK'], self.tablebase.keys())
+        with open(os.path.join(self.directory.name, 'KQK.tb'), 'rb') as table_file:
+            values = set(table_file.read()[8:])
+        self.assertEqual(20, max(values - {INVALID}) - 1)
+        self.assertIn(DRAW, values)
+
+    def test_mates(self):
+        self.assertEqual(TablebaseResult(LOSS, 0), self.probe('k7/1Q6/1K6/8/8/8/8/8 b - - 0 1'))
+        self.assertEqual(TablebaseResult(WIN, 1), self.probe('k7/8/1K6/8/8/8/7Q/8 w - - 0 1'))
+        self.assertEqual(TablebaseResult(DRAW, 0), self.probe('k7/2Q5/1K6/8/8/8/8/8 b - - 0 1'))
+        self.assertEqual(TablebaseResult(DRAW, 0), self.probe('8/8/8/8/8/8/1k6/Q2K4 b - - 0 1'))
+
+    def test_colors_and_symmetries(self):
+        result = self.probe('8/8/8/3k4/8/8/7Q/K7 w - - 0 1')
+        self.assertEqual(WIN, result.wdl)
+        self.assertEqual(result, self.probe('k7/7q/8/8/3K4/8/8/8 b - - 0 1'))
+        self.assertEqual(result, self.probe('8/8/8/4k3/8/8/Q7/7K w - - 0 1'))
+
+    def test_not_covered(self):
+        self.assertIsNone(self.probe('k7/8/1K6/8/8/8/8/Q7 w - - 0 1'))
+        self.assertIsNone(self.probe('k7/8/1K6/8/8/8/8/1R6 w - - 0 1'))
+        self.assertIsNone(self.tablebase.probe(Chessboard()))
+
+    def test_best_move(self):
+        board = Chessboard.from_fen('k7/8/1K6/8/8/8/7Q/8 w - - 0 1')
+        move, result = self.tablebase.best_move(board)
+        self.assertIn(move, Move.from_str_list(['h2h8', 'h2b8', 'h2g8']))
+        self.assertEqual(TablebaseResult(WIN, 1), result)
+        self.assertEqual(MATE_SCORE - 1, tablebase_move(board, self.tablebase).score)
+
+    def test_best_move_searches_positions_not_covered(self):
+        board = Chessboard.from_fen('8/8/8/3k4/8/8/7Q/K7 b - - 0 1')
+        best = self.tablebase.best_move(board)
+        self.assertEqual(LOSS, best[1].wdl)
+        # black moving to d4 leaves white to move in a position the tables don't cover
+        partial = PartialTablebase(self.directory.name, 27, PieceColor.WHITE)
+        move, result = partial.best_move(board)
+        self.assertEqual(best[1], result)
+        self.assertEqual(self.reply_result(board, best[0]), self.reply_result(board, move))
+        # with the replies not covered either, moving to d4 is never played as if it drew
+        partial = PartialTablebase(self.directory.name, 27, None)
+        move, result = partial.best_move(board)
+        self.assertNotEqual(Move.from_str('d5d4'), move)
+        self.assertEqual(WIN, self.reply_result(board, move).wdl)
+
+    def reply_result(self, board, move):
+        board.push(move)
+        try:
+            return self.tablebase.probe(board)
+        finally:
+            board.pop()
+
+    def test_game_state(self):
+        board = Chessboard.from_fen('8/8/8/3k4/8/8/7Q/K7 w - - 0 1')
+        state = GameState(MoveGraph(board, side_to_move_only=True), board.get_turn(), self.tablebase)
+        self.assertEqual(WIN, state.as_dict()['tablebase']['wdl'])
+        self.assertIsNone(GameState(MoveGraph(board, side_to_move_only=True), board.get_turn())
+                          .get_tablebase_result())
+
+
+# can't probe positions with the black king on hidden_square and turn to move (either side when None),
+# as the real tables can't probe positions allowing en passant
+class PartialTablebase(Tablebase):
+    def __init__(self, directory, hidden_square, turn):
+        super().__init__(directory)
+        self.hidden_square = hidden_square
+        self.turn = turn
+
+    def probe(self, board):
+        if board.piece_at(self.hidden_square) is King(PieceColor.BLACK) \
+                and self.turn in (None, board.get_turn()):
+            return None
+        return super().probe(board)
+
+
+class PawnTablebaseTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        generate_tablebase(cls.directory.name, ['KPK'])
+        cls.tablebase = Tablebase(cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tablebase.close()
+        cls.directory.cleanup()
+
+    def probe(self, fen):
+        return self.tablebase.probe(Chessboard.from_fen(fen))
+
+    def test_required_tables_are_generated(self):
+        self.assertEqual(['KPK', 'KQK'], self.tablebase.keys())
+
+    def test_results(self):
+        self.assertEqual(WIN, self.probe('4k3/8/4K3/4P3/8/8/8/8 w - - 0 1').wdl)
+        self.assertEqual(LOSS, self.probe('4k3/8/4K3/4P3/8/8/8/8 b - - 0 1').wdl)
+        # the rook pawn doesn't win against the king in front of it
+        self.assertEqual(TablebaseResult(DRAW, 0), self.probe('k7/8/8/8/8/8/P7/K7 w - - 0 1'))
+        self.assertEqual(TablebaseResult(DRAW, 0), self.probe('k7/p7/8/8/8/8/8/K7 b - - 0 1'))
+        # the black king takes the pawn
+        self.assertEqual(TablebaseResult(DRAW, 0), self.probe('8/8/8/8/8/8/4P3/K3k3 b - - 0 1'))
+        self.assertEqual(self.probe('4k3/8/4K3/4P3/8/8/8/8 w - - 0 1'),
+                         self.probe('8/8/8/8/4p3/4k3/8/4K3 b - - 0 1'))
+
+    def test_promotion(self):
+        # the pawn is lost unless it promotes
+        board = Chessboard.from_fen('8/4P3/5k2/8/8/8/8/K7 w - - 0 1')
+        move, result = self.tablebase.best_move(board)
+        self.assertEqual(Move.from_str('e7e8'), move)
+        self.assertEqual(WIN, result.wdl)
+        board.push(move)
+        self.assertEqual(TablebaseResult(LOSS, result.plies - 1), self.tablebase.probe(board))
+
+
+if __name__ == '__main__':
+    unittest.main()
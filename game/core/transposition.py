@@ -0,0 +1,184 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional, Type
+
+from game.core.chessboard import Chessboard
+from game.core.game_state import GameState, get_claimable_draw_reason, get_history_draw_reason
+from game.core.move_graph import MoveGraph
+from game.core.tablebase import Tablebase
+
+
+# safe to share between threads, e.g. the workers of a BoundedExecutor
+class LRUCache:
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise ValueError(f"Cache size has to be positive, got {max_size}")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def stats(self) -> dict:
+        return {'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
+
+
+# what the client gets for a position: MoveGraph.as_dict() and GameState.as_dict()
+class PositionEntry(NamedTuple):
+    move_graph: dict
+    game_state: dict
+
+
+# positions keyed by Chessboard.get_hash(), together with the repetition and move-rule draws,
+# automatic or claimable, of the board, which the hash does not cover
+class TranspositionCache(LRUCache):
+    def __init__(self, max_size: int = 4096, tablebase: Tablebase = None):
+        super().__init__(max_size)
+        self.tablebase = tablebase
+
+    def get_entry(self, board: Chessboard) -> PositionEntry:
+        key = (board.get_hash(), get_history_draw_reason(board), get_claimable_draw_reason(board))
+        entry: Optional[PositionEntry] = self.get(key)
+        if entry is None:
+            graph = MoveGraph(board, side_to_move_only=True)
+            entry = PositionEntry(move_graph=graph.as_dict(),
+                                  game_state=GameState(graph, board.get_turn(), self.tablebase).as_dict())
+            self.put(key, entry)
+        return entry
+
+
+# what a client gets for a game at one ply; the board's special move info is kept next to it,
+# since a board restored from a snapshot doesn't know how it got there
+class GameStateEntry(NamedTuple):
+    board: Chessboard
+    move_graph: dict
+    game_state: dict
+    special_move_info: dict
+
+
+# Game states keyed by (game id, ply), in a local LRU tier and optionally in a shared tier - any object
+# with the get/set methods of a Django cache - holding board snapshots, so other processes don't have to
+# read and rebuild the game. A game's version is its number of plies: an entry never goes stale,
+# a newer ply just becomes the one asked for. Versions are published to the shared tier by set_version;
+# without one the caller has to get the version from the database.
+class GameStateCache:
+    def __init__(self, max_size: int = 512, shared_cache=None, timeout: Optional[float] = 3600,
+                 transposition_cache: TranspositionCache = None, board_class: Type[Chessboard] = Chessboard):
+        self.local = LRUCache(max_size)
+        self.shared_cache = shared_cache
+        self.timeout = timeout
+        self.transposition_cache = transposition_cache if transposition_cache is not None else TranspositionCache()
+        self.board_class = board_class
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    # the entry's board is a copy, callers may push moves on it
+    def get(self, game_id: int, ply: int) -> Optional[GameStateEntry]:
+        entry = self.local.get((game_id, ply))
+        if entry is None and self.shared_cache is not None:
+            entry = self._get_shared(game_id, ply)
+        return entry._replace(board=entry.board.copy()) if entry is not None else None
+
+    def _get_shared(self, game_id: int, ply: int) -> Optional[GameStateEntry]:
+        value = self.shared_cache.get(self._entry_key(game_id, ply))
+        if value is None:
+            self.shared_misses += 1
+            return None
+        snapshot, move_graph, game_state, special_move_info = value
+        try:
+            board = self.board_class.from_snapshot(snapshot)
+        except ValueError:
+            self.shared_misses += 1
+            return None
+        self.shared_hits += 1
+        entry = GameStateEntry(board, move_graph, game_state, special_move_info)
+        self.local.put((game_id, ply), entry)
+        return entry
+
+    # stores the state of the game's board, the move graph and game state coming from the transposition cache
+    def put(self, game_id: int, board: Chessboard) -> GameStateEntry:
+        position = self.transposition_cache.get_entry(board)
+        entry = GameStateEntry(board.copy(), position.move_graph, position.game_state, board.get_special_move_info())
+        self.local.put((game_id, board.get_ply()), entry)
+        if self.shared_cache is not None:
+            self.shared_cache.set(self._entry_key(game_id, board.get_ply()),
+                                  (board.to_snapshot(), position.move_graph, position.game_state,
+                                   entry.special_move_info), self.timeout)
+        return entry._replace(board=board.copy())
+
+    # latest ply of the game published by set_version, None without a shared tier or when it expired
+    def get_version(self, game_id: int) -> Optional[int]:
+        if self.shared_cache is None:
+            return None
+        return self.shared_cache.get(self._version_key(game_id))
+
+    # Versions are published from several threads and processes once their moves are committed, in any order,
+    # so an older ply never replaces a newer one. A newer ply published between the read and the write of an
+    # older one can still be lost; callers that must not serve a stale state read the ply from the database.
+    def set_version(self, game_id: int, ply: int) -> None:
+        if self.shared_cache is None:
+            return
+        key = self._version_key(game_id)
+        if self.shared_cache.add(key, ply, self.timeout):
+            return
+        current = self.shared_cache.get(key)
+        if current is None or current < ply:
+            self.shared_cache.set(key, ply, self.timeout)
+
+    # drops the states of the game's first plies plies and its version, e.g. after its moves were rewritten;
+    # the local tiers of other processes keep theirs until they are evicted
+    def clear_game(self, game_id: int, plies: int) -> None:
+        for ply in range(plies + 1):
+            self.local.discard((game_id, ply))
+        if self.shared_cache is not None:
+            self.shared_cache.delete_many([self._version_key(game_id)] +
+                                          [self._entry_key(game_id, ply) for ply in range(plies + 1)])
+
+    def stats(self) -> dict:
+        return {**self.local.stats(),
+                'shared_hits': self.shared_hits,
+                'shared_misses': self.shared_misses}
+
+    @staticmethod
+    def _entry_key(game_id: int, ply: int) -> str:
+        return f'game-state:{game_id}:{ply}'
+
+    @staticmethod
+    def _version_key(game_id: int) -> str:
+        return f'game-version:{game_id}'
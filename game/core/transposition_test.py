@@ -0,0 +1,132 @@
+import unittest
+
+from game.core.chessboard import Chessboard, Move
+from game.core.move_graph import MoveGraph
+from game.core.transposition import GameStateCache, LRUCache, TranspositionCache
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    def test_counters_and_eviction(self):
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual({'size': 2, 'max_size': 2, 'hits': 1, 'misses': 1, 'evictions': 1}, cache.stats())
+
+    def test_discard(self):
+        cache = LRUCache(max_size=2)
+        cache.put('a', 1)
+        cache.discard('a')
+        cache.discard('b')
+        self.assertNotIn('a', cache)
+        self.assertEqual(0, len(cache))
+
+    def test_invalid_size(self):
+        self.assertRaises(ValueError, LRUCache, 0)
+
+
+class TranspositionCacheTestCase(unittest.TestCase):
+    def test_transposed_position_hits(self):
+        cache = TranspositionCache(max_size=8)
+        first = cache.get_entry(Chessboard.from_moves_list(Move.from_str_list(['e2e4', 'e7e5', 'g1f3'])))
+        second = cache.get_entry(Chessboard.from_moves_list(Move.from_str_list(['g1f3', 'e7e5', 'e2e4'])))
+        self.assertIs(first, second)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_entry_matches_move_graph(self):
+        board = Chessboard.from_moves_list(Move.from_str_list(['f2f3', 'e7e5', 'g2g4', 'd8h4']))
+        entry = TranspositionCache().get_entry(board)
+        self.assertEqual(MoveGraph(board, side_to_move_only=True).as_dict(), entry.move_graph)
+        self.assertTrue(entry.game_state['is_checkmate'])
+
+
+# stands in for a Django cache shared by all processes
+class DictCache(dict):
+    def set(self, key, value, timeout=None):
+        self[key] = value
+
+    def add(self, key, value, timeout=None) -> bool:
+        return self.setdefault(key, value) is value
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.pop(key, None)
+
+
+class GameStateCacheTestCase(unittest.TestCase):
+    def test_local_entries(self):
+        cache = GameStateCache(max_size=4)
+        board = Chessboard.from_moves_list(Move.from_str_list(['e2e4', 'e7e5']))
+        cache.put(1, board)
+        entry = cache.get(1, 2)
+        self.assertEqual(board.to_fen(), entry.board.to_fen())
+        self.assertIsNot(board, entry.board)
+        self.assertEqual(MoveGraph(board, side_to_move_only=True).as_dict(), entry.move_graph)
+        self.assertIsNone(cache.get(1, 3))
+        self.assertIsNone(cache.get(2, 2))
+        self.assertIsNone(cache.get_version(1))
+
+    def test_entry_board_is_a_copy(self):
+        cache = GameStateCache()
+        cache.put(1, Chessboard())
+        cache.get(1, 0).board.push(Move.from_str('e2e4'))
+        self.assertEqual(Chessboard().to_fen(), cache.get(1, 0).board.to_fen())
+
+    def test_shared_tier(self):
+        shared = DictCache()
+        board = Chessboard.from_moves_list(Move.from_str_list(['e2e4', 'd7d5', 'e4d5']))
+        GameStateCache(shared_cache=shared).put(7, board)
+        GameStateCache(shared_cache=shared).set_version(7, 3)
+
+        # another process finds the state in the shared tier, then keeps it locally
+        other = GameStateCache(shared_cache=shared)
+        self.assertEqual(3, other.get_version(7))
+        entry = other.get(7, 3)
+        self.assertEqual(board.to_fen(), entry.board.to_fen())
+        self.assertEqual(3, entry.board.get_ply())
+        self.assertEqual(board.get_special_move_info(), entry.special_move_info)
+        other.get(7, 3)
+        self.assertIsNone(other.get(7, 4))
+        self.assertEqual(1, other.stats()['shared_hits'])
+        self.assertEqual(1, other.stats()['shared_misses'])
+        self.assertEqual(1, other.stats()['hits'])
+
+    def test_version_only_increases(self):
+        shared = DictCache()
+        cache = GameStateCache(shared_cache=shared)
+        cache.set_version(7, 4)
+        cache.set_version(7, 3)
+        self.assertEqual(4, cache.get_version(7))
+        cache.set_version(7, 5)
+        self.assertEqual(5, cache.get_version(7))
+
+    def test_clear_game(self):
+        shared = DictCache()
+        cache = GameStateCache(shared_cache=shared)
+        board = Chessboard()
+        for code in ['e2e4', 'e7e5']:
+            cache.put(1, board)
+            board.push(Move.from_str(code))
+        cache.put(1, board)
+        cache.put(2, Chessboard())
+        cache.set_version(1, 2)
+        cache.clear_game(1, 2)
+        self.assertEqual([None] * 3, [cache.get(1, ply) for ply in range(3)])
+        self.assertIsNone(cache.get_version(1))
+        self.assertIsNotNone(cache.get(2, 0))
+        self.assertIsNotNone(GameStateCache(shared_cache=shared).get(2, 0))
+
+    def test_broken_shared_snapshot_misses(self):
+        shared = DictCache()
+        GameStateCache(shared_cache=shared).put(1, Chessboard())
+        key = next(iter(shared))
+        shared[key] = (b'broken',) + shared[key][1:]
+        self.assertIsNone(GameStateCache(shared_cache=shared).get(1, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import random
+from typing import Dict, Tuple
+
+from game.core.chesspiece import PieceColor
+
+# fixed seed - hashes must match between processes and restarts
+_random = random.Random(0x5EED_D0C5)
+
+
+def _random_key() -> int:
+    return _random.getrandbits(64)
+
+
+# PIECE_KEYS[(color, piece code)][square]
+PIECE_KEYS: Dict[Tuple[PieceColor, str], Tuple[int, ...]] = {
+    (color, code): tuple(_random_key() for _ in range(64))
+    for color in (PieceColor.WHITE, PieceColor.BLACK) for code in ('p', 'N', 'B', 'R', 'Q', 'K')}
+BLACK_TO_MOVE_KEY = _random_key()
+# indexed by the 4-bit castling rights value
+CASTLING_KEYS: Tuple[int, ...] = (0, *(_random_key() for _ in range(15)))
+# indexed by the file of the en-passant square
+EN_PASSANT_KEYS: Tuple[int, ...] = tuple(_random_key() for _ in range(8))
+
+
+def piece_key(piece, inx: int) -> int:
+    if piece is None:
+        return 0
+    return PIECE_KEYS[(piece.get_color(), piece.get_code())][inx]
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
+
+
+# UserCreationForm that keeps the engine's username (ENGINE_USERNAME) from being registered
+class RegisterForm(UserCreationForm):
+    def clean_username(self):
+        username = super().clean_username()
+        if username and username.lower() == getattr(settings, 'ENGINE_USERNAME', 'engine').lower():
+            raise ValidationError('This username is reserved.', code='reserved')
+        return username
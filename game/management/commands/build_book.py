@@ -0,0 +1,60 @@
+import time
+from typing import Iterable, Iterator, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.core.chessboard import Move
+from game.core.opening_book import build_book_entries, write_book
+from game.core.pgn import PgnGame, iter_san_moves, read_pgn
+from game.util import iter_game_moves
+
+
+class Command(BaseCommand):
+    help = 'Builds the opening book from the stored games or from PGN files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pgn', action='append', default=[],
+                            help='PGN file the games are read from instead of the database, may be repeated')
+        parser.add_argument('--output', help='book file (default: the OPENING_BOOK setting)')
+        parser.add_argument('--max-plies', type=int, default=24, help='plies of every game put in the book')
+        parser.add_argument('--min-games', type=int, default=2,
+                            help='games a move has to be played in to get into the book')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'OPENING_BOOK', None)
+        if not output:
+            raise CommandError('No --output given and no OPENING_BOOK setting')
+        if options['max_plies'] < 1 or options['min_games'] < 1:
+            raise CommandError('Max plies and min games have to be at least 1')
+
+        start = time.perf_counter()
+        games = self._iter_pgn_moves(options['pgn']) if options['pgn'] else iter_game_moves()
+        entries = build_book_entries(games, options['max_plies'], options['min_games'])
+        count = write_book(str(output), entries)
+        positions = len({entry.position_hash for entry in entries})
+        self.stdout.write(self.style.SUCCESS(f'{count} moves of {positions} positions written to {output} '
+                                             f'in {time.perf_counter() - start:.3f}s'))
+
+    def _iter_pgn_moves(self, paths: Iterable[str]) -> Iterator[List[Move]]:
+        for path in paths:
+            try:
+                pgn_file = open(path, encoding='utf-8', errors='replace')
+            except OSError as error:
+                raise CommandError(str(error))
+            with pgn_file:
+                for number, pgn_game in enumerate(read_pgn(pgn_file), start=1):
+                    moves = self._pgn_moves(pgn_game)
+                    if moves is None:
+                        self.stdout.write(self.style.WARNING(f'{path}: game {number} skipped'))
+                    else:
+                        yield moves
+
+    @staticmethod
+    def _pgn_moves(pgn_game: PgnGame):
+        if 'FEN' in pgn_game.headers:
+            return None
+        try:
+            return [move for move, _ in iter_san_moves(pgn_game.san_moves)]
+        except ValueError:
+            return None
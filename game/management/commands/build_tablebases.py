@@ -0,0 +1,35 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.core.tablebase import generate_tablebase, normalize_key
+
+THREE_PIECE_KEYS = ('KQK', 'KRK', 'KBK', 'KNK', 'KPK')
+
+
+class Command(BaseCommand):
+    help = 'Generates endgame tablebases by retrograde analysis, with the tables they depend on'
+
+    def add_arguments(self, parser):
+        parser.add_argument('material', nargs='*', default=list(THREE_PIECE_KEYS),
+                            help='material sets such as KRK or KQKR (default: all three-piece sets); '
+                                 'a four-piece set takes minutes to hours')
+        parser.add_argument('--output-dir', help='directory of the tables (default: the TABLEBASE_DIR setting)')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or getattr(settings, 'TABLEBASE_DIR', None)
+        if not directory:
+            raise CommandError('No --output-dir given and no TABLEBASE_DIR setting')
+        for key in options['material']:
+            if not key.startswith('K') or key.count('K') != 2 or len(key) > 4 \
+                    or any(piece not in 'KQRBNP' for piece in key):
+                raise CommandError(f'{key} is not a material set of at most four pieces, like KRK or KQKR')
+        os.makedirs(directory, exist_ok=True)
+
+        start = time.perf_counter()
+        generated = generate_tablebase(str(directory), [normalize_key(key)[0] for key in options['material']],
+                                       lambda key: self.stdout.write(f'generating {key}'))
+        self.stdout.write(self.style.SUCCESS(f'{len(generated)} tables generated into {directory} '
+                                             f'in {time.perf_counter() - start:.1f}s'))
@@ -0,0 +1,56 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.core.chessboard import Move
+from game.core.engine import EnginePool, MAX_DEPTH
+from game.core.move_codec import pack_moves
+from game.core.perft import PERFT_POSITIONS
+
+
+class Command(BaseCommand):
+    help = 'Runs engine searches from reference positions on a worker pool and reports depth and nodes per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='worker processes')
+        parser.add_argument('--time', type=float, default=1.0, help='seconds per search')
+        parser.add_argument('--nodes', type=int, help='node budget per search (default: none)')
+        parser.add_argument('--depth', type=int, default=MAX_DEPTH, help='maximum search depth')
+        parser.add_argument('--position', action='append', choices=sorted(PERFT_POSITIONS),
+                            help='position to search, may be repeated (default: all)')
+        parser.add_argument('--repeat', type=int, default=1, help='searches started per position')
+        parser.add_argument('--output', help='JSON file the results are written to')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['repeat'] < 1 or not 1 <= options['depth'] <= MAX_DEPTH:
+            raise CommandError(f'Workers and repeat have to be at least 1 and depth between 1 and {MAX_DEPTH}')
+
+        positions = [PERFT_POSITIONS[name] for name in options['position'] or PERFT_POSITIONS]
+        pool = EnginePool(workers=options['workers'], time_limit=options['time'], node_limit=options['nodes'],
+                          max_depth=options['depth'])
+        try:
+            start = time.perf_counter()
+            futures = [(position, pool.search(pack_moves(Move.from_str_list(list(position.moves))), position.fen))
+                       for position in positions for _ in range(options['repeat'])]
+            results = []
+            for position, future in futures:
+                result = future.result()
+                results.append({'position': position.name, **result.as_dict()})
+                self.stdout.write(f'{position.name}: {result.move} score {result.score} depth {result.depth}, '
+                                  f'{result.nodes} nodes in {result.seconds:.3f}s, '
+                                  f'{result.nodes_per_second():.0f} nodes/s')
+            seconds = time.perf_counter() - start
+            stats = pool.stats()
+        finally:
+            pool.shutdown()
+
+        self.stdout.write(f'{len(results)} searches on {options["workers"]} workers in {seconds:.3f}s, '
+                          f'{len(results) / seconds:.2f} searches/s, {stats["nodes_per_second"]:.0f} nodes/s '
+                          f'per worker, average depth {stats["average_depth"]}')
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'date': datetime.datetime.now().isoformat(), 'seconds': round(seconds, 6),
+                           'pool': stats, 'results': results}, output_file, indent=2)
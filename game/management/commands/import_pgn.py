@@ -0,0 +1,36 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from game.core.pgn import read_pgn
+from game.util import import_pgn_games
+
+
+class Command(BaseCommand):
+    help = 'Imports the games of a PGN file, reading it one game at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="PGN file, or '-' for standard input")
+        parser.add_argument('--user', required=True,
+                            help='username the games are created by, and the player of unknown White or Black')
+        parser.add_argument('--batch-size', type=int, default=500, help='games inserted at once')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Batch size has to be at least 1')
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        pgn_file = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8', errors='replace')
+        try:
+            imported, errors = import_pgn_games(read_pgn(pgn_file), user, options['batch_size'])
+        finally:
+            if pgn_file is not sys.stdin:
+                pgn_file.close()
+
+        for number, error in errors:
+            self.stdout.write(self.style.ERROR(f'game {number} skipped: {error}'))
+        self.stdout.write(self.style.SUCCESS(f'{imported} games imported, {len(errors)} skipped'))
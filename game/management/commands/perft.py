@@ -0,0 +1,56 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.core.chessboard import Chessboard
+from game.core.perft import PERFT_POSITIONS, BOARD_CLASSES, PerftPosition, run_perft
+
+
+class Command(BaseCommand):
+    help = 'Counts move generator leaf nodes from reference positions and reports nodes per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=3)
+        parser.add_argument('--position', action='append', choices=sorted(PERFT_POSITIONS),
+                            help='position to run, may be repeated (default: all)')
+        parser.add_argument('--fen', action='append', default=[],
+                            help='FEN of an additional position without reference counts, may be repeated')
+        parser.add_argument('--board', choices=sorted(BOARD_CLASSES), default='bitboard')
+        parser.add_argument('--divide', action='store_true', help='print node counts per first move')
+        parser.add_argument('--output', help='JSON file the results are written to')
+
+    def handle(self, *args, **options):
+        depth = options['depth']
+        if depth < 1:
+            raise CommandError('Depth has to be at least 1')
+
+        positions = [PERFT_POSITIONS[name] for name in options['position'] or
+                     ([] if options['fen'] else PERFT_POSITIONS)]
+        for fen in options['fen']:
+            try:
+                Chessboard.from_fen(fen)
+            except ValueError as error:
+                raise CommandError(str(error))
+            positions.append(PerftPosition(fen, (), (), fen))
+
+        results = []
+        for position in positions:
+            result = run_perft(position, depth, BOARD_CLASSES[options['board']],
+                               with_divide=options['divide'])
+            results.append(result)
+            for move_code, nodes in sorted(result.divide.items()):
+                self.stdout.write(f'  {move_code}: {nodes}')
+            status = {True: self.style.SUCCESS('OK'), False: self.style.ERROR('MISMATCH'), None: 'no reference'}
+            self.stdout.write(f'{result.name} depth {depth}: {result.nodes} nodes '
+                              f'(expected {result.expected}) {status[result.is_correct()]} '
+                              f'in {result.seconds:.3f}s, {result.nodes_per_second():.0f} nodes/s')
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'date': datetime.datetime.now().isoformat(),
+                           'board': options['board'],
+                           'results': [result.as_dict() for result in results]}, output_file, indent=2)
+
+        if any(result.is_correct() is False for result in results):
+            raise CommandError('Perft node counts differ from the reference')
@@ -0,0 +1,51 @@
+import datetime
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.core.replay import STALE_SNAPSHOT_ERROR, validate_games
+from game.util import iter_game_record_chunks, repair_game_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Replays stored games on a process pool and reports illegal or inconsistent ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='worker processes (default: number of CPUs)')
+        parser.add_argument('--chunk-size', type=int, default=200, help='games sent to a worker at once')
+        parser.add_argument('--game', type=int, action='append', help='game id to check, may be repeated '
+                                                                      '(default: all)')
+        parser.add_argument('--output', help='JSON file the report is written to')
+        parser.add_argument('--repair-snapshots', action='store_true',
+                            help='rewrite the position snapshots that do not match the replayed games')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1 or (options['workers'] is not None and options['workers'] < 1):
+            raise CommandError('Chunk size and number of workers have to be at least 1')
+
+        report = validate_games(iter_game_record_chunks(options['chunk_size'], options['game']),
+                                options['workers'])
+
+        for result in report.invalid:
+            self.stdout.write(self.style.ERROR(f'game {result.game_id} after {result.plies} plies: {result.error}'))
+        for worker, timing in sorted(report.workers.items()):
+            self.stdout.write(f'  worker {worker}: {timing.chunks} chunks, {timing.games} games, '
+                              f'{timing.plies} plies in {timing.seconds:.3f}s')
+        self.stdout.write(f'{report.games} games, {report.plies} plies in {report.seconds:.3f}s, '
+                          f'{report.games_per_second():.0f} games/s, {report.plies_per_second():.0f} plies/s, '
+                          f'{len(report.invalid)} invalid')
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({'date': datetime.datetime.now().isoformat(), **report.as_dict()}, output_file, indent=2)
+
+        invalid = report.invalid
+        if options['repair_snapshots']:
+            for result in invalid:
+                if result.error == STALE_SNAPSHOT_ERROR:
+                    repair_game_snapshot(result.game_id)
+            self.stdout.write(f'{sum(result.error == STALE_SNAPSHOT_ERROR for result in invalid)} snapshots repaired')
+            invalid = [result for result in invalid if result.error != STALE_SNAPSHOT_ERROR]
+
+        if invalid:
+            raise CommandError(f'{len(invalid)} invalid games')
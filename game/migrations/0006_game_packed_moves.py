@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+from game.migrations._frozen_replay import FrozenBoard, encode_move, pack_codes, parse_move_code
+
+
+def pack_stored_moves(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    PlayerGameMove = apps.get_model('game', 'PlayerGameMove')
+    for game in Game.objects.all():
+        board = FrozenBoard()
+        codes = []
+        for move_code in PlayerGameMove.objects.filter(game=game).order_by('index').values_list('move_code',
+                                                                                                  flat=True):
+            start, end = parse_move_code(move_code)
+            codes.append(encode_move(start, end, board.is_promotion(start, end)))
+            board.push(start, end)
+        game.packed_moves = pack_codes(codes)
+        game.save(update_fields=['packed_moves'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_alter_game_created_by_player_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='packed_moves',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(pack_stored_moves, migrations.RunPython.noop),
+    ]
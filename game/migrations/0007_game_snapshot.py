@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+from game.migrations._frozen_replay import replay_codes, unpack_codes
+
+
+def snapshot_stored_games(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    for game in Game.objects.only('packed_moves').iterator():
+        game.snapshot = replay_codes(unpack_codes(game.packed_moves)).to_snapshot_1()
+        game.save(update_fields=['snapshot'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_game_packed_moves'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='snapshot',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(snapshot_stored_games, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from game.migrations._frozen_replay import build_checkpoints_16, unpack_codes
+
+
+def checkpoint_stored_games(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    GameCheckpoint = apps.get_model('game', 'GameCheckpoint')
+    for game in Game.objects.only('packed_moves').iterator():
+        GameCheckpoint.objects.bulk_create(GameCheckpoint(game=game, ply=ply, snapshot=snapshot)
+                                           for ply, snapshot in build_checkpoints_16(unpack_codes(game.packed_moves)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_game_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ply', models.SmallIntegerField()),
+                ('snapshot', models.BinaryField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='game.game')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('game', 'ply'), name='unique_game_checkpoint_ply')],
+            },
+        ),
+        migrations.RunPython(checkpoint_stored_games, migrations.RunPython.noop),
+    ]
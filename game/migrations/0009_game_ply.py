@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+from game.migrations._frozen_replay import FrozenBoard, encode_move, pack_codes, parse_move_code
+
+
+# Moves stored twice under one index by racing requests: only the first one is kept, and the packed move
+# list, snapshot and checkpoints of the game, which were built with all of them, are rebuilt from the rest.
+def remove_duplicate_moves(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    GameCheckpoint = apps.get_model('game', 'GameCheckpoint')
+    PlayerGameMove = apps.get_model('game', 'PlayerGameMove')
+    duplicates = PlayerGameMove.objects.values('game_id', 'index').annotate(count=Count('id'), first_id=Min('id')) \
+        .filter(count__gt=1)
+    game_ids = set()
+    for duplicate in list(duplicates):
+        PlayerGameMove.objects.filter(game_id=duplicate['game_id'], index=duplicate['index']) \
+            .exclude(id=duplicate['first_id']).delete()
+        game_ids.add(duplicate['game_id'])
+
+    for game in Game.objects.filter(id__in=game_ids):
+        board = FrozenBoard()
+        codes = []
+        checkpoints = []
+        for move_code in PlayerGameMove.objects.filter(game=game).order_by('index').values_list('move_code',
+                                                                                                  flat=True):
+            start, end = parse_move_code(move_code)
+            codes.append(encode_move(start, end, board.is_promotion(start, end)))
+            board.push(start, end)
+            if board.ply % 16 == 0:
+                checkpoints.append(GameCheckpoint(game=game, ply=board.ply, snapshot=board.to_snapshot_1()))
+        game.packed_moves = pack_codes(codes)
+        game.snapshot = board.to_snapshot_1()
+        game.save(update_fields=['packed_moves', 'snapshot'])
+        GameCheckpoint.objects.filter(game=game).delete()
+        GameCheckpoint.objects.bulk_create(checkpoints)
+
+
+def count_stored_plies(apps, schema_editor):
+    Game = apps.get_model('game', 'Game')
+    for game in Game.objects.only('packed_moves').iterator():
+        game.ply = len(game.packed_moves) // 2
+        game.save(update_fields=['ply'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0008_gamecheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='ply',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(remove_duplicate_moves, migrations.RunPython.noop),
+        migrations.RunPython(count_stored_plies, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='playergamemove',
+            constraint=models.UniqueConstraint(fields=('game', 'index'), name='unique_game_move_index'),
+        ),
+    ]
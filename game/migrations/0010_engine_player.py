@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import migrations
+
+
+# The user the engine plays as, without a usable password so nobody can log in as it. An account of that name
+# registered before is left alone; get_engine_player refuses to play as it.
+def create_engine_player(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    User.objects.get_or_create(username=getattr(settings, 'ENGINE_USERNAME', 'engine'),
+                               defaults={'password': make_password(None)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('game', '0009_game_ply'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_engine_player, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_engine_player'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='claimed_draw_reason',
+            field=models.CharField(max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,169 @@
+import random
+import struct
+
+# A frozen copy of the replay done by game.core, as it was when the data migrations were written, so that
+# what a migration writes never follows later changes of the live code. Never edit what is here; a changed
+# format gets new code next to the old one.
+# Squares are x + 8 * y indexes, pieces (color, code) pairs - color 0 white, 1 black, codes those of
+# ChessPiece.get_code().
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 'p', 'N', 'B', 'R', 'Q', 'K'
+_BACK_RANK = (ROOK, KNIGHT, BISHOP, QUEEN, KING, BISHOP, KNIGHT, ROOK)
+
+# packed move lists of game.core.move_codec: 16 bits per move, bits 0-5 end square, bits 6-11 start square,
+# bit 12 set for a promotion, little-endian
+PROMOTION_FLAG = 1 << 12
+
+
+def parse_move_code(move_code: str):
+    return ord(move_code[0]) - ord('a') + 8 * (int(move_code[1]) - 1), \
+        ord(move_code[2]) - ord('a') + 8 * (int(move_code[3]) - 1)
+
+
+def encode_move(start: int, end: int, promotion: bool) -> int:
+    return start * 64 + end | (PROMOTION_FLAG if promotion else 0)
+
+
+def pack_codes(codes) -> bytes:
+    codes = list(codes)
+    return struct.pack(f'<{len(codes)}H', *codes)
+
+
+def unpack_codes(packed) -> list:
+    packed = bytes(packed)
+    return list(struct.unpack(f'<{len(packed) // 2}H', packed))
+
+
+def decode_move(code: int):
+    return divmod(code & 0xFFF, 64)
+
+
+# Zobrist keys of game.core.zobrist, drawn from the same seeded generator in the same order
+_random = random.Random(0x5EED_D0C5)
+_PIECE_KEYS = {(color, code): tuple(_random.getrandbits(64) for _ in range(64))
+               for color in (0, 1) for code in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING)}
+_BLACK_TO_MOVE_KEY = _random.getrandbits(64)
+_CASTLING_KEYS = (0, *(_random.getrandbits(64) for _ in range(15)))
+_EN_PASSANT_KEYS = tuple(_random.getrandbits(64) for _ in range(8))
+
+# castling rights bits of game.core.chessboard, and the rights kept when a piece moves from or to a square
+ALL_CASTLES = 15
+_CASTLING_RIGHTS_KEPT = [ALL_CASTLES] * 64
+_CASTLING_RIGHTS_KEPT[4] = ALL_CASTLES & ~3
+_CASTLING_RIGHTS_KEPT[0] = ALL_CASTLES & ~2
+_CASTLING_RIGHTS_KEPT[7] = ALL_CASTLES & ~1
+_CASTLING_RIGHTS_KEPT[60] = ALL_CASTLES & ~12
+_CASTLING_RIGHTS_KEPT[56] = ALL_CASTLES & ~8
+_CASTLING_RIGHTS_KEPT[63] = ALL_CASTLES & ~4
+
+# version 1 of Chessboard.to_snapshot: version, 4 bits per square, side to move and castling rights,
+# en-passant square, halfmove clock, fullmove number, ply and Zobrist hash, then the recent position hashes
+SNAPSHOT_VERSION_1 = 1
+_SNAPSHOT_HEADER_1 = struct.Struct('<B32sBBHHHQ')
+_SNAPSHOT_CODES_1 = {None: 0, **{(color, code): number + 8 * color
+                                 for number, code in enumerate((PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING), start=1)
+                                 for color in (0, 1)}}
+
+
+# the board of Chessboard.push: castling moves the rook, en passant takes the passed pawn,
+# a pawn reaching the last row becomes a queen
+class FrozenBoard:
+    def __init__(self):
+        self.pieces = [None] * 64
+        for x, code in enumerate(_BACK_RANK):
+            self.pieces[x] = (0, code)
+            self.pieces[8 + x] = (0, PAWN)
+            self.pieces[48 + x] = (1, PAWN)
+            self.pieces[56 + x] = (1, code)
+        self.turn = 0
+        self.en_passant_square = None
+        self.castling_rights = ALL_CASTLES
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.ply = 0
+        # hash of the position before every move
+        self.hashes = []
+        self.hash = self.compute_hash()
+
+    def is_promotion(self, start: int, end: int) -> bool:
+        piece = self.pieces[start]
+        return piece is not None and piece[1] == PAWN and end // 8 in (0, 7)
+
+    # squares of the pawns that can take the pawn which just passed the en-passant square
+    def en_passant_attackers(self) -> list:
+        if self.en_passant_square is None:
+            return []
+        x = self.en_passant_square % 8
+        passed_inx = x + 8 * (3 if self.en_passant_square // 8 == 2 else 4)
+        passed = self.pieces[passed_inx]
+        if passed is None:
+            return []
+        return [passed_inx + dx for dx in (-1, 1)
+                if 0 <= x + dx < 8 and self.pieces[passed_inx + dx] == (1 - passed[0], PAWN)]
+
+    def compute_hash(self) -> int:
+        position_hash = _CASTLING_KEYS[self.castling_rights]
+        for inx, piece in enumerate(self.pieces):
+            if piece is not None:
+                position_hash ^= _PIECE_KEYS[piece][inx]
+        if self.turn == 1:
+            position_hash ^= _BLACK_TO_MOVE_KEY
+        if self.en_passant_attackers():
+            position_hash ^= _EN_PASSANT_KEYS[self.en_passant_square % 8]
+        return position_hash
+
+    # moves the pieces, returning the captured piece
+    def push(self, start: int, end: int):
+        self.hashes.append(self.hash)
+        piece = self.pieces[start]
+        captured_inx = end
+        if piece is not None and piece[1] == KING and abs(start % 8 - end % 8) > 1:
+            y = start // 8
+            rook_start, rook_end = (8 * y, 3 + 8 * y) if end % 8 < start % 8 else (7 + 8 * y, 5 + 8 * y)
+            self.pieces[rook_end], self.pieces[rook_start] = self.pieces[rook_start], None
+        elif end == self.en_passant_square and start in self.en_passant_attackers():
+            captured_inx = end % 8 + 8 * (start // 8)
+        captured = self.pieces[captured_inx]
+        self.pieces[captured_inx] = None
+        self.pieces[end], self.pieces[start] = piece, None
+
+        self.en_passant_square = None
+        if piece is not None and piece[1] == PAWN and abs(start // 8 - end // 8) == 2:
+            self.en_passant_square = end % 8 + 8 * ((start // 8 + end // 8) // 2)
+        self.castling_rights &= _CASTLING_RIGHTS_KEPT[start] & _CASTLING_RIGHTS_KEPT[end]
+        is_irreversible = piece is not None and piece[1] == PAWN or captured is not None
+        self.halfmove_clock = 0 if is_irreversible else self.halfmove_clock + 1
+        if self.turn == 1:
+            self.fullmove_number += 1
+        self.turn = 1 - self.turn
+        if piece is not None and piece[1] == PAWN and end // 8 == (7 if piece[0] == 0 else 0):
+            self.pieces[end] = (piece[0], QUEEN)
+        self.ply += 1
+        self.hash = self.compute_hash()
+        return captured
+
+    def to_snapshot_1(self) -> bytes:
+        squares = bytes(_SNAPSHOT_CODES_1[self.pieces[inx]] | _SNAPSHOT_CODES_1[self.pieces[inx + 1]] << 4
+                        for inx in range(0, 64, 2))
+        recent_hashes = self.hashes[-self.halfmove_clock:] if self.halfmove_clock else []
+        return _SNAPSHOT_HEADER_1.pack(SNAPSHOT_VERSION_1, squares, self.turn | self.castling_rights << 1,
+                                       255 if self.en_passant_square is None else self.en_passant_square,
+                                       self.halfmove_clock, self.fullmove_number, self.ply, self.hash) + \
+            struct.pack(f'<{len(recent_hashes)}Q', *recent_hashes)
+
+
+def replay_codes(codes) -> FrozenBoard:
+    board = FrozenBoard()
+    for code in codes:
+        board.push(*decode_move(code))
+    return board
+
+
+# (ply, version 1 snapshot) every 16 plies, as game.core.checkpoints.build_checkpoints
+def build_checkpoints_16(codes) -> list:
+    board = FrozenBoard()
+    checkpoints = []
+    for code in codes:
+        board.push(*decode_move(code))
+        if board.ply % 16 == 0:
+            checkpoints.append((board.ply, board.to_snapshot_1()))
+    return checkpoints
@@ -8,6 +8,14 @@ class Game(models.Model):
     created_by_player = models.ForeignKey(User, on_delete=models.CASCADE, related_name="created_by_player")
     start_date = models.DateTimeField(null=True)
     registration_date = models.DateTimeField()
+    # the whole move list, 16 bits per move (see game.core.move_codec), kept in sync with PlayerGameMove
+    packed_moves = models.BinaryField(default=b'')
+    # the position after the last stored move (see Chessboard.to_snapshot), written with every move
+    snapshot = models.BinaryField(default=b'')
+    # number of stored moves, the index of the last PlayerGameMove; the turn is read from it
+    ply = models.PositiveSmallIntegerField(default=0)
+    # the claimable draw (see game.core.game_state) a player claimed, ending the game; None while it goes on
+    claimed_draw_reason = models.CharField(max_length=32, null=True)
 
     def __str__(self):
         return str(self.id)
@@ -20,5 +28,21 @@ class PlayerGameMove(models.Model):
     move_code = models.CharField(max_length=4)
     registered_date = models.DateTimeField()
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['game', 'index'], name='unique_game_move_index')]
+
     def __str__(self):
         return str(self.index) + self.move_code
+
+
+# the board every few plies of a game (see game.core.checkpoints), for jumping to any ply without a full replay
+class GameCheckpoint(models.Model):
+    game = models.ForeignKey(Game, on_delete=models.CASCADE)
+    ply = models.SmallIntegerField()
+    snapshot = models.BinaryField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['game', 'ply'], name='unique_game_checkpoint_ply')]
+
+    def __str__(self):
+        return f'{self.game_id}@{self.ply}'
@@ -11,6 +11,18 @@ const gameSocket = new WebSocket(
 
 gameSocket.onmessage = e => {
     const data = JSON.parse(e.data);
+    if (data.error != null) {
+        console.warn(data.error);
+        return;
+    }
+    if (data.draw_claimed) {
+        // the game is over, nobody moves any more
+        moveGraph = {};
+        turn = null;
+        enableDisableDragging();
+        handleGameState(data['game_state']);
+        return;
+    }
     moveGraph = data['move_graph'];
     turn = data['game_state']['turn'];
 
@@ -286,13 +298,30 @@ const handleSpecialMoves = (specialMoveInfo, move) => {
     }
 }
 
+const drawReasons = {
+    'stalemate': " by stalemate",
+    'fivefold_repetition': " by fivefold repetition",
+    'seventy_five_move_rule': " by the seventy-five-move rule",
+    'insufficient_material': " by insufficient material",
+    'threefold_repetition': " by threefold repetition",
+    'fifty_move_rule': " by the fifty-move rule",
+};
+
+const claimDrawButton = document.getElementById('claim-draw');
+
+claimDrawButton.addEventListener('click', () => {
+    gameSocket.send(JSON.stringify({'claim_draw': true}));
+});
+
 const handleGameState = (gameState) => {
+    // a draw by threefold repetition or the fifty-move rule is claimed by the player to move
+    claimDrawButton.classList.toggle('d-none', !isPlayersTurn() || gameState['claimable_draw_reason'] == null);
     if (gameState['is_checkmate']) {
         $('#stateModalLabel').html("Checkmate");
         $('#stateModal').modal();
         playEndGameSound();
     } else if (gameState['is_draw']) {
-        $('#stateModalLabel').html("Draw");
+        $('#stateModalLabel').html("Draw" + (drawReasons[gameState['draw_reason']] || ""));
         $('#stateModal').modal();
         playEndGameSound();
     } else if (gameState['is_check']) {
@@ -50,6 +50,16 @@ document.getElementById('as-white').addEventListener('click', e => {
     sendPlayAs(white);
 });
 
+// only the owner gets the engine buttons
+['white', 'black'].forEach(colorName => {
+    const engineButton = document.getElementById('engine-as-' + colorName);
+    if (engineButton != null) {
+        engineButton.addEventListener('click', e => {
+            sendPlayAs('engine_' + colorName);
+        });
+    }
+});
+
 document.getElementById('start_game').addEventListener('click', e => {
     sendStartGame();
 })
\ No newline at end of file
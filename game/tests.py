@@ -1,3 +1,303 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer
+from django.contrib.auth.models import AnonymousUser, User
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .core.checkpoints import build_checkpoints
+from .core.chessboard import Chessboard, Move
+from .consumers import parse_client_message, parse_client_move, send_move_message
+from .core.executor import BoundedExecutor
+from .core.move_codec import pack_moves, unpack_moves
+from .core.move_graph import MoveGraph
+from . import util
+from .forms import RegisterForm
+from .models import Game, GameCheckpoint, PlayerGameMove
+from .util import claim_game_draw, commit_game_move, game_state_cache, iter_games_pgn, get_engine_player, repair_game_snapshot
+
+# 14 plies, two white moves stored under index 15 by racing requests, then black's reply under index 16
+GAME_CODES = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'g8f6', 'e1g1', 'f8c5', 'd2d3', 'e8g8',
+              'c2c3', 'd7d6', 'b1d2', 'a7a6']
+RACED_CODES = ['a2a4', 'h2h3']
+REPLY_CODE = 'c8e6'
+
+
+class GamePlyMigrationTestCase(TransactionTestCase):
+    migrate_from = [('game', '0008_gamecheckpoint')]
+    migrate_to = [('game', '0009_game_ply')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        User = apps.get_model('auth', 'User')
+        Game = apps.get_model('game', 'Game')
+        GameCheckpoint = apps.get_model('game', 'GameCheckpoint')
+        PlayerGameMove = apps.get_model('game', 'PlayerGameMove')
+
+        white = User.objects.create(username='white')
+        black = User.objects.create(username='black')
+        now = datetime.datetime.now()
+        # packed moves, snapshot and checkpoints as the racing requests left them, built with both moves
+        stored_moves = Move.from_str_list(GAME_CODES + RACED_CODES + [REPLY_CODE])
+        game = Game.objects.create(white_player=white, black_player=black, created_by_player=white,
+                                   registration_date=now, start_date=now, packed_moves=pack_moves(stored_moves),
+                                   snapshot=Chessboard.from_moves_list(stored_moves).to_snapshot())
+        for ply, snapshot in build_checkpoints(stored_moves):
+            GameCheckpoint.objects.create(game=game, ply=ply, snapshot=snapshot)
+        for index, code in enumerate(GAME_CODES, start=1):
+            PlayerGameMove.objects.create(game=game, player=(white, black)[(index - 1) % 2], index=index,
+                                          move_code=code, registered_date=now)
+        for code in RACED_CODES:
+            PlayerGameMove.objects.create(game=game, player=white, index=len(GAME_CODES) + 1, move_code=code,
+                                          registered_date=now)
+        PlayerGameMove.objects.create(game=game, player=black, index=len(GAME_CODES) + 2, move_code=REPLY_CODE,
+                                      registered_date=now)
+        self.game_id = game.id
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        self.apps = executor.loader.project_state(self.migrate_to).apps
+
+    def tearDown(self):
+        MigrationExecutor(connection).migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicate_moves_are_removed_and_game_rebuilt(self):
+        Game = self.apps.get_model('game', 'Game')
+        GameCheckpoint = self.apps.get_model('game', 'GameCheckpoint')
+        PlayerGameMove = self.apps.get_model('game', 'PlayerGameMove')
+        kept_codes = GAME_CODES + RACED_CODES[:1] + [REPLY_CODE]
+        kept_moves = Move.from_str_list(kept_codes)
+
+        self.assertEqual(kept_codes, list(PlayerGameMove.objects.filter(game_id=self.game_id).order_by('index')
+                                          .values_list('move_code', flat=True)))
+        game = Game.objects.get(id=self.game_id)
+        self.assertEqual(len(kept_codes), game.ply)
+        self.assertEqual(kept_moves, unpack_moves(game.packed_moves))
+        board = Chessboard.from_moves_list(kept_moves)
+        self.assertEqual(board.to_snapshot(), bytes(game.snapshot))
+        self.assertEqual(16, len(kept_moves))
+        self.assertEqual(build_checkpoints(kept_moves),
+                         [(ply, bytes(snapshot)) for ply, snapshot in GameCheckpoint.objects
+                          .filter(game_id=self.game_id).order_by('ply').values_list('ply', 'snapshot')])
+
+
+def parse_client_move_text(text_data):
+    return parse_client_move(parse_client_message(text_data))
+
+
+class ParseClientMoveTestCase(SimpleTestCase):
+    def test_valid_move(self):
+        self.assertIs(Move.from_str('e2e4'), parse_client_move_text('{"move": {"start_pos": 12, "end_pos": 28}}'))
+        self.assertIs(Move.from_indexes(0, 63), parse_client_move_text('{"move": {"start_pos": 0, "end_pos": 63}}'))
+
+    def test_invalid_messages(self):
+        for text_data in ['', 'not json', '[]', '"move"', '{}', '{"move": null}', '{"move": [12, 28]}',
+                          '{"move": {"start_pos": 12}}', '{"move": {"end_pos": 28}}',
+                          '{"move": {"start_pos": 12, "end_pos": 64}}', '{"move": {"start_pos": -1, "end_pos": 28}}',
+                          '{"move": {"start_pos": "12", "end_pos": 28}}', '{"move": {"start_pos": 12.0, "end_pos": 28}}',
+                          '{"move": {"start_pos": true, "end_pos": 28}}', '{"move": {"start_pos": 12, "end_pos": null}}']:
+            with self.subTest(text_data=text_data):
+                self.assertIsNone(parse_client_move_text(text_data))
+
+
+# a started game between two players
+class StartedGameTestCase(TestCase):
+    def setUp(self):
+        self.white = User.objects.create(username='white')
+        self.black = User.objects.create(username='black')
+        now = datetime.datetime.now()
+        self.game = Game.objects.create(white_player=self.white, black_player=self.black,
+                                        created_by_player=self.white, registration_date=now, start_date=now)
+
+    def assert_stored(self, codes):
+        moves = Move.from_str_list(codes)
+        game = Game.objects.get(id=self.game.id)
+        self.assertEqual(len(codes), game.ply)
+        self.assertEqual(codes, list(PlayerGameMove.objects.filter(game=game).order_by('index')
+                                     .values_list('move_code', flat=True)))
+        self.assertEqual(moves, unpack_moves(game.packed_moves))
+        # a new game has no snapshot until its first move
+        self.assertEqual(Chessboard.from_moves_list(moves).to_snapshot() if codes else b'', bytes(game.snapshot))
+
+
+class CommitGameMoveTestCase(StartedGameTestCase):
+    def test_moves_are_stored(self):
+        codes = GAME_CODES + ['a2a4', 'c8e6']
+        for ply, code in enumerate(codes):
+            board = commit_game_move(self.game.id, (self.white, self.black)[ply % 2], Move.from_str(code), ply)
+            self.assertEqual(ply + 1, board.get_ply())
+        self.assert_stored(codes)
+        self.assertEqual(build_checkpoints(Move.from_str_list(codes)),
+                         [(ply, bytes(snapshot)) for ply, snapshot in GameCheckpoint.objects
+                          .filter(game=self.game).values_list('ply', 'snapshot')])
+
+    def test_wrong_turn(self):
+        self.assertIsNone(commit_game_move(self.game.id, self.black, Move.from_str('e7e5')))
+        commit_game_move(self.game.id, self.white, Move.from_str('e2e4'))
+        self.assertIsNone(commit_game_move(self.game.id, self.white, Move.from_str('d2d4')))
+        self.assert_stored(['e2e4'])
+
+    def test_stale_ply(self):
+        commit_game_move(self.game.id, self.white, Move.from_str('e2e4'), 0)
+        self.assertIsNone(commit_game_move(self.game.id, self.black, Move.from_str('e7e5'), 0))
+        self.assertIsNone(commit_game_move(self.game.id, self.black, Move.from_str('e7e5'), 2))
+        self.assert_stored(['e2e4'])
+
+    def test_illegal_move(self):
+        self.assertIsNone(commit_game_move(self.game.id, self.white, Move.from_str('e2e5')))
+        self.assertIsNone(commit_game_move(self.game.id, self.white, Move.from_str('e7e5')))
+        self.assert_stored([])
+
+    def test_anonymous_player_and_empty_seat(self):
+        Game.objects.filter(id=self.game.id).update(black_player=None)
+        commit_game_move(self.game.id, self.white, Move.from_str('e2e4'))
+        self.assertIsNone(commit_game_move(self.game.id, AnonymousUser(), Move.from_str('e7e5')))
+        self.assertIsNone(commit_game_move(self.game.id, self.black, Move.from_str('e7e5')))
+        self.assert_stored(['e2e4'])
+
+    def test_stored_move_is_sent_with_full_executor(self):
+        board = commit_game_move(self.game.id, self.white, Move.from_str('e2e4'))
+        full_executor = BoundedExecutor(workers=1, max_queued=0)
+        self.addCleanup(full_executor.shutdown)
+        layer = InMemoryChannelLayer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'game_{self.game.id}', channel)
+        with mock.patch('game.consumers.move_graph_executor', full_executor), \
+                self.assertLogs('game.consumers', 'WARNING'):
+            async_to_sync(send_move_message)(self.game.id, Move.from_str('e2e4'), board, layer)
+        message = async_to_sync(layer.receive)(channel)
+        self.assertEqual(Move.from_str('e2e4').as_dict(), message['move'])
+        self.assertEqual('black_piece', message['game_state']['turn'])
+        self.assertEqual(1, full_executor.stats()['rejected'])
+
+    def test_repair_clears_cached_states(self):
+        for ply, code in enumerate(['e2e4', 'e7e5']):
+            board = commit_game_move(self.game.id, (self.white, self.black)[ply % 2], Move.from_str(code))
+            game_state_cache.put(self.game.id, board)
+        with self.captureOnCommitCallbacks(execute=True):
+            repair_game_snapshot(self.game.id)
+        self.assertIsNone(game_state_cache.get(self.game.id, 2))
+        self.assertIsNone(game_state_cache.get(self.game.id, 1))
+        self.assert_stored(['e2e4', 'e7e5'])
+
+    def test_game_in_lobby(self):
+        Game.objects.filter(id=self.game.id).update(start_date=None)
+        self.assertIsNone(commit_game_move(self.game.id, self.white, Move.from_str('e2e4')))
+        self.assert_stored([])
+
+
+class ClaimGameDrawTestCase(StartedGameTestCase):
+    def play(self, codes):
+        for code in codes:
+            game = Game.objects.get(id=self.game.id)
+            commit_game_move(self.game.id, (self.white, self.black)[game.ply % 2], Move.from_str(code))
+
+    def test_threefold_repetition_is_claimed(self):
+        self.play(['g1f3', 'g8f6', 'f3g1', 'f6g8'] * 2)
+        self.assertIsNone(claim_game_draw(self.game.id, self.black))
+        self.assertIsNone(claim_game_draw(self.game.id, AnonymousUser()))
+        game_state = claim_game_draw(self.game.id, self.white)
+        self.assertTrue(game_state['is_draw'])
+        self.assertEqual('threefold_repetition', game_state['draw_reason'])
+        self.assertIsNone(game_state['claimable_draw_reason'])
+
+        self.assertEqual('threefold_repetition', Game.objects.get(id=self.game.id).claimed_draw_reason)
+        self.assertIsNone(commit_game_move(self.game.id, self.white, Move.from_str('e2e4')))
+        self.assertIsNone(claim_game_draw(self.game.id, self.white))
+        self.assertIn('[Result "1/2-1/2"]', next(iter_games_pgn(Game.objects.filter(id=self.game.id))))
+
+    def test_no_draw_to_claim(self):
+        self.play(['g1f3', 'g8f6', 'f3g1', 'f6g8', 'g1f3', 'g8f6', 'f3g1'])
+        self.assertIsNone(claim_game_draw(self.game.id, self.black))
+        self.assertIsNone(Game.objects.get(id=self.game.id).claimed_draw_reason)
+        self.play(['f6g8'])
+        self.assertIsNotNone(claim_game_draw(self.game.id, self.white))
+
+
+class GamePliesViewTestCase(StartedGameTestCase):
+    codes = GAME_CODES + ['a2a4', 'c8e6', 'c4e6', 'f7e6', 'd1b3', 'd8c8']
+
+    def setUp(self):
+        super().setUp()
+        for ply, code in enumerate(self.codes):
+            commit_game_move(self.game.id, (self.white, self.black)[ply % 2], Move.from_str(code))
+        self.client.force_login(self.white)
+
+    def get_plies(self, ply, **params):
+        return self.client.get(reverse('game_plies', args=[str(self.game.id), ply]), params)
+
+    def assert_positions(self, first_ply, positions):
+        moves = Move.from_str_list(self.codes)
+        for ply, position in enumerate(positions, start=first_ply):
+            board = Chessboard.from_moves_list(moves[:ply])
+            self.assertEqual(ply, position['ply'])
+            self.assertEqual(board.to_fen(), position['fen'])
+            self.assertEqual(moves[ply - 1].as_dict() if ply else None, position['move'])
+            self.assertEqual(MoveGraph(board, side_to_move_only=True).as_dict(), position['move_graph'])
+
+    def test_first_ply(self):
+        response = self.get_plies(0)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(len(self.codes), response.json()['plies'])
+        self.assertEqual(1, len(response.json()['positions']))
+        self.assert_positions(0, response.json()['positions'])
+
+    def test_window_across_checkpoint(self):
+        self.assertTrue(GameCheckpoint.objects.filter(game=self.game, ply=16).exists())
+        positions = self.get_plies(13, count=6).json()['positions']
+        self.assertEqual(6, len(positions))
+        self.assert_positions(13, positions)
+        # a window reaching past the last ply ends with it
+        positions = self.get_plies(17, count=10).json()['positions']
+        self.assertEqual([17, 18, 19, 20], [position['ply'] for position in positions])
+        self.assert_positions(17, positions)
+
+    def test_ply_past_the_end(self):
+        self.assertEqual(200, self.get_plies(len(self.codes)).status_code)
+        self.assertEqual(404, self.get_plies(len(self.codes) + 1).status_code)
+
+    def test_count_bounds(self):
+        for count in ['0', '65', '-1', 'many']:
+            with self.subTest(count=count):
+                self.assertEqual(400, self.get_plies(0, count=count).status_code)
+        self.assertEqual(len(self.codes) + 1, len(self.get_plies(0, count=64).json()['positions']))
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(302, self.get_plies(0).status_code)
+
+
+class EnginePlayerTestCase(TestCase):
+    def setUp(self):
+        util._engine_player = None
+        self.addCleanup(setattr, util, '_engine_player', None)
+
+    def test_engine_player_is_created_by_migration(self):
+        engine_player = get_engine_player()
+        self.assertEqual('engine', engine_player.username)
+        self.assertFalse(engine_player.has_usable_password())
+        self.assertIs(engine_player, get_engine_player())
+
+    def test_engine_name_with_usable_password_is_refused(self):
+        engine_player = User.objects.get(username='engine')
+        engine_player.set_password('secret')
+        engine_player.save()
+        with self.assertLogs('game.util', 'ERROR'):
+            self.assertIsNone(get_engine_player())
+
+    def test_engine_name_can_not_be_registered(self):
+        # reserved even before the engine user exists
+        User.objects.filter(username='engine').delete()
+        for username in ['engine', 'Engine']:
+            form = RegisterForm({'username': username, 'password1': 'Xq7!lmnopq', 'password2': 'Xq7!lmnopq'})
+            self.assertFalse(form.is_valid())
+            self.assertEqual(['reserved'], [error.code for error in form.errors.as_data()['username']])
+        form = RegisterForm({'username': 'player', 'password1': 'Xq7!lmnopq', 'password2': 'Xq7!lmnopq'})
+        self.assertTrue(form.is_valid())
@@ -7,5 +7,8 @@ urlpatterns = [
     path('register', views.register, name='register'),
     path('new-game', views.new_game, name='new_game'),
     path('chessboard/<str:game_id>', views.chessboard, name='chessboard'),
-    path('lobby/<str:game_id>', views.lobby, name='lobby')
+    path('replay/<str:game_id>/<int:ply>', views.game_plies, name='game_plies'),
+    path('lobby/<str:game_id>', views.lobby, name='lobby'),
+    path('pgn', views.export_pgn, name='export_pgn'),
+    path('pgn/<str:game_id>', views.export_pgn, name='export_game_pgn')
 ]
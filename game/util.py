@@ -1,39 +1,211 @@
+import datetime
+import logging
+import os
+import threading
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
 from .core.chesspiece import PieceColor, ChessPiece
-from .core.game_state import GameState
-from .models import PlayerGameMove
+from .core.game_state import GameState, claimed_draw_state
+from .models import Game, GameCheckpoint, PlayerGameMove
+from .core.bitboard import BitboardChessboard
+from .core.checkpoints import board_at_ply, build_checkpoints, checkpoint_ply_before, is_checkpoint_ply
 from .core.chessboard import Chessboard, Move
+from .core.engine import EnginePool
+from .core.executor import BoundedExecutor, ExecutorFull
+from .core.legal_moves import is_legal_move
+from .core.move_codec import decode_move, encode_move, pack_codes, unpack_codes, unpack_moves
 from .core.move_graph import MoveGraph
-from django.db.models import Max
+from .core.pgn import DRAW, PgnGame, iter_san_moves, write_pgn_game
+from .core.replay import GameRecord
+from .core.tablebase import Tablebase
+from .core.transposition import GameStateCache, TranspositionCache
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import User
+from django.db import connection, transaction
 from django.template.loader import render_to_string
 
+logger = logging.getLogger(__name__)
 
-def get_game_chessboard(game_id: int) -> Chessboard:
-    moves = PlayerGameMove.objects.filter(game_id=game_id).order_by('index')
+tablebase_directory = getattr(settings, 'TABLEBASE_DIR', None)
+tablebase = Tablebase(str(tablebase_directory) if tablebase_directory else None)
+transposition_cache = TranspositionCache(getattr(settings, 'TRANSPOSITION_CACHE_SIZE', 4096), tablebase)
+# the shared tier is the Django cache named by GAME_STATE_CACHE, none when the setting is missing
+_game_state_cache_alias = getattr(settings, 'GAME_STATE_CACHE', None)
+game_state_cache = GameStateCache(getattr(settings, 'GAME_STATE_CACHE_SIZE', 512),
+                                  caches[_game_state_cache_alias] if _game_state_cache_alias else None,
+                                  getattr(settings, 'GAME_STATE_CACHE_TIMEOUT', 3600),
+                                  transposition_cache, BitboardChessboard)
+# builds the move graphs the async consumers send, off their event loop
+move_graph_executor = BoundedExecutor(getattr(settings, 'MOVE_GRAPH_WORKERS', 2), 'move-graph',
+                                      getattr(settings, 'MOVE_GRAPH_QUEUE_SIZE', 64))
 
-    codes_list = list(map(lambda move: move.move_code, moves))
-    moves_list = list(map(lambda move_code: Move.from_str(move_code), codes_list))
+# started by the first engine move, so processes that never need the engine don't spawn workers
+_engine_pool = None
+_engine_pool_lock = threading.Lock()
 
-    return Chessboard.from_moves_list(moves_list)
 
+def get_engine_pool() -> EnginePool:
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            book_path = getattr(settings, 'OPENING_BOOK', None)
+            _engine_pool = EnginePool(workers=getattr(settings, 'ENGINE_WORKERS', 1),
+                                      time_limit=getattr(settings, 'ENGINE_TIME_LIMIT', 1.0),
+                                      node_limit=getattr(settings, 'ENGINE_NODE_LIMIT', None),
+                                      book_path=str(book_path) if book_path and os.path.exists(book_path) else None,
+                                      tablebase_directory=str(tablebase_directory) if tablebase.keys() else None)
+        return _engine_pool
+
+
+# The user the engine plays as, created by migration 0010 and looked up once per process. None when it is
+# missing or when a person registered the name first (the account has a usable password), so nobody plays
+# the engine's moves or has them stored under their account.
+_engine_player = None
+
+
+def get_engine_player() -> Optional[User]:
+    global _engine_player
+    if _engine_player is None:
+        username = getattr(settings, 'ENGINE_USERNAME', 'engine')
+        player = User.objects.filter(username=username).first()
+        if player is None or player.has_usable_password():
+            logger.error('engine user %s is missing or has a usable password, the engine is not playing', username)
+            return None
+        _engine_player = player
+    return _engine_player
+
+
+# board - an already built board of this game; only the moves stored after it are pushed.
+# Without one, the board is restored from the game's snapshot instead of replaying the game.
+def get_game_chessboard(game_id: int, board: Chessboard = None) -> Chessboard:
+    packed_moves, snapshot = Game.objects.values_list('packed_moves', 'snapshot').get(id=game_id)
+    return _advance_board(board, packed_moves, snapshot)
+
+
+def _advance_board(board: Chessboard, packed_moves, snapshot) -> Chessboard:
+    codes = unpack_codes(packed_moves)
+    if board is None:
+        board = _snapshot_board(bytes(snapshot), len(codes))
+    for code in codes[board.get_ply():]:
+        board.push(decode_move(code))
+    return board
 
-def get_game_move_graph(game_id: int) -> MoveGraph:
-    board = get_game_chessboard(game_id)
-    return MoveGraph(board)
 
+# a missing or broken snapshot, or one ahead of the move list, falls back to replaying the game
+def _snapshot_board(snapshot: bytes, plies: int) -> Chessboard:
+    if snapshot:
+        try:
+            board = BitboardChessboard.from_snapshot(snapshot)
+            if board.get_ply() <= plies:
+                return board
+        except ValueError:
+            pass
+    return BitboardChessboard()
 
-def get_game_max_move_index(game_id: int) -> int:
-    max_index = PlayerGameMove.objects.filter(game_id=game_id).aggregate(Max('index'))['index__max']
-    return max_index if max_index is not None else 0
 
+# Stores the player's move as the next ply of the game in one transaction: the game row is locked, the turn
+# checked against its ply counter and the move against its snapshot, then the PlayerGameMove is inserted and
+# the counter, move list and snapshot of the game are updated together.
+# ply - the ply the move was chosen at; the move is rejected when another one was stored since.
+# Returns the board after the move, None when the move is rejected - also for anonymous players, games still
+# in the lobby or ended by a claimed draw, and empty seats.
+def commit_game_move(game_id: int, player: User, move: Move, ply: int = None) -> Optional[Chessboard]:
+    if not player.is_authenticated:
+        return None
+    with transaction.atomic():
+        game = _get_game_for_turn(game_id, player)
+        if game is None or ply is not None and game.ply != ply:
+            return None
+        board = _advance_board(None, game.packed_moves, game.snapshot)
+        if not is_legal_move(board, move):
+            return None
+        promotion = board.is_promotion(move)
+        game.ply += 1
+        PlayerGameMove.objects.create(game_id=game_id,
+                                      player=player,
+                                      index=game.ply,
+                                      move_code=str(move),
+                                      registered_date=datetime.datetime.now())
+        board.push(move)
+        game.packed_moves = bytes(game.packed_moves) + pack_codes([encode_move(move, promotion)])
+        game.snapshot = board.to_snapshot()
+        game.save(update_fields=['ply', 'packed_moves', 'snapshot'])
+        if is_checkpoint_ply(game.ply):
+            GameCheckpoint.objects.create(game_id=game_id, ply=game.ply, snapshot=game.snapshot)
+        # the state itself is cached by get_game_cached_state, where its move graph is built
+        transaction.on_commit(partial(game_state_cache.set_version, game_id, game.ply))
+    return board
 
-def get_game_turn(game_id: int) -> PieceColor:
-    return PieceColor.WHITE if get_game_max_move_index(game_id) % 2 == 0 else PieceColor.BLACK
 
+# Ends the game in a draw when the player to move may claim one, by threefold repetition or the fifty-move rule.
+# Returns the state of the ended game, None when there is no draw to claim or it is not the player's turn.
+def claim_game_draw(game_id: int, player: User) -> Optional[dict]:
+    if not player.is_authenticated:
+        return None
+    with transaction.atomic():
+        game = _get_game_for_turn(game_id, player)
+        if game is None:
+            return None
+        game_state = transposition_cache.get_entry(_advance_board(None, game.packed_moves, game.snapshot)).game_state
+        # a position that ended the game has no claimable draw
+        if game_state['claimable_draw_reason'] is None:
+            return None
+        game.claimed_draw_reason = game_state['claimable_draw_reason']
+        game.save(update_fields=['claimed_draw_reason'])
+    return claimed_draw_state(game_state, game.claimed_draw_reason)
 
-def get_game_full_state(game_id: int) -> dict:
+
+# the game locked for an update by the player to move, None when it is not their turn in a game going on
+def _get_game_for_turn(game_id: int, player: User) -> Optional[Game]:
+    game = Game.objects.select_for_update() \
+        .only('white_player', 'black_player', 'start_date', 'claimed_draw_reason', 'ply', 'packed_moves', 'snapshot') \
+        .get(id=game_id)
+    seat_player_id = (game.white_player_id, game.black_player_id)[game.ply % 2]
+    if game.start_date is None or game.claimed_draw_reason is not None or seat_player_id is None \
+            or seat_player_id != player.id:
+        return None
+    return game
+
+
+# rewrites the snapshot, the ply counter and the checkpoints from a full replay of the packed move list
+def repair_game_snapshot(game_id: int) -> None:
+    with transaction.atomic():
+        game = Game.objects.select_for_update().only('packed_moves', 'snapshot', 'ply').get(id=game_id)
+        moves = unpack_moves(game.packed_moves)
+        # states cached for the broken game, up to the longer of its old and new ply counts
+        transaction.on_commit(partial(game_state_cache.clear_game, game_id, max(game.ply, len(moves))))
+        game.snapshot = Chessboard.from_moves_list(moves).to_snapshot()
+        game.ply = len(moves)
+        game.save(update_fields=['snapshot', 'ply'])
+        GameCheckpoint.objects.filter(game_id=game_id).delete()
+        GameCheckpoint.objects.bulk_create(GameCheckpoint(game_id=game_id, ply=ply, snapshot=snapshot)
+                                           for ply, snapshot in build_checkpoints(moves))
+
+
+# snapshot of the checkpoint a board after ply plies of the game is restored from, None before the first one
+def get_game_checkpoint(game_id: int, ply: int) -> Optional[bytes]:
+    snapshot = GameCheckpoint.objects.filter(game_id=game_id, ply=checkpoint_ply_before(ply)) \
+        .values_list('snapshot', flat=True).first()
+    return bytes(snapshot) if snapshot is not None else None
+
+
+# board after the first ply moves of the game, restored from the checkpoint before that ply
+def get_game_chessboard_at(game_id: int, ply: int) -> Chessboard:
+    packed_moves = Game.objects.values_list('packed_moves', flat=True).get(id=game_id)
+    return board_at_ply(unpack_codes(packed_moves), ply, get_game_checkpoint(game_id, ply), BitboardChessboard)
+
+
+def get_game_move_graph(game_id: int) -> MoveGraph:
     board = get_game_chessboard(game_id)
-    graph = MoveGraph(board)
-    state = GameState(graph, get_game_turn(game_id))
+    return MoveGraph(board, side_to_move_only=True)
+
+
+def get_game_full_state(game_id: int, board: Chessboard = None) -> dict:
+    board = get_game_chessboard(game_id, board)
+    graph = MoveGraph(board, side_to_move_only=True)
+    state = GameState(graph, board.get_turn(), tablebase)
     return {
         'chessboard': board,
         'move_graph': graph,
@@ -41,5 +213,153 @@ def get_game_full_state(game_id: int) -> dict:
     }
 
 
+# number of moves stored in the game, read without loading them
+def get_game_ply(game_id: int) -> int:
+    return Game.objects.values_list('ply', flat=True).get(id=game_id)
+
+
+# Like get_game_full_state, but move graph and game state are given as dicts, together with the special move
+# info of the last move. They come from the game state cache, checked against the latest ply of the game,
+# which is read from the database only when the shared tier doesn't have it.
+# ply - the ply the caller knows to be the latest, e.g. that of a move it just stored. Given together with
+# the board at that ply, the database is not read at all.
+def get_game_cached_state(game_id: int, board: Chessboard = None, ply: int = None) -> dict:
+    if ply is None:
+        ply = game_state_cache.get_version(game_id)
+    if ply is None:
+        ply = get_game_ply(game_id)
+    entry = game_state_cache.get(game_id, ply)
+    if entry is None:
+        if board is None or board.get_ply() != ply:
+            board = get_game_chessboard(game_id, board)
+        entry = game_state_cache.put(game_id, board)
+    return {
+        'chessboard': entry.board,
+        'move_graph': entry.move_graph,
+        'game_state': entry.game_state,
+        'special_move_info': entry.special_move_info
+    }
+
+
+# moves of every started game, read a game at a time
+def iter_game_moves() -> Iterator[List[Move]]:
+    for packed_moves in Game.objects.filter(start_date__isnull=False).order_by('id') \
+            .values_list('packed_moves', flat=True).iterator():
+        yield unpack_moves(packed_moves)
+
+
+# GameRecords of the games, ordered by id, in lists of chunk_size games; the rows are read chunk by chunk
+def iter_game_record_chunks(chunk_size: int, game_ids: Iterable[int] = None) -> Iterator[List[GameRecord]]:
+    games = Game.objects.order_by('id')
+    if game_ids is not None:
+        games = games.filter(id__in=list(game_ids))
+    last_id = 0
+    while True:
+        game_rows = list(games.filter(id__gt=last_id)
+                         .values_list('id', 'white_player_id', 'black_player_id', 'packed_moves',
+                                      'snapshot')[:chunk_size])
+        if not game_rows:
+            return
+        last_id = game_rows[-1][0]
+        moves = {game_id: [] for game_id, *_ in game_rows}
+        for game_id, index, player_id, move_code in PlayerGameMove.objects \
+                .filter(game_id__in=list(moves)).order_by('game_id', 'index') \
+                .values_list('game_id', 'index', 'player_id', 'move_code').iterator():
+            moves[game_id].append((index, player_id, move_code))
+        yield [GameRecord(game_id=game_id, white_player_id=white_player_id, black_player_id=black_player_id,
+                          moves=moves[game_id], packed_moves=bytes(packed_moves), snapshot=bytes(snapshot))
+               for game_id, white_player_id, black_player_id, packed_moves, snapshot in game_rows]
+
+
+# Imports the games in batches of batch_size games, each batch with one bulk insert of games and one of moves.
+# Players are looked up by the White and Black tags; games of unknown players are given to default_player.
+# Returns the number of imported games and (game number, error) of the games that could not be read.
+def import_pgn_games(pgn_games: Iterable[PgnGame], default_player: User,
+                     batch_size: int = 500) -> Tuple[int, List[Tuple[int, str]]]:
+    users: Dict[str, User] = {}
+    imported = 0
+    errors = []
+    batch = []
+    for number, pgn_game in enumerate(pgn_games, start=1):
+        if 'FEN' in pgn_game.headers:
+            errors.append((number, 'games from a set-up position are not supported'))
+            continue
+        board = Chessboard()
+        moves = []
+        checkpoints = []
+        try:
+            for move, promotion in iter_san_moves(pgn_game.san_moves, board):
+                moves.append((move, promotion))
+                if is_checkpoint_ply(board.get_ply()):
+                    checkpoints.append((board.get_ply(), board.to_snapshot()))
+        except ValueError as error:
+            errors.append((number, str(error)))
+            continue
+        white_player = _pgn_player(pgn_game.headers.get('White'), default_player, users)
+        black_player = _pgn_player(pgn_game.headers.get('Black'), default_player, users)
+        batch.append((white_player, black_player, _pgn_date(pgn_game.headers.get('Date')), moves,
+                      board.to_snapshot(), checkpoints))
+        if len(batch) >= batch_size:
+            imported += _insert_games(batch, default_player)
+            batch = []
+    if batch:
+        imported += _insert_games(batch, default_player)
+    return imported, errors
+
+
+def _pgn_player(name: str, default_player: User, users: Dict[str, User]) -> User:
+    if name not in users:
+        users[name] = User.objects.filter(username=name).first() or default_player
+    return users[name]
+
+
+def _pgn_date(date: str) -> datetime.datetime:
+    try:
+        return datetime.datetime.strptime(date, '%Y.%m.%d')
+    except (TypeError, ValueError):
+        return datetime.datetime.now()
+
+
+def _insert_games(batch: list, created_by_player: User) -> int:
+    now = datetime.datetime.now()
+    with transaction.atomic():
+        games = [Game(white_player=white_player, black_player=black_player, created_by_player=created_by_player,
+                      start_date=start_date, registration_date=now,
+                      packed_moves=pack_codes(encode_move(move, promotion) for move, promotion in moves),
+                      snapshot=snapshot, ply=len(moves))
+                 for white_player, black_player, start_date, moves, snapshot, _ in batch]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Game.objects.bulk_create(games)
+        else:
+            for game in games:
+                game.save()
+        PlayerGameMove.objects.bulk_create(
+            PlayerGameMove(game=game, player=(white_player, black_player)[ply % 2], index=ply + 1,
+                           move_code=str(move), registered_date=now)
+            for game, (white_player, black_player, _, moves, _, _) in zip(games, batch)
+            for ply, (move, _) in enumerate(moves))
+        GameCheckpoint.objects.bulk_create(GameCheckpoint(game=game, ply=ply, snapshot=snapshot)
+                                           for game, (*_, checkpoints) in zip(games, batch)
+                                           for ply, snapshot in checkpoints)
+    return len(games)
+
+
+# PGN text of the games, one game at a time
+def iter_games_pgn(games) -> Iterator[str]:
+    for game in games.select_related('white_player', 'black_player').iterator(chunk_size=200):
+        headers = {'Event': f'Djangochess game {game.id}',
+                   'Date': (game.start_date or game.registration_date).strftime('%Y.%m.%d'),
+                   'White': game.white_player.username if game.white_player is not None else '?',
+                   'Black': game.black_player.username if game.black_player is not None else '?'}
+        # the result of any other game follows from its last position
+        if game.claimed_draw_reason is not None:
+            headers['Result'] = DRAW
+        try:
+            yield write_pgn_game(headers, unpack_moves(game.packed_moves))
+        except ValueError as error:
+            # keep the stream going, the game itself can be checked with manage.py validate_games
+            yield f'; game {game.id} skipped: {error}\n\n'
+
+
 def render_piece(piece: ChessPiece) -> str:
     return render_to_string('game/piece.html', {'piece': piece})
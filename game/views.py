@@ -1,12 +1,18 @@
 from django.shortcuts import render, redirect
 from .models import Game
 from django.contrib.auth.decorators import login_required
-from django.http import Http404
-from django.contrib.auth.forms import UserCreationForm
+from django.db.models import Q
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from .forms import RegisterForm
+from .core.bitboard import BitboardChessboard
+from .core.checkpoints import iter_boards
+from .core.move_codec import decode_move, unpack_codes
 
 import datetime
 from .util import *
 
+MAX_PLY_WINDOW = 64
+
 
 def index(request):
     return render(request, 'game/index.html', None)
@@ -18,10 +24,15 @@ def chessboard(request, game_id):
     if game.start_date is None:
         return redirect('/game/lobby/' + game_id)
 
-    full_state_dict = get_game_full_state(int(game_id))
+    # the ply of the loaded game, never a stale version from the cache
+    full_state_dict = get_game_cached_state(game.id, ply=game.ply)
     game_move_graph = full_state_dict['move_graph']
     game_state = full_state_dict['game_state']
     game_chessboard = full_state_dict['chessboard']
+    # no moves are left after a claimed draw
+    if game.claimed_draw_reason is not None:
+        game_move_graph = {}
+        game_state = claimed_draw_state(game_state, game.claimed_draw_reason)
 
     player_color = None
     if request.user == game.black_player:
@@ -32,12 +43,57 @@ def chessboard(request, game_id):
     context = {'board_rows': game_chessboard.get_rows(perspective=player_color),
                'game_id': game_id,
                'player_color': player_color.value if player_color is not None else None,
-               'move_graph': game_move_graph.as_dict(),
-               'game_state': game_state.as_dict(),
-               'turn': get_game_turn(int(game_id)).value}
+               'move_graph': game_move_graph,
+               'game_state': game_state,
+               'turn': game_chessboard.get_turn().value}
     return render(request, 'game/chessboard.html', context)
 
 
+# PGN of one game, or of all started games of the user
+@login_required
+def export_pgn(request, game_id=None):
+    if game_id is not None:
+        game = get_game_or_404(game_id)
+        games = Game.objects.filter(id=game.id)
+        filename = f'djangochess-{game.id}.pgn'
+    else:
+        games = Game.objects.filter(Q(white_player=request.user) | Q(black_player=request.user),
+                                    start_date__isnull=False).order_by('id')
+        filename = 'djangochess.pgn'
+    response = StreamingHttpResponse(iter_games_pgn(games), content_type='application/x-chess-pgn')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+# Positions of a game from a ply on, for stepping through it: the board, the move that led to it,
+# the move graph and the game state. ?count= prefetches up to MAX_PLY_WINDOW plies at once.
+@login_required
+def game_plies(request, game_id, ply):
+    game = get_game_or_404(int(game_id))
+    codes = unpack_codes(game.packed_moves)
+    try:
+        count = int(request.GET.get('count', 1))
+    except ValueError:
+        return HttpResponseBadRequest('count has to be a number')
+    if not 1 <= count <= MAX_PLY_WINDOW:
+        return HttpResponseBadRequest(f'count has to be between 1 and {MAX_PLY_WINDOW}')
+    if ply > len(codes):
+        raise Http404(f"Game {game.id} has only {len(codes)} plies")
+
+    positions = []
+    for board in iter_boards(codes, ply, count, get_game_checkpoint(game.id, ply), BitboardChessboard):
+        entry = transposition_cache.get_entry(board)
+        game_state = entry.game_state
+        if game.claimed_draw_reason is not None and board.get_ply() == len(codes):
+            game_state = claimed_draw_state(game_state, game.claimed_draw_reason)
+        positions.append({'ply': board.get_ply(),
+                          'fen': board.to_fen(),
+                          'move': decode_move(codes[board.get_ply() - 1]).as_dict() if board.get_ply() else None,
+                          'move_graph': entry.move_graph,
+                          'game_state': game_state})
+    return JsonResponse({'game_id': game.id, 'plies': len(codes), 'positions': positions})
+
+
 @login_required
 def lobby(request, game_id):
     game = get_game_or_404(int(game_id))
@@ -60,9 +116,9 @@ def new_game(request):
 
 
 def register(request):
-    form = UserCreationForm()
+    form = RegisterForm()
     if request.method == 'POST':
-        form = UserCreationForm(request.POST)
+        form = RegisterForm(request.POST)
         if form.is_valid():
             form.save()
             return redirect('/accounts/login')